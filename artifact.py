@@ -0,0 +1,118 @@
+"""
+Precompiled grammar artifacts.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+An artifact bundles a Grammar, its Reduction and every table derived from them into a single pickle,
+so that a parser can start without re-reading the JSON sources or recompiling anything.
+The artifact records a hash of its sources and is rebuilt automatically when they change.
+
+:date: 10/16/2026 13:05
+"""
+
+from typing import *
+import hashlib
+import os
+import pickle
+
+from grammar import Grammar, Reduction, validate
+from lr_parser import LRTable
+
+
+ARTIFACT_VERSION = 5  # Bump whenever the layout of any pickled class changes.
+
+
+class Artifact:
+    """
+    The contents of a compiled artifact.
+    """
+
+    def __init__(self, grammar: Grammar, reduction: Reduction, source_hash: str, sources: Tuple[str, str, str]):
+        """
+        Create an artifact.
+        :param grammar: The loaded grammar.
+        :param reduction: The loaded reduction.
+        :param source_hash: The hash of the sources the artifact was built from.
+        :param sources: The grammar file, reduction file and start symbol the artifact was built from.
+        """
+        self.version = ARTIFACT_VERSION
+        self.grammar = grammar
+        self.reduction = reduction
+        self.source_hash = source_hash
+        self.sources = sources
+        self.lr_table = LRTable(grammar)
+        self.warnings = validate(grammar, reduction)
+
+
+def source_hash(grammar_file: str, reduction_file: str, start_symbol: str = 'S') -> str:
+    """
+    Fingerprint the sources of an artifact.
+    :param grammar_file: JSON file specifying the language grammar.
+    :param reduction_file: POS Tag-to-grammar reduction map.
+    :param start_symbol: The start symbol of the grammar.
+    :return: A hex digest.
+    """
+    digest = hashlib.sha256(f'{ARTIFACT_VERSION}:{start_symbol}:'.encode())
+    for path in (grammar_file, reduction_file):
+        with open(path, 'rb') as fp:
+            digest.update(fp.read())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def compile_artifact(grammar_file: str, reduction_file: str, out_file: str, start_symbol: str = 'S') -> Artifact:
+    """
+    Build an artifact from JSON sources and write it to disk.
+    :param grammar_file: JSON file specifying the language grammar.
+    :param reduction_file: POS Tag-to-grammar reduction map.
+    :param out_file: Where to write the artifact.
+    :param start_symbol: The start symbol of the grammar.
+    :return: The compiled Artifact.
+    """
+    artifact = Artifact(Grammar(grammar_file, start_symbol), Reduction(reduction_file),
+                        source_hash(grammar_file, reduction_file, start_symbol),
+                        (grammar_file, reduction_file, start_symbol))
+
+    # Write to a temporary file first so a concurrent reader never sees a partial artifact.
+    tmp_file = f'{out_file}.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as fp:
+        pickle.dump(artifact, fp, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, out_file)
+
+    return artifact
+
+
+def load_artifact(path: str, grammar_file: str = None, reduction_file: str = None, start_symbol: str = None) \
+        -> Artifact:
+    """
+    Load an artifact, rebuilding it first if it is missing, was built by another version of this code,
+    or is older than its sources.
+    :param path: The artifact file.
+    :param grammar_file: JSON file specifying the language grammar. Defaults to the one the artifact was built from.
+    :param reduction_file: POS Tag-to-grammar reduction map. Defaults to the one the artifact was built from.
+    :param start_symbol: The start symbol of the grammar. Defaults to the one the artifact was built with, or S.
+    :return: An up-to-date Artifact.
+    """
+    artifact = None
+    try:
+        with open(path, 'rb') as fp:
+            artifact = pickle.load(fp)
+    except Exception:
+        pass  # Unpickling a damaged or foreign file can raise almost anything. The artifact is rebuilt instead.
+
+    if artifact is not None and getattr(artifact, 'version', None) == ARTIFACT_VERSION:
+        grammar_file = artifact.sources[0] if grammar_file is None else grammar_file
+        reduction_file = artifact.sources[1] if reduction_file is None else reduction_file
+        start_symbol = artifact.sources[2] if start_symbol is None else start_symbol
+        try:
+            if artifact.source_hash == source_hash(grammar_file, reduction_file, start_symbol):
+                return artifact
+        except OSError:
+            # The sources are gone, so the artifact is all there is.
+            if (grammar_file, reduction_file, start_symbol) == artifact.sources:
+                return artifact
+            raise
+
+    if grammar_file is None or reduction_file is None:
+        raise ValueError(f'Artifact {path} is missing or stale, and no sources were given to rebuild it')
+
+    return compile_artifact(grammar_file, reduction_file, path, 'S' if start_symbol is None else start_symbol)
@@ -0,0 +1,284 @@
+"""
+Offline batch parsing of large corpora.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+read_corpus() walks a memory-mapped corpus file one line at a time, so files much larger than memory can be read
+without loading them. Every line is a sentence in the format of a parse server request: raw text, or a JSON object
+with "text", or "tokens" as [word, tag] pairs for already tagged input.
+
+parse_corpus() parses a corpus into a results file and an index next to it. The results file holds one record per
+sentence: the tree in the binary CompactTree format, or a JSON description of the failure. The index has a fixed-size
+entry per sentence with the byte span of the sentence in the corpus and of its record in the results file. Records
+are written before their index entries, so an interrupted run can be resumed from the last complete entry, and
+ResultFile gives random access to the results without parsing anything again.
+
+:date: 10/16/2026 21:40
+"""
+
+from typing import *
+from array import array
+from collections import deque
+import json
+import mmap
+import os
+import struct
+
+from grammar import fingerprint
+from shift_reduce_parser import ParseSuccess, ParseFail, parse_many
+from compact_tree import CompactTree
+from protocol import decode_request
+
+
+RESULTS_MAGIC = b'SRB\x02'  # Bumped with the binary format of CompactTree
+INDEX_MAGIC = b'SRI\x02'
+_INDEX_HEADER = struct.Struct('<4s64s')  # Magic, and the hex fingerprint of the parser that wrote the results
+_ENTRY = struct.Struct('<qqqqi')  # Sentence start and end in the corpus, record offset and length, status
+
+PARSED = 0  # The record is a CompactTree
+FAILED = 1  # The record is a ParseFail, as JSON
+ERROR = 2   # The parser raised an exception; the record is its description, as JSON
+
+
+class CorpusLine(NamedTuple):
+    """
+    A sentence of a corpus file.
+    """
+
+    start: int  # Byte offset of the line in the file
+    end: int    # Byte offset of the next line
+    sentence: Union[str, List[Tuple[str, str]]]  # Raw text, or (word, tag) pairs
+
+
+def read_corpus(path: str, start: int = 0, skip_invalid: bool = False) -> Iterator[CorpusLine]:
+    """
+    Read the sentences of a corpus lazily through a memory map. Blank lines are skipped.
+    :param path: A UTF-8 file with one sentence per line, as raw text or JSON objects.
+    :param start: The byte offset to start at. Must be the start of a line.
+    :param skip_invalid: Skip malformed JSON lines instead of raising a ValueError.
+    :return: A generator of CorpusLines, in file order.
+    """
+    with open(path, 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return  # Empty files can not be mapped.
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            pos = start
+            while pos < size:
+                end = data.find(b'\n', pos)
+                end = size if end < 0 else end + 1
+                line = data[pos:end].decode(errors='replace').strip()
+                if line:
+                    try:
+                        request = decode_request(line, 0)
+                    except ValueError as e:
+                        if not skip_invalid:
+                            raise ValueError(f'{path}, byte {pos}: {e}') from None
+                    else:
+                        sentence = request['text'] if 'text' in request else \
+                            [(word, tag) for word, tag in request['tokens']]
+                        yield CorpusLine(pos, end, sentence)
+                pos = end
+
+
+class _Guarded:
+    """
+    Wraps a parser so that exceptions are returned rather than raised, and one bad sentence does not end a run.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+
+    def parse(self, text):
+        try:
+            return self.parser.parse(text)
+        except Exception as e:
+            return e
+
+
+def _parser_fingerprint(parser) -> str:
+    """
+    :return: A hex digest identifying how the parser turns sentences into trees.
+    """
+    return fingerprint(list(parser.fingerprint()))
+
+
+def _encode(result) -> Tuple[int, bytes]:
+    """
+    :param result: A ParseSuccess, a ParseFail, or an exception.
+    :return: The status and the record of the result.
+    """
+    if isinstance(result, ParseSuccess):
+        return PARSED, result.compact().to_bytes()
+    if isinstance(result, ParseFail):
+        return FAILED, json.dumps(result.to_dict()).encode()
+    return ERROR, json.dumps({'error': f'{type(result).__name__}: {result}'}).encode()
+
+
+def _recover(results_path: str, index_path: str, digest: str) -> int:
+    """
+    Bring the files of an interrupted run back to the last sentence that was completely written.
+    :param results_path: The results file.
+    :param index_path: The index file.
+    :param digest: The fingerprint of the parser resuming the run.
+    :return: The corpus offset to resume reading at.
+    """
+    with open(index_path, 'rb') as fp:
+        header = fp.read(_INDEX_HEADER.size)
+        magic, written_by = _INDEX_HEADER.unpack(header) if len(header) == _INDEX_HEADER.size else (None, None)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f'{index_path} is not a batch index')
+        if written_by.decode() != digest:
+            raise ValueError(f'{results_path} was written with a different engine, grammar or reduction')
+        entries = fp.read()
+
+    results_size = os.path.getsize(results_path)
+    count = len(entries) // _ENTRY.size  # A partly written entry at the end is dropped.
+    resume_at, results_end = 0, len(RESULTS_MAGIC)
+    # Entries can reach the disk before their records if both were buffered; drop those too.
+    while count > 0:
+        start, end, offset, length, _ = _ENTRY.unpack_from(entries, (count - 1) * _ENTRY.size)
+        if offset + length <= results_size:
+            resume_at, results_end = end, offset + length
+            break
+        count -= 1
+
+    os.truncate(index_path, _INDEX_HEADER.size + count * _ENTRY.size)
+    os.truncate(results_path, results_end)
+    return resume_at
+
+
+def parse_corpus(parser, corpus_path: str, results_path: str, jobs: int = 1, resume: bool = False,
+                 skip_invalid: bool = False, progress: Callable[[int], None] = None) -> Dict[str, int]:
+    """
+    Parse every sentence of a corpus file into a results file and its index (results_path + '.idx').
+    :param parser: An SRParser, LRParser or ChartParser. Must be picklable if jobs > 1.
+    :param corpus_path: The corpus, see read_corpus().
+    :param results_path: The results file to write.
+    :param jobs: The number of worker processes.
+    :param resume: Continue an interrupted run into the same files instead of starting over. The parser must be
+        configured the same way as in the interrupted run.
+    :param skip_invalid: Skip malformed corpus lines instead of stopping at them.
+    :param progress: Called with the number of sentences written so far, after each one.
+    :return: How many sentences were parsed, failed and raised an error in this run, and how many were already
+        written by an earlier one.
+    """
+    index_path = results_path + '.idx'
+    digest = _parser_fingerprint(parser)
+    stats = {'parsed': 0, 'failed': 0, 'errors': 0, 'resumed': 0}
+
+    if resume and os.path.exists(results_path) and os.path.exists(index_path):
+        start = _recover(results_path, index_path, digest)
+        stats['resumed'] = (os.path.getsize(index_path) - _INDEX_HEADER.size) // _ENTRY.size
+        results = open(results_path, 'ab')
+        index = open(index_path, 'ab')
+    else:
+        start = 0
+        results = open(results_path, 'wb')
+        index = open(index_path, 'wb')
+        results.write(RESULTS_MAGIC)
+        index.write(_INDEX_HEADER.pack(INDEX_MAGIC, digest.encode()))
+
+    keys = ('parsed', 'failed', 'errors')
+    try:
+        offset = results.tell()
+        spans = deque()  # Corpus spans of the sentences handed to the parser, whose results are yet to be written
+
+        def sentences():
+            # Only the sentences go to the workers; their spans are matched up with the results in input order.
+            for line in read_corpus(corpus_path, start, skip_invalid):
+                spans.append((line.start, line.end))
+                yield line.sentence
+
+        for result in parse_many(_Guarded(parser), sentences(), jobs):
+            status, record = _encode(result)
+            line_start, line_end = spans.popleft()
+            results.write(record)
+            index.write(_ENTRY.pack(line_start, line_end, offset, len(record), status))
+            offset += len(record)
+            stats[keys[status]] += 1
+            if progress is not None:
+                progress(stats['resumed'] + stats['parsed'] + stats['failed'] + stats['errors'])
+    finally:
+        # The records are flushed first, so that an index entry is never on disk without its record.
+        results.close()
+        index.close()
+    return stats
+
+
+class ResultFile:
+    """
+    Random access to the results of parse_corpus(). The results file is memory-mapped, so only the records that are
+    read are loaded. Trees are only read back once the grammar that parsed them is loaded, as their labels must be
+    existing symbols.
+    """
+
+    def __init__(self, results_path: str):
+        """
+        Open a results file and its index.
+        :param results_path: The results file. Its index must be next to it, with '.idx' appended.
+        """
+        with open(results_path + '.idx', 'rb') as fp:
+            magic, written_by = _INDEX_HEADER.unpack(fp.read(_INDEX_HEADER.size))
+            if magic != INDEX_MAGIC:
+                raise ValueError(f'{results_path}.idx is not a batch index')
+            entries = fp.read()
+        self.fingerprint = written_by.decode()  # Identifies the parser that wrote the results
+
+        # The index is kept as columns, so that e.g. all statuses can be scanned without touching the rest.
+        self.starts, self.ends, self.offsets, self.lengths = array('q'), array('q'), array('q'), array('q')
+        self.statuses = array('i')
+        count = len(entries) // _ENTRY.size
+        for start, end, offset, length, status in _ENTRY.iter_unpack(entries[:count * _ENTRY.size]):
+            self.starts.append(start)
+            self.ends.append(end)
+            self.offsets.append(offset)
+            self.lengths.append(length)
+            self.statuses.append(status)
+
+        self._fp = open(results_path, 'rb')
+        self._data = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[:len(RESULTS_MAGIC)] != RESULTS_MAGIC:
+            self.close()
+            raise ValueError(f'{results_path} is not a batch results file')
+
+    def __len__(self):
+        """
+        :return: The number of sentences in the file.
+        """
+        return len(self.statuses)
+
+    def __getitem__(self, index: int) -> Union[CompactTree, ParseFail, str]:
+        """
+        :param index: The position of a sentence among the non-blank lines of the corpus.
+        :return: The tree of the sentence, its ParseFail, or the error it raised.
+        """
+        record = self._data[self.offsets[index]:self.offsets[index] + self.lengths[index]]
+        status = self.statuses[index]
+        if status == PARSED:
+            return CompactTree.from_bytes(record)
+        data = json.loads(record)
+        return ParseFail.from_dict(data) if status == FAILED else data['error']
+
+    def __iter__(self) -> Iterator[Union[CompactTree, ParseFail, str]]:
+        return (self[i] for i in range(len(self)))
+
+    def span(self, index: int) -> Tuple[int, int]:
+        """
+        :param index: The position of a sentence.
+        :return: The byte offsets of the sentence and of the line after it in the corpus.
+        """
+        return self.starts[index], self.ends[index]
+
+    def close(self):
+        """
+        Release the memory map.
+        :return: None
+        """
+        self._data.close()
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,418 @@
+"""
+Parser benchmarks.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+The default suite parses the sentences of examples.txt and sentences generated from the grammar, for every engine,
+several sentence lengths and several grammar sizes. Generated sentences are fed to the parsers already tagged,
+so their numbers only reflect parsing work. The examples are tagged with NLTK, and the tagging time is reported
+separately from the parse time. Results can be saved as JSON and compared against a previous run.
+
+:date: 10/16/2026 14:20
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import *
+
+from grammar import Grammar, Reduction
+from shift_reduce_parser import SRParser, ParseSuccess
+from lr_parser import LRParser
+from chart_parser import ChartParser
+from tagger import TaggingStage, TaggedSentence, NLTKTagger
+
+
+DEFAULT_GRAMMAR = './grammars/advanced_grammar.json'
+DEFAULT_REDUCTION = './reductions/advanced_grammar_reduction.json'
+DEFAULT_EXAMPLES = './examples.txt'
+LENGTH_BUCKETS = [(1, 8), (9, 16), (17, 32), (33, 64)]
+ENGINES = {'tree': SRParser, 'lr': LRParser, 'chart': ChartParser}
+
+
+def synthetic_corpus(grammar: Grammar, count: int, max_depth: int = 8, seed: int = 0) -> List[TaggedSentence]:
+    """
+    Generate random sentences from a grammar, tagged directly with grammar terminals.
+    :param grammar: The grammar to derive sentences from.
+    :param count: The number of sentences.
+    :param max_depth: The derivation depth after which the shortest rules are preferred.
+    :param seed: Seed of the random generator, for repeatable runs.
+    :return: A list of sentences as (word, tag) pairs.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        terminals = grammar.generate(rng, max_depth)
+        corpus.append([(f'w{i}', str(t)) for i, t in enumerate(terminals)])
+    return corpus
+
+
+def scaled_grammar(source_file: str, factor: int) -> Grammar:
+    """
+    Make a grammar larger without changing the language it accepts,
+    by adding factor - 1 renamed copies of every nonterminal except the start symbol.
+    :param source_file: JSON file specifying the language grammar.
+    :param factor: How many copies of the grammar the result contains.
+    :return: A new Grammar with about factor times as many rules.
+    """
+    with open(source_file, 'r') as fp:
+        data = json.load(fp)
+
+    result = {k: [list(r) for r in v] for k, v in data.items()}
+    for i in range(1, factor):
+        def rename(sym):
+            return f'{sym}_{i}' if sym in data and sym != 'S' else sym
+        for k, rules in data.items():
+            renamed = [[rename(sym) for sym in rule] for rule in rules]
+            if k == 'S':
+                result['S'].extend(renamed)
+            else:
+                result[rename(k)] = renamed
+
+    return Grammar.from_data(result)
+
+
+def example_sentences(path: str) -> List[str]:
+    """
+    Extract the sentences discussed in examples.txt: the paragraph openers that are followed by a parse tree,
+    or that end with an exclamation mark.
+    :param path: Path to examples.txt.
+    :return: The sentences, in file order.
+    """
+    with open(path, 'r') as fp:
+        lines = [line.rstrip('\n') for line in fp]
+
+    sentences = []
+    for i, line in enumerate(lines):
+        if not line or line.startswith(('|', '"', ' ')) or (i > 0 and lines[i - 1].strip()):
+            continue
+        followed_by_tree = i + 1 < len(lines) and lines[i + 1].strip() == 'S'
+        if followed_by_tree or line.endswith('!'):
+            sentences.append(line.rstrip(':'))
+    return sentences
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile.
+    :param values: Samples.
+    :param pct: Percentile between 0 and 100.
+    :return: The sample at that percentile, or 0 if there are none.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def run_scenario(parser, corpus: List[TaggedSentence], tag_times: List[float] = None, repeat: int = 1) -> Dict:
+    """
+    Parse a corpus and collect measurements.
+    :param parser: The parser to measure.
+    :param corpus: Already tagged sentences.
+    :param tag_times: Seconds it took to tag each sentence, if they had to be tagged.
+    :param repeat: How many times to parse the corpus for timing.
+    :return: A dictionary of metrics.
+    """
+    stats = {}
+    latencies = []
+    accepted = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for sentence in corpus:
+            t = time.perf_counter()
+            result = parser.parse(sentence, stats) if isinstance(parser, SRParser) else parser.parse(sentence)
+            latencies.append(time.perf_counter() - t)
+            accepted += isinstance(result, ParseSuccess)
+    elapsed = time.perf_counter() - start
+
+    # Memory is measured in a separate pass, because tracing distorts the timings.
+    tracemalloc.start()
+    for sentence in corpus:
+        parser.parse(sentence)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    parses = len(corpus) * repeat
+    metrics = {
+        'sentences': len(corpus),
+        'tokens': sum(len(s) for s in corpus),
+        'accepted': accepted // repeat,
+        'sentences_per_sec': parses / elapsed if elapsed else 0.0,
+        'parse_p50_ms': percentile(latencies, 50) * 1000,
+        'parse_p99_ms': percentile(latencies, 99) * 1000,
+        'peak_memory_kb': peak / 1024,
+    }
+    if 'frames_created' in stats:
+        metrics['frames_per_sentence'] = stats['frames_created'] / parses
+        metrics['prune_passes_per_sentence'] = stats['prune_passes'] / parses
+    if tag_times is not None:
+        metrics['tag_p50_ms'] = percentile(tag_times, 50) * 1000
+        metrics['tag_p99_ms'] = percentile(tag_times, 99) * 1000
+        metrics['tag_total_ms'] = sum(tag_times) * 1000
+    return metrics
+
+
+def run_suite(grammar_file: str, reduction_file: str, examples_file: str, count: int, scales: List[int],
+              seed: int = 0, repeat: int = 1) -> Dict:
+    """
+    Run every benchmark scenario.
+    :param grammar_file: JSON file specifying the language grammar.
+    :param reduction_file: POS Tag-to-grammar reduction map, used for examples.txt.
+    :param examples_file: Path to examples.txt, or None to skip it.
+    :param count: The maximum number of generated sentences per length bucket.
+    :param scales: Grammar size factors, see scaled_grammar().
+    :param seed: Random seed for sentence generation.
+    :param repeat: How many times each corpus is parsed for timing.
+    :return: A JSON-serializable dictionary of results.
+    """
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'grammar': grammar_file,
+            'count': count,
+            'seed': seed,
+        },
+        'scenarios': {},
+    }
+    scenarios = results['scenarios']
+    base = Grammar(grammar_file)
+
+    # Generated sentences, grouped by length.
+    rng = random.Random(seed)
+    buckets = {b: [] for b in LENGTH_BUCKETS}
+    attempts = 0
+    while any(len(c) < count for c in buckets.values()) and attempts < count * 200:
+        attempts += 1
+        terminals = base.generate(rng, rng.randint(2, 16))
+        for low, high in LENGTH_BUCKETS:
+            if low <= len(terminals) <= high and len(buckets[(low, high)]) < count:
+                buckets[(low, high)].append([(f'w{i}', str(t)) for i, t in enumerate(terminals)])
+
+    for scale in scales:
+        grammar = base if scale == 1 else scaled_grammar(grammar_file, scale)
+        for name, engine in ENGINES.items():
+            parser = engine(grammar, tagging=TaggingStage())
+            for (low, high), corpus in buckets.items():
+                if corpus:
+                    key = f'{name}/synthetic/len{low}-{high}/x{scale}'
+                    scenarios[key] = run_scenario(parser, corpus, repeat=repeat)
+                    print_scenario(key, scenarios[key])
+
+    # The hand-written examples, tagged by NLTK.
+    if examples_file is not None:
+        try:
+            reduction = Reduction(reduction_file)
+            tagging = TaggingStage(reduction, NLTKTagger(offline=True))
+            tagging.tagger.load()
+        except (ImportError, LookupError, OSError) as e:
+            print(f'Skipping {examples_file}: {e}', file=sys.stderr)
+            return results
+
+        corpus, tag_times = [], []
+        for text in example_sentences(examples_file):
+            t = time.perf_counter()
+            words, tags = tagging.tag_text(text)
+            tag_times.append(time.perf_counter() - t)
+            corpus.append(list(zip(words, tags)))
+
+        for name, engine in ENGINES.items():
+            parser = engine(base, reduction, tagging=TaggingStage(reduction))
+            key = f'{name}/examples/x1'
+            scenarios[key] = run_scenario(parser, corpus, tag_times, repeat=max(repeat, 20))
+            print_scenario(key, scenarios[key])
+
+    return results
+
+
+def print_scenario(key: str, metrics: Dict):
+    line = f'{key:<32} {metrics["sentences_per_sec"]:>10.1f} sent/s  p50 {metrics["parse_p50_ms"]:>8.3f} ms  ' \
+           f'p99 {metrics["parse_p99_ms"]:>8.3f} ms  peak {metrics["peak_memory_kb"]:>8.1f} KiB'
+    if 'frames_per_sentence' in metrics:
+        line += f'  {metrics["frames_per_sentence"]:>7.1f} frames'
+    if 'tag_p50_ms' in metrics:
+        line += f'  tagging p50 {metrics["tag_p50_ms"]:.3f} ms'
+    print(line)
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Find scenarios that got slower or hungrier than in a baseline run.
+    :param results: The current results.
+    :param baseline: Results of an earlier run.
+    :param tolerance: Allowed relative degradation, e.g. 0.1 for 10%.
+    :return: A description of every regression.
+    """
+    regressions = []
+    for key, metrics in results['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(key)
+        if old is None:
+            continue
+        if metrics['sentences_per_sec'] < old['sentences_per_sec'] * (1 - tolerance):
+            regressions.append(f'{key}: throughput {old["sentences_per_sec"]:.1f} -> '
+                               f'{metrics["sentences_per_sec"]:.1f} sent/s')
+        for metric in ('parse_p99_ms', 'peak_memory_kb', 'frames_per_sentence'):
+            if metric in old and metrics.get(metric, 0) > old[metric] * (1 + tolerance):
+                regressions.append(f'{key}: {metric} {old[metric]:.3f} -> {metrics[metric]:.3f}')
+    return regressions
+
+
+def bench_prediction(grammar: Grammar, corpus: List[TaggedSentence]):
+    """
+    Compare SRParser with and without FIRST-set based prediction.
+    :param grammar: The grammar to parse with.
+    :param corpus: Sentences tagged with grammar terminals.
+    :return: None
+    """
+    tokens = sum(len(s) for s in corpus)
+    print(f'{len(corpus)} sentences, {tokens} tokens')
+    print(f'{"predict":>8} {"sent/s":>10} {"frames/token":>13} {"prunes/token":>13}')
+    for predict in (False, True):
+        parser = SRParser(grammar, tagging=TaggingStage(), predict=predict)
+        stats = {}
+        start = time.perf_counter()
+        for sentence in corpus:
+            parser.parse(sentence, stats)
+        elapsed = time.perf_counter() - start
+
+        print(f'{str(predict):>8} {len(corpus) / elapsed:>10.1f} {stats["frames_created"] / tokens:>13.2f} '
+              f'{stats["prune_passes"] / tokens:>13.2f}')
+
+
+def bench_pooling(grammar: Grammar, corpus: List[TaggedSentence], repeat: int = 3):
+    """
+    Count the frame allocations and garbage collector runs of SRParser with and without recycling of discarded
+    state frames. Throughput is not compared: the pool does not make parsing measurably faster.
+    :param grammar: The grammar to parse with.
+    :param corpus: Sentences tagged with grammar terminals.
+    :param repeat: Number of passes over the corpus.
+    :return: None
+    """
+    tokens = sum(len(s) for s in corpus)
+    print(f'{len(corpus)} sentences, {tokens} tokens, {repeat} passes')
+    print(f'{"pool":>6} {"allocated":>10} {"reused":>10} {"gc runs":>8}')
+    for size in (0, 4096):
+        parser = SRParser(grammar, tagging=TaggingStage(), frame_pool=size)
+        for sentence in corpus:
+            parser.parse(sentence)  # Warm up, so that filling the pool is not measured.
+        parser.frame_pool.reused = 0
+        stats = {}
+        collections = sum(s['collections'] for s in gc.get_stats())
+        for _ in range(repeat):
+            for sentence in corpus:
+                parser.parse(sentence, stats)
+        collections = sum(s['collections'] for s in gc.get_stats()) - collections
+
+        # Every frame not taken from the pool is a new allocation, including the copies of the initial state tree.
+        reused = parser.frame_pool.reused
+        print(f'{size:>6} {stats["frames_created"] - reused:>10} {reused:>10} {collections:>8}')
+
+
+def right_recursive_sentence(length: int) -> TaggedSentence:
+    """
+    Build a sentence that nests VP -> V RB VP as deeply as its length allows, e.g. PRP V RB V RB ... V DET N.
+    :param length: The number of tokens, at least 3.
+    :return: A sentence as (word, tag) pairs, tagged with grammar terminals.
+    """
+    ending = ['V', 'DET', 'N'] if length % 2 == 0 else ['V', 'NAME']
+    tags = ['PRP'] + ['V', 'RB'] * ((length - 1 - len(ending)) // 2) + ending
+    return [(f'w{i}', t) for i, t in enumerate(tags)]
+
+
+def bench_scaling(grammar: Grammar, lengths: List[int]):
+    """
+    Parse deeply nested sentences of increasing length with every engine and check they are accepted.
+    :param grammar: The grammar to parse with. Must contain VP -> V RB VP, like advanced_grammar.json.
+    :param lengths: Sentence lengths to try.
+    :return: True if every sentence was parsed successfully.
+    """
+    engines = {name: engine(grammar, tagging=TaggingStage()) for name, engine in ENGINES.items()}
+    ok = True
+    print(f'{"engine":>6} {"tokens":>7} {"seconds":>9} {"result":>7}')
+    for length in lengths:
+        sentence = right_recursive_sentence(length)
+        for name, parser in engines.items():
+            start = time.perf_counter()
+            result = parser.parse(sentence)
+            elapsed = time.perf_counter() - start
+            accepted = isinstance(result, ParseSuccess) and \
+                [n.value for n in _leaves(result.root)] == [w for w, _ in sentence]
+            ok = ok and accepted
+            print(f'{name:>6} {len(sentence):>7} {elapsed:>9.3f} {"ok" if accepted else "FAILED":>7}')
+    return ok
+
+
+def _leaves(root):
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if not node.components:
+            yield node
+        stack.extend(reversed(node.components))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmark the parsers.')
+    arg_parser.add_argument("-g", "--grammar", help="JSON file specifying the language grammar.",
+                            default=DEFAULT_GRAMMAR)
+    arg_parser.add_argument("-r", "--reduction", help="POS Tag-to-grammar reduction map.", default=DEFAULT_REDUCTION)
+    arg_parser.add_argument("-x", "--examples", help="File of example sentences.", default=DEFAULT_EXAMPLES)
+    arg_parser.add_argument("-n", "--count", help="Number of sentences to generate per length bucket.", type=int,
+                            default=100)
+    arg_parser.add_argument("--scales", help="Grammar size factors to benchmark.", type=int, nargs='+',
+                            default=[1, 4])
+    arg_parser.add_argument("--repeat", help="Number of timed passes over each corpus.", type=int, default=3)
+    arg_parser.add_argument("-s", "--seed", help="Random seed.", type=int, default=0)
+    arg_parser.add_argument("-o", "--output", help="Write the results to this JSON file.")
+    arg_parser.add_argument("-b", "--baseline", help="Compare against the results in this JSON file and exit with "
+                                                     "status 1 on regressions.")
+    arg_parser.add_argument("-t", "--tolerance", help="Allowed relative regression against the baseline.",
+                            type=float, default=0.1)
+    arg_parser.add_argument("--prediction", help="Instead, compare the tree engine with and without prediction.",
+                            action="store_true")
+    arg_parser.add_argument("--pooling", help="Instead, count the frame allocations of the tree engine with and "
+                                              "without frame reuse.",
+                            action="store_true")
+    arg_parser.add_argument("-d", "--depth", help="Maximum derivation depth of sentences for --prediction and "
+                                                  "--pooling.",
+                            type=int, default=8)
+    arg_parser.add_argument("--scaling", help="Instead, parse deeply nested sentences of these lengths.", type=int,
+                            nargs='*')
+    args = arg_parser.parse_args()
+
+    if args.scaling is not None:
+        if not bench_scaling(Grammar(args.grammar), args.scaling or [10, 100, 1000]):
+            exit(1)
+        return
+
+    if args.prediction:
+        grammar = Grammar(args.grammar)
+        bench_prediction(grammar, synthetic_corpus(grammar, args.count * 5, args.depth, args.seed))
+        return
+
+    if args.pooling:
+        grammar = Grammar(args.grammar)
+        bench_pooling(grammar, synthetic_corpus(grammar, args.count * 5, args.depth, args.seed), args.repeat)
+        return
+
+    results = run_suite(args.grammar, args.reduction, args.examples, args.count, args.scales, args.seed, args.repeat)
+    if args.output is not None:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as fp:
+            regressions = compare(results, json.load(fp), args.tolerance)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+        if regressions:
+            exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,561 @@
+"""
+A generalized parser for ambiguous grammars.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+SRParser and LRParser commit to a single action at every step, so they produce at most one tree and can miss a parse
+that exists. ChartParser runs Earley's algorithm instead, which keeps every viable partial parse alive, and packs
+all complete parses of a sentence into a shared forest in O(n^3) time and space. Trees are enumerated from the forest
+lazily, best first.
+
+:date: 10/16/2026 17:10
+"""
+
+from typing import *
+import heapq
+import time
+
+from grammar import Grammar, Symbol, Node, Reduction
+from grammar_transform import TransformedGrammar
+from shift_reduce_parser import ParseSuccess, ParseFail, ParseLimits, parse_many
+from tagger import TaggingStage, NLTKTagger, TaggedSentence
+from instrumentation import ParseMetrics, MetricsSink, as_sink
+
+
+EarleyItem = Tuple[Symbol, int, int, int]  # (Symbol the rule is derived from, rule index, dot, origin position)
+Derivation = Tuple[int, int, Tuple[int, ...]]  # (cost, alternative index, rank of the derivation of each child)
+
+
+class ForestNode:
+    """
+    A node of a packed shared parse forest. It stands for every way of deriving a symbol, or a prefix of a rule,
+    from a span of the input.
+    """
+
+    __slots__ = ('symbol', 'rule', 'dot', 'start', 'end', 'token', 'alternatives')
+
+    def __init__(self, symbol: Symbol, start: int, end: int, rule: int = None, dot: int = None, token: Node = None):
+        """
+        Create a node with no derivations.
+        :param symbol: The symbol derived.
+        :param start: The index of the first token covered.
+        :param end: The index one past the last token covered.
+        :param rule: For intermediate nodes, the rule whose prefix is derived. None for symbol nodes and leaves.
+        :param dot: For intermediate nodes, the length of the prefix.
+        :param token: For leaves, the input token.
+        """
+        self.symbol = symbol
+        self.rule = rule
+        self.dot = dot
+        self.start = start
+        self.end = end
+        self.token = token
+        self.alternatives = []  # Packed derivations, as (rule index, tuple of child ForestNodes)
+
+    def __repr__(self):
+        if self.rule is not None:
+            return f'({self.symbol} -> {self.rule} | {self.dot}, {self.start}:{self.end})'
+        return f'({self.symbol}, {self.start}:{self.end})'
+
+
+class Forest:
+    """
+    All parse trees of a sentence, packed into a graph in which common subtrees are shared.
+
+    Trees are ranked by the number of constituents in them, so that flatter trees, i.e. those that use longer rules,
+    come first. Trees with the same number of constituents are ordered by the rule indices used at the top.
+    """
+
+    def __init__(self, root: ForestNode, tokens: List[Node]):
+        """
+        Wrap a forest built by ChartParser.
+        :param root: The node deriving the start symbol from the entire sentence.
+        :param tokens: The terminals of the sentence.
+        """
+        self.root = root
+        self.tokens = tokens
+        self.nodes = self._topological_order(root)
+
+        # Lazy k-best enumeration state, per node.
+        self._derivations = {}  # Derivations found so far, best first
+        self._candidates = {}   # Heap of derivations that may come next
+        self._seen = {}         # Derivations that have been pushed onto the heap
+        self._pending = {}      # The last derivation found, if the candidates following it are yet to be pushed
+        self._exhausted = set()
+        self._initialize()
+
+    def __len__(self):
+        """
+        :return: The number of nodes in the forest.
+        """
+        return len(self.nodes)
+
+    @staticmethod
+    def _topological_order(root: ForestNode) -> List[ForestNode]:
+        """
+        Order the nodes of the forest so that each comes after all of its children.
+        :param root: The root of the forest.
+        :return: Every node reachable from the root.
+        """
+        order = []
+        state = {}  # False while a node's descendants are being visited, True once it is placed.
+        stack = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if children_done:
+                state[node] = True
+                order.append(node)
+                continue
+            if node in state:
+                # Reaching a node again while its descendants are being visited means it is its own descendant.
+                if not state[node]:
+                    raise ValueError(f'The grammar derives {node.symbol} from itself, so the sentence has '
+                                     f'infinitely many parse trees')
+                continue
+            state[node] = False
+            stack.append((node, True))
+            for _, children in node.alternatives:
+                stack.extend((child, False) for child in children if not state.get(child))
+        return order
+
+    def _initialize(self):
+        """
+        Find the best derivation of every node, bottom-up.
+        :return: None
+        """
+        for node in self.nodes:
+            if node.token is not None:
+                self._derivations[node] = [(0, -1, ())]
+                self._exhausted.add(node)
+                continue
+
+            local = 1 if node.rule is None else 0  # Only symbol nodes become constituents.
+            candidates = []
+            for alt, (_, children) in enumerate(node.alternatives):
+                cost = local + sum(self._derivations[child][0][0] for child in children)
+                candidates.append((cost, alt, (0,) * len(children)))
+            heapq.heapify(candidates)
+
+            best = heapq.heappop(candidates)
+            self._derivations[node] = [best]
+            self._candidates[node] = candidates
+            self._seen[node] = {(alt, ranks) for _, alt, ranks in candidates}
+            self._seen[node].add(best[1:])
+            self._pending[node] = best
+
+    def _ensure(self, node: ForestNode, rank: int) -> bool:
+        """
+        Find derivations of a node until there are more than a given number of them.
+        This is the lazy k-best algorithm of Huang and Chiang (2005), with an explicit stack instead of recursion.
+        :param node: The node whose derivations to extend.
+        :param rank: The index of the derivation wanted.
+        :return: Whether the node has a derivation with that index.
+        """
+        stack = [(node, rank)]
+        while stack:
+            current, wanted = stack[-1]
+            derivations = self._derivations[current]
+            if len(derivations) > wanted or current in self._exhausted:
+                stack.pop()
+                continue
+
+            last = self._pending.get(current)
+            if last is not None:
+                # The successors of the last derivation each use the next best derivation of one child.
+                cost, alt, ranks = last
+                children = current.alternatives[alt][1]
+                missing = [(child, ranks[i] + 1) for i, child in enumerate(children)
+                           if len(self._derivations[child]) <= ranks[i] + 1 and child not in self._exhausted]
+                if missing:
+                    stack.extend(missing)
+                    continue
+
+                for i, child in enumerate(children):
+                    child_derivations = self._derivations[child]
+                    if len(child_derivations) <= ranks[i] + 1:
+                        continue
+                    successor = ranks[:i] + (ranks[i] + 1,) + ranks[i + 1:]
+                    if (alt, successor) in self._seen[current]:
+                        continue
+                    self._seen[current].add((alt, successor))
+                    successor_cost = cost - child_derivations[ranks[i]][0] + child_derivations[ranks[i] + 1][0]
+                    heapq.heappush(self._candidates[current], (successor_cost, alt, successor))
+                del self._pending[current]
+
+            if self._candidates[current]:
+                best = heapq.heappop(self._candidates[current])
+                derivations.append(best)
+                self._pending[current] = best
+            else:
+                self._exhausted.add(current)
+
+        return len(self._derivations[node]) > rank
+
+    def _tree(self, rank: int) -> Node:
+        """
+        Build one parse tree.
+        :param rank: The index of the derivation of the root to build. Must have been found already.
+        :return: The root Node of the tree.
+        """
+        built = {}  # (ForestNode, rank) -> Node, or list of Nodes for intermediate nodes
+        stack = [(self.root, rank, False)]
+        while stack:
+            node, rank, children_done = stack.pop()
+            if (node, rank) in built:
+                continue
+            if node.token is not None:
+                built[(node, rank)] = node.token
+                continue
+
+            _, alt, ranks = self._derivations[node][rank]
+            children = node.alternatives[alt][1]
+            if not children_done:
+                stack.append((node, rank, True))
+                stack.extend((child, r, False) for child, r in zip(children, ranks))
+                continue
+
+            # Intermediate nodes stand for a run of siblings, which is spliced into the enclosing constituent.
+            components = []
+            for child, r in zip(children, ranks):
+                if child.rule is None:
+                    components.append(built[(child, r)])
+                else:
+                    components.extend(built[(child, r)])
+            built[(node, rank)] = components if node.rule is not None else Node(node.symbol, components=components)
+
+        return built[(self.root, rank)]
+
+    def best(self) -> Node:
+        """
+        :return: The root of the best parse tree.
+        """
+        return self._tree(0)
+
+    def trees(self, k: int = None) -> Iterator[Node]:
+        """
+        Enumerate parse trees, best first. Only as much of the forest is ranked as the trees taken require.
+        :param k: The maximum number of trees. All of them if omitted.
+        :return: A generator of tree roots.
+        """
+        rank = 0
+        while (k is None or rank < k) and self._ensure(self.root, rank):
+            yield self._tree(rank)
+            rank += 1
+
+    def count(self) -> int:
+        """
+        Count the parse trees without enumerating them.
+        :return: The number of distinct trees in the forest.
+        """
+        counts = {}
+        for node in self.nodes:
+            if node.token is not None:
+                counts[node] = 1
+                continue
+            total = 0
+            for _, children in node.alternatives:
+                product = 1
+                for child in children:
+                    product *= counts[child]
+                total += product
+            counts[node] = total
+        return counts[self.root]
+
+
+class ChartParser:
+    """
+    A generalized parser that finds every parse of a sentence.
+    """
+
+    def __init__(self, grammar: Grammar, reduction: Reduction = None, verbose: bool = False,
+                 tagging: TaggingStage = None, metrics: Union[MetricsSink, Callable[[ParseMetrics], Any]] = None,
+                 limits: ParseLimits = None):
+        """
+        Initialize a parser with some global parameters.
+        :param grammar: A CFG grammar driving acceptable transitions. It must not derive any symbol from itself.
+            A TransformedGrammar is parsed with the grammar it was made from.
+        :param reduction: A mapping of a complex grammar to a simpler one.
+        :param verbose: Enables additional output.
+        :param tagging: The stage turning sentences into terminals. Uses NLTK and the reduction if omitted.
+        :param metrics: A MetricsSink, or a function, receiving a ParseMetrics record after every parse.
+            Only the token count, tagging times and total parse time are filled in.
+        :param limits: Bounds on the Earley items (as max_frames), tokens and time of every parse. There is no parse
+            stack, so max_depth does not apply. Unbounded if omitted.
+        """
+        # Earley items already share rule prefixes, and the order of equally good trees depends on the rules, so a
+        # transformed grammar would gain nothing while ranking the trees differently.
+        self._grammar = grammar.original if isinstance(grammar, TransformedGrammar) else grammar
+        self._reduction = reduction
+        self.verbose = verbose
+        self.tagging = TaggingStage(reduction, NLTKTagger(), verbose=verbose) if tagging is None else tagging
+        self.metrics = as_sink(metrics)
+        self.limits = ParseLimits() if limits is None else limits
+
+    def parse(self, text: Union[str, TaggedSentence]) -> Union[ParseSuccess, ParseFail]:
+        """
+        Obtain the best grammatical parse tree for a given sentence.
+        :param text: The sentence to parse, either as raw text or as already tagged (word, tag) pairs.
+        :return: A nested structure representing the parse tree. Its forest attribute holds all the other parses.
+        """
+        sink = self.metrics
+        if sink is None:
+            return self.parse_tokens(self.tagging(text))
+
+        start = time.perf_counter()
+        metrics = ParseMetrics()
+        tokens = self.tagging(text, metrics)
+        metrics.tokens = len(tokens)
+        result = self.parse_tokens(tokens)
+        metrics.success = isinstance(result, ParseSuccess)
+        metrics.parse_time = time.perf_counter() - start
+        sink.record(metrics)
+        return result
+
+    def fingerprint(self) -> Tuple[str, str, Optional[str]]:
+        """
+        Identify how this parser turns terminals into trees.
+        :return: The engine, grammar and reduction fingerprints.
+        """
+        reduction = self.tagging.reduction
+        return type(self).__name__, self._grammar.fingerprint, None if reduction is None else reduction.fingerprint
+
+    def parse_many(self, sentences: Iterable[Union[str, TaggedSentence]], jobs: int = 1, chunksize: int = 16) \
+            -> Iterator[Union[ParseSuccess, ParseFail]]:
+        """
+        Parse a stream of sentences. See shift_reduce_parser.parse_many().
+        :param sentences: The sentences to parse, as text or (word, tag) pairs. Consumed lazily.
+        :param jobs: The number of worker processes.
+        :param chunksize: How many sentences are sent to a worker at a time.
+        :return: A generator of parse results, in input order.
+        """
+        return parse_many(self, sentences, jobs, chunksize)
+
+    def parse_tokens(self, tokens: List[Node]) -> Union[ParseSuccess, ParseFail]:
+        """
+        Obtain the best grammatical parse tree for an already tagged and reduced sentence.
+        :param tokens: Terminal Nodes in sentence order, with the source words as their values.
+        :return: A nested structure representing the parse tree. Its forest attribute holds all the other parses.
+        """
+        forest = self.parse_forest(tokens)
+        if isinstance(forest, ParseFail):
+            return forest
+        return ParseSuccess(name="Root", node=forest.best(), forest=forest)
+
+    def parse_forest(self, tokens: List[Node]) -> Union[Forest, ParseFail]:
+        """
+        Find every parse of an already tagged and reduced sentence.
+        :param tokens: Terminal Nodes in sentence order, with the source words as their values.
+        :return: The packed forest of all parse trees.
+        """
+        max_tokens = self.limits.max_tokens
+        if max_tokens is not None and len(tokens) > max_tokens:
+            return ParseFail.too_long(tokens, max_tokens)
+        items, completed, stopped = self._recognize(tokens)
+        if stopped is not None:
+            reason, pos = stopped
+            if self.verbose:
+                print(f'Exceeded the {reason} limit at token {pos}')
+            return ParseFail(pos, tokens[pos].symbol if pos < len(tokens) else None,
+                             tokens[pos].value if pos < len(tokens) else None, frozenset(),
+                             self._constituents(tokens[:pos], completed), reason)
+
+        n = len(tokens)
+        if (Grammar.ROOT_SYM, 0, 1, 0) not in items[n]:
+            # Report the first token that no parse could get past.
+            pos = n
+            for j in range(1, n + 1):
+                if not items[j]:
+                    pos = j - 1
+                    break
+            expected = self._expected(items[pos])
+            if (Grammar.ROOT_SYM, 0, 1, 0) in items[pos]:
+                expected.append(Grammar.RULE_END)
+            if self.verbose:
+                print(f'Expected one of {expected} at token {pos}')
+            token = tokens[pos] if pos < n else None
+            return ParseFail(pos, None if token is None else token.symbol, None if token is None else token.value,
+                             frozenset(expected), self._constituents(tokens[:pos], completed))
+
+        forest = Forest(self._build_forest(tokens, items, completed), tokens)
+        if self.verbose:
+            print(f'Chart: {sum(len(s) for s in items)} items, forest: {len(forest)} nodes')
+        return forest
+
+    def _recognize(self, tokens: List[Node]) \
+            -> Tuple[List[Set[EarleyItem]], List[Set[Tuple[Symbol, int]]], Optional[Tuple[str, int]]]:
+        """
+        Run the Earley recognizer. Nullable symbols are skipped over as soon as they are predicted,
+        as suggested by Aycock and Horspool (2002), so that empty rules need no special treatment on completion.
+        :param tokens: The terminals of the sentence.
+        :return: The item set at every position, the completed (symbol, origin) pairs at every position, and if a
+            limit was exceeded, its name and the position of the first token not recognized.
+        """
+        limits = self.limits
+        max_items = limits.max_frames
+        deadline = None if limits.time_budget is None else time.perf_counter() + limits.time_budget
+        total = 0
+        grammar = self._grammar
+        nullable = grammar.nullable
+        n = len(tokens)
+        items = [set() for _ in range(n + 1)]
+        completed = [set() for _ in range(n + 1)]
+
+        waiting = [{} for _ in range(n + 1)]  # Per set, symbol -> items whose dot is right before that symbol
+
+        agenda = []
+        items[0].add((Grammar.ROOT_SYM, 0, 0, 0))
+        for j in range(n + 1):
+            predicted = set()
+            agenda.extend(items[j])
+            scan = tokens[j].symbol if j < n else None
+
+            while agenda:
+                item = agenda.pop()
+                lhs, rule, dot, origin = item
+                production = grammar[lhs][rule]
+
+                if dot < len(production):
+                    sym = production[dot]
+                    rules = grammar[sym]
+                    if rules:
+                        waiting[j].setdefault(sym, []).append(item)
+                        if sym not in predicted:
+                            predicted.add(sym)
+                            for r in range(len(rules)):
+                                new = (sym, r, 0, j)
+                                if new not in items[j]:
+                                    items[j].add(new)
+                                    agenda.append(new)
+                        if sym in nullable:
+                            new = (lhs, rule, dot + 1, origin)
+                            if new not in items[j]:
+                                items[j].add(new)
+                                agenda.append(new)
+                    elif sym == scan:
+                        items[j + 1].add((lhs, rule, dot + 1, origin))
+                else:
+                    completed[j].add((lhs, origin))
+                    # Items of this set waiting on lhs are only possible if lhs is nullable, and handled above.
+                    if origin == j:
+                        continue
+                    for w_lhs, w_rule, w_dot, w_origin in waiting[origin].get(lhs, ()):
+                        new = (w_lhs, w_rule, w_dot + 1, w_origin)
+                        if new not in items[j]:
+                            items[j].add(new)
+                            agenda.append(new)
+
+            if j < n and not items[j + 1]:
+                break  # No parse survives this token.
+
+            total += len(items[j])
+            if max_items is not None and total > max_items:
+                return items, completed, ('max_frames', j)
+            if deadline is not None and time.perf_counter() > deadline:
+                return items, completed, ('time_budget', j)
+
+        return items, completed, None
+
+    def _expected(self, item_set: Set[EarleyItem]) -> List[Symbol]:
+        """
+        :param item_set: An Earley item set.
+        :return: The terminals that the items of the set can accept next.
+        """
+        grammar = self._grammar
+        expected = {}
+        for lhs, rule, dot, _ in item_set:
+            production = grammar[lhs][rule]
+            if dot < len(production) and not grammar[production[dot]]:
+                expected[production[dot]] = None
+        return list(expected)
+
+    @staticmethod
+    def _constituents(prefix: List[Node], completed: List[Set[Tuple[Symbol, int]]]) \
+            -> Tuple[Tuple[Symbol, int, int], ...]:
+        """
+        Cover the part of a sentence that was parsed with as few completed constituents as possible, right to left.
+        :param prefix: The tokens before the one no parse could get past.
+        :param completed: The completed (symbol, origin) pairs from the recognizer.
+        :return: (Symbol, start, end) of every constituent of the cover, in sentence order.
+        """
+        cover = []
+        end = len(prefix)
+        while end > 0:
+            # The longest constituent ending here. Among equally long ones, pick by name so the result is stable.
+            spans = [(origin, sym.name, sym) for sym, origin in completed[end]
+                     if origin < end and sym != Grammar.ROOT_SYM]
+            if spans:
+                start, _, sym = min(spans)
+            else:
+                start, sym = end - 1, prefix[end - 1].symbol
+            cover.append((sym, start, end))
+            end = start
+        cover.reverse()
+        return tuple(cover)
+
+    def _build_forest(self, tokens: List[Node], items: List[Set[EarleyItem]],
+                      completed: List[Set[Tuple[Symbol, int]]]) -> ForestNode:
+        """
+        Extract the packed shared forest from a successful recognizer run. Rules are binarized through intermediate
+        nodes, so that each alternative has at most two children and the forest stays cubic in size.
+        :param tokens: The terminals of the sentence.
+        :param items: The item sets from the recognizer.
+        :param completed: The completed (symbol, origin) pairs from the recognizer.
+        :return: The root of the forest.
+        """
+        grammar = self._grammar
+        nodes = {}  # (symbol, rule, dot, start, end) -> ForestNode. Rule and dot are None for symbol nodes and leaves.
+        stack = []
+
+        def get(sym, start, end, rule=None, dot=None):
+            key = (sym, rule, dot, start, end)
+            node = nodes.get(key)
+            if node is None:
+                node = ForestNode(sym, start, end, rule, dot)
+                if rule is None and not grammar[sym]:
+                    node.token = tokens[start]
+                else:
+                    stack.append(node)
+                nodes[key] = node
+            return node
+
+        root = get(grammar.start_symbol, 0, len(tokens))
+        while stack:
+            node = stack.pop()
+            if node.rule is None:
+                for rule, production in enumerate(grammar[node.symbol]):
+                    if (node.symbol, rule, len(production), node.start) in items[node.end]:
+                        self._expand(node, rule, len(production), tokens, items, completed, get)
+            else:
+                self._expand(node, node.rule, node.dot, tokens, items, completed, get)
+
+        return root
+
+    def _expand(self, node: ForestNode, rule: int, dot: int, tokens: List[Node], items: List[Set[EarleyItem]],
+                completed: List[Set[Tuple[Symbol, int]]], get: Callable[..., ForestNode]):
+        """
+        Add to a node every derivation of the first symbols of a rule from its span.
+        :param node: The node to add derivations to.
+        :param rule: The index of the rule.
+        :param dot: How many symbols of the rule to derive.
+        :param tokens: The terminals of the sentence.
+        :param items: The item sets from the recognizer.
+        :param completed: The completed (symbol, origin) pairs from the recognizer.
+        :param get: Looks up or creates the node for a symbol or a rule prefix.
+        :return: None
+        """
+        lhs, start, end = node.symbol, node.start, node.end
+        if dot == 0:
+            node.alternatives.append((rule, ()))
+            return
+
+        last = self._grammar[lhs][rule][dot - 1]
+        if not self._grammar[last]:
+            splits = [end - 1] if end > start and tokens[end - 1].symbol == last else []
+        else:
+            splits = [k for k in range(start, end + 1) if (last, k) in completed[end]]
+
+        for k in splits:
+            if dot == 1:
+                if k == start:
+                    node.alternatives.append((rule, (get(last, k, end),)))
+            elif (lhs, rule, dot - 1, start) in items[k]:
+                node.alternatives.append((rule, (get(lhs, start, k, rule, dot - 1), get(last, k, end))))
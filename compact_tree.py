@@ -0,0 +1,310 @@
+"""
+A compact, array-backed parse tree representation.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+A CompactTree stores a parse tree as parallel arrays indexed by node, in pre-order: the symbol of every node,
+the index of its parent and the span of tokens it covers. It serializes to bracketed text, JSON, or a binary
+format whose arrays are read back without copying, and converts back to Node objects only on demand.
+
+:date: 10/16/2026 19:05
+"""
+
+from typing import *
+from array import array
+import json
+import struct
+import sys
+
+from grammar import Symbol, Node
+
+
+BINARY_MAGIC = b'SRT\x02'
+_HEADER = struct.Struct('<4sIIII')  # Magic, number of nodes, labels and words, and the length of the text section
+
+
+def _label_ids(names: Iterable[str]) -> List[int]:
+    """
+    Resolve the labels of a deserialized tree. Serialized trees may come from untrusted input, so unknown names are
+    rejected rather than interned.
+    :param names: Symbol names.
+    :return: The ids of the symbols, in the same order.
+    """
+    ids = []
+    for name in names:
+        sym = Symbol.lookup(name)
+        if sym is None:
+            raise ValueError(f'Unknown symbol in parse tree: {name!r}')
+        ids.append(sym.id)
+    return ids
+
+
+class CompactTree:
+    """
+    A parse tree as parallel arrays. Node 0 is the root, and every node comes before its descendants.
+    Leaves are the tokens of the sentence; the leaf of token i covers the span (i, i + 1).
+    """
+
+    __slots__ = ('symbols', 'parents', 'starts', 'ends', 'words', '_children')
+
+    def __init__(self, symbols: Sequence[int], parents: Sequence[int], starts: Sequence[int], ends: Sequence[int],
+                 words: Sequence[str]):
+        """
+        Wrap the arrays of a tree. Use from_node() or one of the deserializers rather than calling this directly.
+        :param symbols: The Symbol id of every node.
+        :param parents: The index of the parent of every node, -1 for the root.
+        :param starts: The index of the first token covered by every node.
+        :param ends: The index one past the last token covered by every node.
+        :param words: The words of the sentence, in order.
+        """
+        self.symbols = symbols
+        self.parents = parents
+        self.starts = starts
+        self.ends = ends
+        self.words = words
+        self._children = None  # Per node, the indices of its children. Built on first use.
+
+    @classmethod
+    def from_node(cls, root: Node) -> 'CompactTree':
+        """
+        Flatten a tree of Nodes. Leaves are the Nodes that have a value, i.e. the input tokens.
+        :param root: The root of the tree.
+        :return: A new CompactTree.
+        """
+        symbols, parents, starts, ends = array('i'), array('i'), array('i'), array('i')
+        words = []
+        stack = [(root, -1)]
+        while stack:
+            node, parent = stack.pop()
+            symbols.append(node.symbol.id)
+            parents.append(parent)
+            starts.append(len(words))
+            if not node.components and node.value is not None:
+                words.append(node.value)
+            else:
+                index = len(symbols) - 1
+                stack.extend((child, index) for child in reversed(node.components))
+            ends.append(len(words))
+
+        # Descendants come after their ancestors, so walking backwards extends every span before it is used.
+        for i in range(len(symbols) - 1, 0, -1):
+            if ends[i] > ends[parents[i]]:
+                ends[parents[i]] = ends[i]
+
+        return cls(symbols, parents, starts, ends, words)
+
+    @classmethod
+    def empty(cls) -> 'CompactTree':
+        """
+        :return: A tree with no nodes, e.g. to stand for a failed parse.
+        """
+        return cls(array('i'), array('i'), array('i'), array('i'), [])
+
+    def __len__(self):
+        """
+        :return: The number of nodes in the tree.
+        """
+        return len(self.symbols)
+
+    def symbol(self, index: int) -> Symbol:
+        """
+        :param index: A node index.
+        :return: The symbol of the node.
+        """
+        return Symbol.from_id(self.symbols[index])
+
+    def span(self, index: int) -> Tuple[int, int]:
+        """
+        :param index: A node index.
+        :return: The indices of the first token covered by the node and of the token after the last one.
+        """
+        return self.starts[index], self.ends[index]
+
+    def children(self, index: int) -> List[int]:
+        """
+        :param index: A node index.
+        :return: The indices of the children of the node, in order.
+        """
+        if self._children is None:
+            self._children = [[] for _ in range(len(self.symbols))]
+            for i in range(1, len(self.symbols)):
+                self._children[self.parents[i]].append(i)
+        return self._children[index]
+
+    def is_leaf(self, index: int) -> bool:
+        """
+        :param index: A node index.
+        :return: Whether the node is a token of the sentence.
+        """
+        # Only a leaf covers a single token without having a child that covers it.
+        return self.ends[index] - self.starts[index] == 1 and \
+            (index + 1 == len(self.symbols) or self.parents[index + 1] != index)
+
+    def to_node(self, index: int = 0) -> Node:
+        """
+        Convert a subtree back to Node objects.
+        :param index: The root of the subtree. The whole tree by default.
+        :return: The root Node.
+        """
+        parents = self.parents
+        root = self._make_node(index)
+        nodes = {index: root}
+        # A subtree is a contiguous run of nodes in pre-order, which ends at the first node whose parent is outside it.
+        i = index + 1
+        while i < len(parents) and parents[i] >= index:
+            nodes[i] = self._make_node(i)
+            nodes[parents[i]].components.append(nodes[i])
+            i += 1
+        return root
+
+    def _make_node(self, index: int) -> Node:
+        """
+        :param index: A node index.
+        :return: A Node with the symbol of the node, and its word if it is a leaf, but no components.
+        """
+        sym = Symbol.from_id(self.symbols[index])
+        return Node(sym, self.words[self.starts[index]]) if self.is_leaf(index) else Node(sym)
+
+    def to_brackets(self) -> str:
+        """
+        Render the tree in Penn Treebank bracketed notation, e.g. (S (NP (PRP We)) (VP (V swim))).
+        :return: A single line of text.
+        """
+        parts = []
+        depth = []  # Indices of the nodes whose brackets are open
+        for i in range(len(self.symbols)):
+            while depth and depth[-1] != self.parents[i]:
+                depth.pop()
+                parts.append(')')
+            if parts:
+                parts.append(' ')
+            name = Symbol.from_id(self.symbols[i]).name
+            if self.is_leaf(i):
+                word = self.words[self.starts[i]]
+                # Brackets in words are escaped the Penn Treebank way.
+                parts.append(f'({name} {word.replace("(", "-LRB-").replace(")", "-RRB-")})')
+            else:
+                parts.append(f'({name}')
+                depth.append(i)
+        parts.append(')' * len(depth))
+        return ''.join(parts)
+
+    def _labels(self) -> Tuple[List[str], List[int]]:
+        """
+        Number the distinct symbols of the tree, as symbol ids are only meaningful within one process.
+        :return: The names of the distinct symbols, and the label index of every node.
+        """
+        numbering = {}
+        indices = [numbering.setdefault(sym_id, len(numbering)) for sym_id in self.symbols]
+        return [Symbol.from_id(sym_id).name for sym_id in numbering], indices
+
+    def to_dict(self) -> Dict[str, list]:
+        """
+        :return: The tree as a JSON-compatible dictionary of parallel arrays.
+        """
+        labels, indices = self._labels()
+        return {'labels': labels, 'nodes': indices, 'parents': list(self.parents), 'starts': list(self.starts),
+                'ends': list(self.ends), 'words': list(self.words)}
+
+    def to_json(self) -> str:
+        """
+        Serialize the tree as a JSON object of parallel arrays.
+        :return: The JSON text.
+        """
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, text: str) -> 'CompactTree':
+        """
+        Deserialize a tree written by to_json().
+        :param text: The JSON text.
+        :return: A new CompactTree.
+        """
+        return cls.from_dict(json.loads(text))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, list]) -> 'CompactTree':
+        """
+        Rebuild a tree from the output of to_dict(). The labels must name existing symbols, e.g. of a loaded grammar.
+        :param data: The dictionary.
+        :return: A new CompactTree.
+        """
+        ids = _label_ids(data['labels'])
+        return cls(array('i', [ids[i] for i in data['nodes']]), array('i', data['parents']),
+                   array('i', data['starts']), array('i', data['ends']), data['words'])
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the tree in a binary format: a header, four little-endian int32 arrays, the UTF-8 byte length of
+        every symbol name and word as another int32 array, then the names and words themselves. Trees can be
+        concatenated and read back one by one with read().
+        :return: The serialized tree.
+        """
+        labels, indices = self._labels()
+        # Words can contain any character, so the strings are delimited by their lengths rather than a separator.
+        strings = [s.encode() for s in labels + list(self.words)]
+        text = b''.join(strings)
+        arrays = [array('i', indices), self.parents, self.starts, self.ends, array('i', map(len, strings))]
+        if sys.byteorder == 'big':
+            arrays = [array('i', a) for a in arrays]
+            for a in arrays:
+                a.byteswap()
+        header = _HEADER.pack(BINARY_MAGIC, len(self.symbols), len(labels), len(self.words), len(text))
+        return b''.join([header] + [bytes(a) for a in arrays] + [text])
+
+    @classmethod
+    def from_bytes(cls, data: Union[bytes, bytearray, memoryview]) -> 'CompactTree':
+        """
+        Deserialize a tree written by to_bytes(). On little-endian machines the parent and span arrays are views
+        into the given buffer rather than copies. The labels must name existing symbols, e.g. of a loaded grammar.
+        :param data: The serialized tree, possibly followed by more data.
+        :return: A new CompactTree.
+        """
+        view = memoryview(data)
+        magic, n, n_labels, n_words, text_len = _HEADER.unpack_from(view)
+        if magic != BINARY_MAGIC:
+            raise ValueError('Not a serialized parse tree')
+
+        offset = _HEADER.size
+        arrays = []
+        for size in (n, n, n, n, n_labels + n_words):
+            chunk = view[offset:offset + 4 * size]
+            if len(chunk) < 4 * size:
+                raise ValueError('Truncated parse tree')
+            if sys.byteorder == 'big':
+                chunk = array('i', chunk.tobytes())
+                chunk.byteswap()
+            else:
+                chunk = chunk.cast('i')
+            arrays.append(chunk)
+            offset += 4 * size
+
+        text = bytes(view[offset:offset + text_len])
+        if len(text) < text_len or sum(arrays[4]) != text_len:
+            raise ValueError('Truncated parse tree')
+        strings = []
+        start = 0
+        for length in arrays[4]:
+            strings.append(text[start:start + length].decode())
+            start += length
+        ids = _label_ids(strings[:n_labels])
+        words = strings[n_labels:]
+        return cls(array('i', [ids[i] for i in arrays[0]]), arrays[1], arrays[2], arrays[3], words)
+
+    @classmethod
+    def read(cls, fp: BinaryIO) -> Optional['CompactTree']:
+        """
+        Read the next tree from a stream of trees written with to_bytes().
+        :param fp: A binary file or pipe.
+        :return: The tree, or None at the end of the stream.
+        """
+        header = fp.read(_HEADER.size)
+        if not header:
+            return None
+        if len(header) < _HEADER.size:
+            raise EOFError('Truncated parse tree header')
+        _, n, n_labels, n_words, text_len = _HEADER.unpack(header)
+        size = 16 * n + 4 * (n_labels + n_words) + text_len
+        body = fp.read(size)
+        if len(body) < size:
+            raise EOFError('Truncated parse tree')
+        return cls.from_bytes(header + body)
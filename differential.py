@@ -0,0 +1,384 @@
+"""
+Differential testing of the parsing engines on generated sentences.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+Sentences are derived at random from the grammar, and each is perturbed by deleting, inserting, replacing or swapping
+tokens. The chart engine, which accepts exactly the sentences of the grammar, decides which of them are grammatical.
+Every sentence is then parsed by the reference SRParser and by each variant, and the following properties are checked:
+- The chart engine accepts every generated sentence.
+- No engine accepts an ungrammatical sentence, raises an exception, or returns a tree that is not a derivation of
+  the grammar with the words of the sentence as its leaves.
+- Exact variants, which only change how SRParser does its work, return the same tree or fail at the same token as
+  the reference. The other engines may accept fewer or more sentences, but return the same tree where both accept.
+
+Sentences that violate a property are shrunk to a minimal counterexample by deleting tokens. The time every engine
+spends parsing is recorded in the same run, so a change can be checked for correctness and speed at once.
+
+:date: 10/16/2026 23:30
+"""
+import argparse
+import json
+import random
+import time
+from typing import *
+
+from grammar import Grammar, Node
+from shift_reduce_parser import SRParser, ParseSuccess, ParseFail
+from lr_parser import LRParser
+from chart_parser import ChartParser
+from grammar_transform import transform
+from parse_cache import ParseCache
+from tagger import TaggingStage, TaggedSentence
+
+
+DEFAULT_GRAMMAR = './grammars/advanced_grammar.json'
+REFERENCE = 'tree'
+ORACLE = 'chart'
+
+# The kinds of violations
+REJECTED = 'rejects a generated sentence'
+ACCEPTED = 'accepts an ungrammatical sentence'
+RAISED = 'raises an exception'
+INVALID = 'returns an invalid tree'
+MISMATCH = 'differs from the reference'
+
+
+class Variant(NamedTuple):
+    """
+    A parser configuration to compare against the reference.
+    """
+
+    build: Callable[[Grammar, TaggingStage], Any]  # Creates the parser for a grammar
+    exact: bool  # Whether it must reproduce every outcome of the reference, or only its trees
+
+
+class _Streamed:
+    """
+    Parses sentences by pushing them one token at a time into a stream.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+
+    def parse(self, sentence: TaggedSentence):
+        stream = self.parser.stream()
+        for token in sentence:
+            if not stream.push(token):
+                break
+        return stream.finalize()
+
+
+VARIANTS = {
+    'tree-nopredict': Variant(lambda g, t: SRParser(g, tagging=t, predict=False), True),
+    'tree-nopool': Variant(lambda g, t: SRParser(g, tagging=t, frame_pool=0), True),
+    'tree-transform': Variant(lambda g, t: SRParser(transform(g), tagging=t), True),
+    'tree-cache': Variant(lambda g, t: SRParser(g, tagging=t, result_cache=ParseCache(1024)), True),
+    'tree-stream': Variant(lambda g, t: _Streamed(SRParser(g, tagging=t)), True),
+    'lr': Variant(lambda g, t: LRParser(g, tagging=t), False),
+    'lr-transform': Variant(lambda g, t: LRParser(transform(g), tagging=t), False),
+}
+
+
+def perturb(sentence: List[str], terminals: List[str], rng) -> List[str]:
+    """
+    Make a random small change to a sentence.
+    :param sentence: The terminals of a sentence.
+    :param terminals: The terminals to insert or replace with.
+    :param rng: A random.Random-like source of randomness.
+    :return: A new sentence with one token deleted, inserted, replaced, or swapped with its neighbor.
+    """
+    result = list(sentence)
+    kind = rng.choice(('delete', 'insert', 'replace', 'swap') if len(result) > 1 else ('insert', 'replace'))
+    if kind == 'insert':
+        result.insert(rng.randrange(len(result) + 1), rng.choice(terminals))
+    elif kind == 'delete':
+        del result[rng.randrange(len(result))]
+    elif kind == 'replace':
+        result[rng.randrange(len(result))] = rng.choice(terminals)
+    else:
+        i = rng.randrange(len(result) - 1)
+        result[i], result[i + 1] = result[i + 1], result[i]
+    return result
+
+
+def corpus(grammar: Grammar, count: int, max_depth: int = 8, perturbations: int = 2,
+           seed: int = 0) -> List[Tuple[List[str], bool]]:
+    """
+    Generate the sentences to test.
+    :param grammar: The grammar to derive sentences from.
+    :param count: The number of sentences to derive.
+    :param max_depth: The derivation depth after which the shortest rules are preferred.
+    :param perturbations: The number of perturbed copies of every derived sentence.
+    :param seed: Seed of the random generator, for repeatable runs.
+    :return: (terminals, whether it was derived) pairs. Perturbed sentences may or may not be grammatical.
+    """
+    rng = random.Random(seed)
+    terminals = [str(t) for t in grammar.terminals()]
+    result = []
+    for _ in range(count):
+        sentence = [str(t) for t in grammar.generate(rng, max_depth)]
+        result.append((sentence, True))
+        result.extend((perturb(sentence, terminals, rng), False) for _ in range(perturbations))
+    return result
+
+
+def tagged(sentence: List[str]) -> TaggedSentence:
+    """
+    :return: The sentence as (word, tag) pairs, with a distinct word per token.
+    """
+    return [(f'w{i}', t) for i, t in enumerate(sentence)]
+
+
+def check_tree(grammar: Grammar, root: Node, sentence: TaggedSentence) -> Optional[str]:
+    """
+    Check that a parse tree is a derivation of the grammar yielding the sentence.
+    :param grammar: The grammar the tree should be derived from.
+    :param root: The tree.
+    :param sentence: The sentence that was parsed.
+    :return: A description of the first problem found, or None.
+    """
+    if root.symbol != grammar.start_symbol:
+        return f'root is {root.symbol}'
+    leaves = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if not node.components:
+            if grammar[node.symbol]:
+                return f'{node.symbol} has no components'
+            leaves.append((node.value, str(node.symbol)))
+            continue
+        rhs = tuple(c.symbol for c in node.components)
+        if rhs not in grammar[node.symbol]:
+            return f'{node.symbol} -> {" ".join(map(str, rhs))} is not a rule'
+        stack.extend(reversed(node.components))
+    if leaves != list(sentence):
+        return 'leaves differ from the sentence'
+    return None
+
+
+def outcome(result) -> Union[str, Tuple]:
+    """
+    :param result: A ParseSuccess, a ParseFail or an exception.
+    :return: A comparable summary: the tree in brackets, or how the parse failed.
+    """
+    if isinstance(result, ParseSuccess):
+        return result.compact().to_brackets()
+    if isinstance(result, ParseFail):
+        return 'fail', result.index, result.reason
+    return 'raised', type(result).__name__
+
+
+class Harness:
+    """
+    Parses sentences with every engine, checks the properties and keeps the timings.
+    """
+
+    def __init__(self, grammar: Grammar, variants: Dict[str, Variant] = None):
+        """
+        Create the parsers.
+        :param grammar: The grammar to test with.
+        :param variants: The configurations to compare against the reference. Defaults to VARIANTS.
+        """
+        self.grammar = grammar
+        self.variants = VARIANTS if variants is None else variants
+        self.parsers = {ORACLE: ChartParser(grammar, tagging=TaggingStage()),
+                        REFERENCE: SRParser(grammar, tagging=TaggingStage())}
+        for name, variant in self.variants.items():
+            self.parsers[name] = variant.build(grammar, TaggingStage())
+        self.seconds = {name: 0.0 for name in self.parsers}
+        self.accepted = {name: 0 for name in self.parsers}
+        self.sentences = self.tokens = self.grammatical = 0
+
+    def _parse(self, name: str, sentence: TaggedSentence):
+        start = time.perf_counter()
+        try:
+            result = self.parsers[name].parse(sentence)
+        except Exception as e:
+            result = e
+        self.seconds[name] += time.perf_counter() - start
+        self.accepted[name] += isinstance(result, ParseSuccess)
+        return result
+
+    def check(self, sentence: List[str], derived: bool) -> List[Tuple[str, str, str]]:
+        """
+        Parse a sentence with every engine and check the properties.
+        :param sentence: The terminals of the sentence.
+        :param derived: Whether the sentence was derived from the grammar, and must be grammatical.
+        :return: The violations found, as (engine, kind, details) triples.
+        """
+        words = tagged(sentence)
+        self.sentences += 1
+        self.tokens += len(words)
+        results = {name: self._parse(name, words) for name in self.parsers}
+        grammatical = isinstance(results[ORACLE], ParseSuccess)
+        self.grammatical += grammatical
+
+        violations = []
+        if derived and not grammatical:
+            violations.append((ORACLE, REJECTED, ''))
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                violations.append((name, RAISED, f'{type(result).__name__}: {result}'))
+            elif isinstance(result, ParseSuccess):
+                if not grammatical:
+                    violations.append((name, ACCEPTED, ''))
+                problem = check_tree(self.grammar, result.root, words)
+                if problem is not None:
+                    violations.append((name, INVALID, problem))
+
+        expected = outcome(results[REFERENCE])
+        for name, variant in self.variants.items():
+            got = outcome(results[name])
+            if got != expected and (variant.exact or isinstance(got, str) and isinstance(expected, str)):
+                violations.append((name, MISMATCH, f'{got} instead of {expected}'))
+        return violations
+
+    def shrink(self, sentence: List[str], engine: str, kind: str) -> List[str]:
+        """
+        Delete tokens from a sentence for as long as the same engine still violates the same property.
+        :param sentence: A sentence with a violation.
+        :param engine: The engine violating the property.
+        :param kind: The property violated.
+        :return: The shortest sentence found.
+        """
+        changed = True
+        while changed:
+            changed = False
+            for i in range(len(sentence)):
+                candidate = sentence[:i] + sentence[i + 1:]
+                if (engine, kind) in ((name, found) for name, found, _ in self.check(candidate, False)):
+                    sentence = candidate
+                    changed = True
+                    break
+        return sentence
+
+    def throughput(self) -> Dict[str, Dict[str, float]]:
+        """
+        :return: Per engine, the share of sentences accepted, sentences and tokens parsed per second, and the time
+            taken relative to the reference.
+        """
+        reference = self.seconds[REFERENCE]
+        return {name: {'accepted': self.accepted[name] / self.sentences if self.sentences else 0.0,
+                       'sentences_per_sec': self.sentences / seconds if seconds else 0.0,
+                       'tokens_per_sec': self.tokens / seconds if seconds else 0.0,
+                       'relative_time': seconds / reference if reference else 0.0}
+                for name, seconds in self.seconds.items()}
+
+
+def run(grammar: Grammar, count: int, max_depth: int = 8, perturbations: int = 2, seed: int = 0,
+        variants: Dict[str, Variant] = None, shown: int = 5) -> Dict:
+    """
+    Test the engines on generated sentences.
+    :param grammar: The grammar to test with.
+    :param count: The number of sentences to derive.
+    :param max_depth: The derivation depth after which the shortest rules are preferred.
+    :param perturbations: The number of perturbed copies of every derived sentence.
+    :param seed: Seed of the random generator.
+    :param variants: The configurations to compare against the reference. Defaults to VARIANTS.
+    :param shown: How many different violations to shrink a counterexample of.
+    :return: A report of the violations, counterexamples and throughput.
+    """
+    harness = Harness(grammar, variants)
+    violations = {}
+    counterexamples = {}  # (kind, details) -> counterexample, so that a bug shared by several engines is shown once
+    for sentence, derived in corpus(grammar, count, max_depth, perturbations, seed):
+        for engine, kind, details in harness.check(sentence, derived):
+            key = f'{engine} {kind}'
+            violations[key] = violations.get(key, 0) + 1
+            if (kind, details) in counterexamples:
+                example = counterexamples[kind, details]
+                if example['sentence'] == sentence and engine not in example['engines']:
+                    example['engines'].append(engine)
+            elif len(counterexamples) < shown:
+                counterexamples[kind, details] = {'engines': [engine], 'kind': kind, 'details': details,
+                                                  'sentence': sentence}
+
+    # Shrinking parses again, so it is done after the timings are taken.
+    report = {'sentences': harness.sentences, 'tokens': harness.tokens, 'grammatical': harness.grammatical,
+              'violations': violations, 'engines': harness.throughput()}
+    for example in counterexamples.values():
+        example['shrunk'] = harness.shrink(example['sentence'], example['engines'][0], example['kind'])
+    report['counterexamples'] = list(counterexamples.values())
+    return report
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Find violations and slowdowns that were not in a baseline run, e.g. of the code before a change.
+    :param report: The current report.
+    :param baseline: The report of an earlier run with the same options.
+    :param tolerance: Allowed relative loss of throughput, e.g. 0.1 for 10%.
+    :return: A description of every regression.
+    """
+    regressions = []
+    for key, n in report['violations'].items():
+        if n > baseline['violations'].get(key, 0):
+            regressions.append(f'{key}: {baseline["violations"].get(key, 0)} -> {n} sentences')
+    for name, metrics in report['engines'].items():
+        old = baseline['engines'].get(name)
+        if old is not None and metrics['sentences_per_sec'] < old['sentences_per_sec'] * (1 - tolerance):
+            regressions.append(f'{name}: throughput {old["sentences_per_sec"]:.1f} -> '
+                               f'{metrics["sentences_per_sec"]:.1f} sent/s')
+    return regressions
+
+
+def print_report(report: Dict):
+    """
+    Print a report of run() in human readable form.
+    :param report: The report.
+    :return: None
+    """
+    print(f'{report["sentences"]} sentences, {report["tokens"]} tokens, {report["grammatical"]} grammatical')
+    print(f'{"engine":>15} {"accepted":>9} {"sent/s":>10} {"tokens/s":>10} {"time":>6}')
+    for name, metrics in report['engines'].items():
+        print(f'{name:>15} {metrics["accepted"]:>9.1%} {metrics["sentences_per_sec"]:>10.1f} '
+              f'{metrics["tokens_per_sec"]:>10.1f} {metrics["relative_time"]:>6.2f}')
+    for key, n in report['violations'].items():
+        print(f'Violation: {key} ({n} sentences)')
+    for example in report['counterexamples']:
+        details = f': {example["details"]}' if example['details'] else ''
+        print(f'{", ".join(example["engines"])} {example["kind"]}{details}\n    {" ".join(example["sentence"])}\n'
+              f'    shrunk: {" ".join(example["shrunk"])}')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Check the parsing engines against each other on generated '
+                                                     'sentences, and measure their throughput.')
+    arg_parser.add_argument("-g", "--grammar", help="JSON file specifying the language grammar.",
+                            default=DEFAULT_GRAMMAR)
+    arg_parser.add_argument("-n", "--count", help="Number of sentences to derive.", type=int, default=500)
+    arg_parser.add_argument("-d", "--depth", help="Maximum derivation depth of sentences.", type=int, default=8)
+    arg_parser.add_argument("-p", "--perturbations", help="Number of perturbed copies of every derived sentence.",
+                            type=int, default=2)
+    arg_parser.add_argument("-s", "--seed", help="Random seed.", type=int, default=0)
+    arg_parser.add_argument("--variants", help="Configurations to compare against the reference. All by default.",
+                            nargs='+', choices=VARIANTS.keys())
+    arg_parser.add_argument("--show", help="Number of counterexamples to shrink and print.", type=int, default=5)
+    arg_parser.add_argument("-o", "--output", help="Write the report to this JSON file.")
+    arg_parser.add_argument("-b", "--baseline", help="Only fail on violations and slowdowns that are not in the "
+                                                     "report in this JSON file.")
+    arg_parser.add_argument("-t", "--tolerance", help="Allowed relative loss of throughput against the baseline.",
+                            type=float, default=0.1)
+    args = arg_parser.parse_args()
+
+    variants = None if args.variants is None else {name: VARIANTS[name] for name in args.variants}
+    report = run(Grammar(args.grammar), args.count, args.depth, args.perturbations, args.seed, variants, args.show)
+    print_report(report)
+    if args.output is not None:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as fp:
+            regressions = compare(report, json.load(fp), args.tolerance)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+        if regressions:
+            exit(1)
+    elif report['violations']:
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
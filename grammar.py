@@ -6,39 +6,126 @@ CS 799.06 Graduate Independent Study in NLP/NLU.
 :date: 06/02/2020 16:18
 """
 
+import hashlib
 import json
+import threading
+from array import array
 from typing import *
 
 
+def fingerprint(data) -> str:
+    """
+    Hash a JSON-compatible structure by content.
+    :param data: The structure.
+    :return: A hex digest, equal for equal structures.
+    """
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
 class Symbol:
     """
     Represents a symbol of a grammar.
+
+    Symbols are interned: there is exactly one Symbol per name, so constructing the same name twice yields the
+    same object. This lets equality and hashing fall back to object identity, and gives every symbol a small
+    integer id that can be used to index tables.
     """
 
-    def __init__(self, name: str):
-        self._name = name
-        self.value = None
-        self.components = []
+    __slots__ = ('_name', 'id')
+
+    _table = {}    # Name -> Symbol
+    _names = []    # Id -> name
+    _lock = threading.Lock()
+
+    def __new__(cls, name: str):
+        sym = cls._table.get(name)
+        if sym is not None:
+            return sym
+
+        with cls._lock:
+            sym = cls._table.get(name)  # Another thread might have gotten here first.
+            if sym is None:
+                sym = object.__new__(cls)
+                sym._name = name
+                sym.id = len(cls._names)
+                cls._names.append(name)
+                cls._table[name] = sym
+        return sym
+
+    @staticmethod
+    def count() -> int:
+        """
+        :return: The number of distinct symbols created so far. All ids are below this number.
+        """
+        return len(Symbol._names)
+
+    @staticmethod
+    def lookup(name: str) -> Optional['Symbol']:
+        """
+        Find the symbol of a name without creating it. Interned symbols are never freed, so names from untrusted
+        input, such as the tags of server requests, should be looked up rather than interned.
+        :param name: A symbol name.
+        :return: The Symbol, or None if no symbol has that name.
+        """
+        return Symbol._table.get(name)
+
+    @staticmethod
+    def from_id(sym_id: int) -> 'Symbol':
+        """
+        Look up a symbol by its integer id.
+        :param sym_id: An id previously assigned to a symbol.
+        :return: The Symbol.
+        """
+        return Symbol._table[Symbol._names[sym_id]]
+
+    @property
+    def name(self) -> str:
+        return self._name
 
     def __str__(self):
         return self._name
 
     def __copy__(self):
-        cpy = Symbol(self._name)
-        cpy.value = self.value
-        cpy.components = [x for x in self.components]
-        return cpy
+        return self  # There is only ever one instance per name.
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # Re-intern on unpickling instead of creating a duplicate.
+        return Symbol, (self._name,)
 
     def __repr__(self):
         return self.__str__()
 
-    def __hash__(self):
-        return hash(self._name)
 
-    def __eq__(self, other):
-        if not isinstance(other, Symbol):
-            return False
-        return self._name == other._name
+class Node:
+    """
+    A node of a parse tree: an occurrence of a grammar Symbol, with the word it was derived from (for terminals)
+    or the nodes it was reduced from (for nonterminals).
+    """
+
+    __slots__ = ('symbol', 'value', 'components')
+
+    def __init__(self, symbol: Symbol, value: str = None, components: list = None):
+        self.symbol = symbol
+        self.value = value
+        self.components = [] if components is None else components
+
+    def __str__(self):
+        return self.symbol._name
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def symbols_of(pattern: Iterable[Union[Symbol, Node]]) -> Tuple[Symbol, ...]:
+    """
+    Strip parse tree nodes down to their grammar symbols.
+    :param pattern: A sequence of Symbols and/or Nodes.
+    :return: A tuple of Symbols.
+    """
+    return tuple(x.symbol if isinstance(x, Node) else x for x in pattern)
 
 
 class Grammar:
@@ -51,17 +138,175 @@ class Grammar:
 
     def __init__(self, source_file, start_symbol="S"):
         with open(source_file, 'r') as grammar_fp:
-            self.__data = json.load(grammar_fp)
+            self._load(json.load(grammar_fp), start_symbol)
+
+    @classmethod
+    def from_data(cls, data: Dict[str, List[List[str]]], start_symbol="S") -> 'Grammar':
+        """
+        Create a grammar from an in-memory structure instead of a file.
+        :param data: Nonterminal name -> list of rules, each a list of symbol names. The JSON file layout.
+        :param start_symbol: The start symbol of the grammar.
+        :return: A new Grammar.
+        """
+        grammar = cls.__new__(cls)
+        grammar._load(data, start_symbol)
+        return grammar
+
+    def _load(self, data: Dict[str, List[List[str]]], start_symbol: str):
+        self.__data = data
         self.start_symbol = Symbol(start_symbol)
+        self.fingerprint = fingerprint([start_symbol, data])  # Identifies grammars that parse the same way
 
-        self._rules = {Grammar.ROOT_SYM: [[self.start_symbol]]}  # Needed for parsing
+        self._rules = {Grammar.ROOT_SYM: [(self.start_symbol,)]}  # Needed for parsing
 
-        # Create a sophisticated representation of the grammar.
+        # Create a sophisticated representation of the grammar. Rules are tuples, so they can be shared freely.
         for k, v in self.__data.items():
             key = Symbol(k)
             self._rules[key] = []
             for rule in v:
-                self._rules[key].append([Symbol(x) for x in rule])
+                self._rules[key].append(tuple(Symbol(x) for x in rule))
+
+        # Index every production by its right hand side. If several rules share one, the first one wins.
+        self._patterns = {}
+        for from_s, rules in self._rules.items():
+            for i, rule in enumerate(rules):
+                self._patterns.setdefault(tuple(rule), (from_s, i))
+
+        self._analyze()
+
+    def _analyze(self):
+        """
+        Precompute the nullable set, FIRST and FOLLOW sets, and the left-corner prediction table.
+        :return: None
+        """
+        # Nullable nonterminals and FIRST sets are computed together as a fixed point.
+        self.nullable = set()
+        self.first = {sym: set() for sym in self._rules}
+        changed = True
+        while changed:
+            changed = False
+            for sym, rules in self._rules.items():
+                for rule in rules:
+                    first = self.first_of(rule)
+                    if not first <= self.first[sym]:
+                        self.first[sym] |= first
+                        changed = True
+                    if sym not in self.nullable and self.is_nullable(rule):
+                        self.nullable.add(sym)
+                        changed = True
+
+        # FOLLOW sets. Only the artificial root can be followed by the end of input.
+        self.follow = {sym: set() for sym in self._rules}
+        self.follow[Grammar.ROOT_SYM].add(Grammar.RULE_END)
+        changed = True
+        while changed:
+            changed = False
+            for sym, rules in self._rules.items():
+                for rule in rules:
+                    for i, target in enumerate(rule):
+                        if target not in self._rules:
+                            continue
+                        follow = self.first_of(rule[i + 1:])
+                        if self.is_nullable(rule[i + 1:]):
+                            follow = follow | self.follow[sym]
+                        if not follow <= self.follow[target]:
+                            self.follow[target] |= follow
+                            changed = True
+
+        self.first = {sym: frozenset(first) for sym, first in self.first.items()}
+        self.follow = {sym: frozenset(follow) for sym, follow in self.follow.items()}
+
+        # For every nonterminal and terminal, the rules that could begin with that terminal.
+        # Nullable rules could begin with anything, so they are always predicted, including at the end of the input.
+        self._predict = {}
+        terminals = self.terminals() + [Grammar.RULE_END]
+        for sym, rules in self._rules.items():
+            for i, rule in enumerate(rules):
+                for terminal in self.first_of(rule):
+                    self._predict.setdefault((sym, terminal), []).append(i)
+                if self.is_nullable(rule):
+                    for terminal in terminals:
+                        self._predict.setdefault((sym, terminal), []).append(i)
+        self._predict = {key: tuple(sorted(set(rules))) for key, rules in self._predict.items()}
+
+    def first_of(self, sequence: Sequence[Symbol]) -> Set[Symbol]:
+        """
+        Compute the set of terminals that can begin a sequence of symbols.
+        :param sequence: Symbols, e.g. the right hand side of a rule or a part of it.
+        :return: A set of terminal Symbols.
+        """
+        result = set()
+        for sym in sequence:
+            if sym not in self._rules:
+                result.add(sym)
+                return result
+            result |= self.first[sym]
+            if sym not in self.nullable:
+                return result
+        return result
+
+    def is_nullable(self, sequence: Sequence[Symbol]) -> bool:
+        """
+        Test whether a sequence of symbols can derive the empty string.
+        :param sequence: Symbols, e.g. the right hand side of a rule or a part of it.
+        :return: True if every symbol of the sequence is nullable.
+        """
+        return all(sym in self.nullable for sym in sequence)
+
+    def generate(self, rng, max_depth: int = 8, sym: Symbol = None) -> List[Symbol]:
+        """
+        Derive a random sentence of terminals from the grammar.
+        :param rng: A random.Random-like source of randomness.
+        :param max_depth: Below this depth, only the rules that terminate fastest are chosen.
+        :param sym: The symbol to derive from. Defaults to the start symbol.
+        :return: A list of terminal Symbols.
+        """
+        height = self._heights()
+        result = []
+        stack = [(self.start_symbol if sym is None else sym, 0)]
+        while stack:
+            sym, depth = stack.pop()
+            rules = self[sym]
+            if not rules:
+                result.append(sym)
+                continue
+
+            if depth >= max_depth:
+                shortest = min(height[sym][i] for i in range(len(rules)))
+                rules = [r for i, r in enumerate(rules) if height[sym][i] == shortest]
+            rule = rng.choice(rules)
+            stack.extend((s, depth + 1) for s in reversed(rule))
+
+        return result
+
+    def _heights(self) -> Dict[Symbol, List[float]]:
+        """
+        For every rule, compute the height of the shallowest derivation tree it can start.
+        :return: Symbol -> per-rule heights. Rules which can never terminate have an infinite height.
+        """
+        if getattr(self, '_height_cache', None) is None:
+            best = {sym: float('inf') for sym in self._rules}
+            changed = True
+            while changed:
+                changed = False
+                for sym, rules in self._rules.items():
+                    for rule in rules:
+                        h = 1 + max((best.get(s, 0) for s in rule), default=0)
+                        if h < best[sym]:
+                            best[sym] = h
+                            changed = True
+            self._height_cache = {sym: [1 + max((best.get(s, 0) for s in rule), default=0) for rule in rules]
+                                  for sym, rules in self._rules.items()}
+        return self._height_cache
+
+    def predict(self, sym: Symbol, token: Symbol) -> Tuple[int, ...]:
+        """
+        Find the rules of a symbol that can accept a given token first.
+        :param sym: The symbol whose rules to consider.
+        :param token: The upcoming terminal.
+        :return: Indices of the matching rules, in increasing order.
+        """
+        return self._predict.get((sym, token), ())
 
     def __getitem__(self, item: Symbol):
         """
@@ -74,46 +319,300 @@ class Grammar:
 
         return self._rules[item]
 
-    def match_pattern(self, pattern: List[Symbol]) -> Union[Symbol, NoReturn]:
+    def nonterminals(self) -> List[Symbol]:
+        """
+        Get all symbols that have productions, including the artificial root.
+        :return: A list of nonterminal Symbols in declaration order.
+        """
+        return list(self._rules.keys())
+
+    def terminals(self) -> List[Symbol]:
+        """
+        Get all symbols that appear in productions but have no productions of their own.
+        :return: A list of terminal Symbols in order of first appearance.
+        """
+        result = {}
+        for rules in self._rules.values():
+            for rule in rules:
+                for sym in rule:
+                    if sym not in self._rules:
+                        result[sym] = None
+        return list(result.keys())
+
+    def find_rule(self, pattern: List[Union[Symbol, Node]]) -> Optional[Tuple[Symbol, int]]:
+        """
+        Look up the rule that produces a symbol pattern.
+        :param pattern: The right hand side to look for.
+        :return: The symbol the rule is derived from and the rule index, or None if no rule matches.
+        """
+        return self._patterns.get(symbols_of(pattern))
+
+    def match_pattern(self, pattern: List[Union[Symbol, Node]]) -> Union[Node, NoReturn]:
         """
         Reduce a symbol pattern to a singular symbol.
         :param pattern:
-        :return:
+        :return: A new parse tree Node for the symbol, or None if no rule matches.
         """
-        for from_s, rules in self._rules.items():
-            for rule in rules:
-                if rule == pattern:
-                    return from_s.__copy__()  # Important to create a copy to prevent words 'bleeding' into each other
+        match = self._patterns.get(symbols_of(pattern))
+        if match is None:
+            return None
 
-        return None
+        return Node(match[0])
+
+    def reduce_by(self, from_sym: Symbol, rule: int, pattern: List[Node]) -> Node:
+        """
+        Reduce a symbol pattern using an already known rule, without searching the grammar.
+        :param from_sym: The symbol the rule is derived from.
+        :param rule: The index of the rule among the productions of from_sym.
+        :param pattern: The nodes being reduced. They become the components of the result.
+        :return: A new parse tree Node for from_sym.
+        """
+        production = self._rules[from_sym][rule]
+        if len(production) != len(pattern) or any(a is not b.symbol for a, b in zip(production, pattern)):
+            raise ValueError(f'Pattern {pattern} does not match rule {from_sym} -> {production}')
+
+        return Node(from_sym, components=pattern)
+
+    def to_data(self) -> Dict[str, List[List[str]]]:
+        """
+        :return: The rules of the grammar in the layout of the JSON file, without the artificial root.
+        """
+        return {lhs.name: [[sym.name for sym in rule] for rule in rules]
+                for lhs, rules in self._rules.items() if lhs != Grammar.ROOT_SYM}
 
     def __str__(self):
         # TODO: If I have time make this fancy.
         return "Grammar"
 
 
+class UnmappedTagError(LookupError):
+    """
+    Raised when a Reduction with the 'error' policy is asked to reduce a tag it has no mapping for.
+    """
+
+    def __init__(self, tag: Union[Symbol, str]):
+        super().__init__(f'No reduction for POS tag {tag}')
+        self.tag = tag  # The Symbol of the tag, or only its name if it is not a symbol of any grammar or reduction
+
+    def __reduce__(self):
+        # By default the message would be passed back in as the tag, e.g. from a worker process of parse_many().
+        return UnmappedTagError, (self.tag,)
+
+
 class Reduction:
     """
     A mapping of Symbol -> Symbol reductions to adapt sophisticated POS Taggers to simple grammars.
+
+    The mapping is compiled into a dense table indexed by Symbol id, so reducing a tag is a single list lookup,
+    and whole batches of tag ids can be mapped at once. Tags the reduction does not mention are handled by its
+    unmapped policy:
+    - 'error' raises an UnmappedTagError.
+    - 'wildcard' reduces them to a single fallback terminal, UNK by default. Unless the grammar uses that terminal,
+      the parse then fails at the offending token.
+    - 'passthrough' keeps them as they are, for grammars that use some tags directly. This interns every tag seen.
     """
 
-    def __init__(self, reduction_file: str):
+    POLICIES = ('error', 'wildcard', 'passthrough')
+    UNMAPPED = -1  # Table entry of a tag that can not be reduced
+    _compile_lock = threading.Lock()
+
+    def __init__(self, reduction_file: str, unmapped: str = 'wildcard', wildcard: str = 'UNK'):
+        """
+        Load a reduction.
+        :param reduction_file: A JSON object mapping every grammar terminal to the list of tags that reduce to it.
+            A tag listed under several terminals reduces to the first one.
+        :param unmapped: One of POLICIES, the treatment of tags the file does not mention.
+        :param wildcard: The terminal unmapped tags reduce to under the 'wildcard' policy.
+        """
+        if unmapped not in self.POLICIES:
+            raise ValueError(f'Unknown unmapped tag policy {unmapped!r}, expected one of {self.POLICIES}')
+
         with open(reduction_file, 'r') as fp:
             self.__raw_data = json.load(fp)
+        self.unmapped = unmapped
+        self.wildcard = Symbol(wildcard)
+        # Identifies reductions that map tags the same way
+        self.fingerprint = fingerprint([self.__raw_data, unmapped, wildcard if unmapped == 'wildcard' else None])
 
         # In order to be useful, we transform the dictionary
         self.data = {}
         for k, vs in self.__raw_data.items():
             for v in vs:
-                if v not in self.data:
+                if Symbol(v) not in self.data:
                     self.data[Symbol(v)] = Symbol(k)
 
-    def __getitem__(self, item: Symbol):
+        self._symbols = []      # Tag id -> reduced Symbol, or None if unmapped under the 'error' policy
+        self._ids = array('i')  # Tag id -> reduced Symbol id, or UNMAPPED
+        self._compile()
+
+    def __getstate__(self):
+        # Symbol ids differ between processes, so the tables are rebuilt rather than pickled.
+        state = self.__dict__.copy()
+        state['_symbols'], state['_ids'] = [], array('i')
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._compile()
+
+    def _compile(self):
+        """
+        Extend the lookup tables to cover every Symbol interned so far. Only the new symbols are added.
+        :return: None
+        """
+        data = self.data
+        with self._compile_lock:
+            symbols, ids = self._symbols, self._ids
+            for sym_id in range(len(symbols), Symbol.count()):
+                tag = Symbol.from_id(sym_id)
+                sym = data[tag] if tag in data else self._unmapped(tag)
+                # Readers check the length of _symbols, so the id must be in place before the symbol is.
+                ids.append(self.UNMAPPED if sym is None else sym.id)
+                symbols.append(sym)
+
+    def _unmapped(self, tag: Union[Symbol, str]) -> Optional[Symbol]:
+        """
+        :param tag: A tag the reduction does not mention, or the name of a tag that is not a symbol at all.
+        :return: What the unmapped policy reduces the tag to, or None under the 'error' policy.
+        """
+        if self.unmapped == 'wildcard':
+            return self.wildcard
+        if self.unmapped == 'passthrough':
+            return Symbol(tag) if isinstance(tag, str) else tag
+        return None
+
+    def __getitem__(self, item: Symbol) -> Symbol:
         """
         Given a Symbol, find a symbol to which it reduces.
         :param item: The symbol to reduce.
-        :return:
+        :return: The reduced symbol.
+        """
+        symbols = self._symbols
+        if item.id >= len(symbols):
+            self._compile()  # The tag was interned after the tables were built.
+        sym = symbols[item.id]
+        if sym is None:
+            raise UnmappedTagError(item)
+        return sym
+
+    def reduce_tags(self, tags: Iterable[str]) -> List[Symbol]:
+        """
+        Reduce the tags of a sentence.
+        :param tags: POS tag names, in sentence order.
+        :return: The terminal each tag reduces to.
         """
-        return self.data[item].__copy__()
+        symbols = self._symbols
+        lookup = Symbol.lookup
+        reduced = []
+        for tag in tags:
+            sym = lookup(tag)
+            if sym is None:
+                # Not a symbol of any grammar or reduction, so certainly unmapped. Looking it up does not intern it.
+                target = self._unmapped(tag)
+                if target is None:
+                    raise UnmappedTagError(tag)
+            else:
+                if sym.id >= len(symbols):
+                    self._compile()  # The tag was interned after the tables were built.
+                target = symbols[sym.id]
+                if target is None:
+                    raise UnmappedTagError(sym)
+            reduced.append(target)
+        return reduced
+
+    def map_ids(self, tag_ids: Iterable[int]) -> array:
+        """
+        Reduce a flat batch of tag ids. A batch of sentences can be mapped in one call by concatenating their tags,
+        as in a CompactTree, and splitting the result at the same offsets.
+        :param tag_ids: Symbol ids of POS tags, e.g. an array('i').
+        :return: The Symbol ids of the terminals they reduce to, as an array('i').
+        """
+        ids = self._ids
+        if not isinstance(tag_ids, (array, list, tuple)):
+            tag_ids = array('i', tag_ids)
+        if tag_ids and max(tag_ids) >= len(ids):
+            self._compile()
+
+        reduced = array('i', map(ids.__getitem__, tag_ids))
+        if reduced and min(reduced) == self.UNMAPPED:
+            raise UnmappedTagError(Symbol.from_id(tag_ids[reduced.index(self.UNMAPPED)]))
+        return reduced
+
+    def map_batch(self, sentences: Iterable[Sequence[str]]) -> List[List[Symbol]]:
+        """
+        Reduce the tags of many sentences at once.
+        :param sentences: Per sentence, the POS tag names in sentence order.
+        :return: Per sentence, the terminals the tags reduce to.
+        """
+        flat = []
+        offsets = [0]
+        for tags in sentences:
+            flat.extend(tags)
+            offsets.append(len(flat))
+
+        reduced = self.reduce_tags(flat)
+        return [reduced[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    def targets(self) -> List[Symbol]:
+        """
+        Get all symbols that some tag reduces to.
+        :return: A list of Symbols in declaration order.
+        """
+        return list(dict.fromkeys(self.data.values()).keys())
+
+    def conflicts(self) -> Dict[Symbol, List[Symbol]]:
+        """
+        Find tags listed under more than one terminal. Only the first of their terminals is used.
+        :return: Each such tag and all of its terminals, in declaration order.
+        """
+        listed = {}
+        for k, vs in self.__raw_data.items():
+            for v in vs:
+                listed.setdefault(Symbol(v), []).append(Symbol(k))
+        return {tag: targets for tag, targets in listed.items() if len(targets) > 1}
+
+
+def validate(grammar: Grammar, reduction: Reduction = None) -> List[str]:
+    """
+    Look for mistakes in a grammar and its reduction that do not prevent parsing but are likely unintended.
+    :param grammar: The grammar to check.
+    :param reduction: The reduction meant to be used with the grammar, if any.
+    :return: A list of human-readable warnings. Empty if nothing suspicious was found.
+    """
+    warnings = []
+    if not grammar[grammar.start_symbol]:
+        warnings.append(f'Start symbol {grammar.start_symbol} has no productions')
+
+    # Every nonterminal should be reachable from the start symbol.
+    reachable = {Grammar.ROOT_SYM}
+    frontier = [Grammar.ROOT_SYM]
+    while frontier:
+        for rule in grammar[frontier.pop()]:
+            for sym in rule:
+                if sym not in reachable:
+                    reachable.add(sym)
+                    frontier.append(sym)
+    for sym in grammar.nonterminals():
+        if sym not in reachable:
+            warnings.append(f'Nonterminal {sym} is not reachable from {grammar.start_symbol}')
+
+    for sym in grammar.nonterminals():
+        for i, rule in enumerate(grammar[sym]):
+            if not rule:
+                warnings.append(f'Rule {sym} #{i} is empty')
+
+    if reduction is not None:
+        terminals = set(grammar.terminals())
+        targets = set(reduction.targets())
+        for sym in reduction.targets():
+            if sym not in terminals:
+                warnings.append(f'Reduction target {sym} is not used by the grammar')
+        for sym in grammar.terminals():
+            if sym not in targets:
+                warnings.append(f'Terminal {sym} is not produced by any reduction')
+        for tag, listed in reduction.conflicts().items():
+            warnings.append(f'Tag {tag} is listed under {", ".join(map(str, listed))}; only {listed[0]} is used')
+
+    return warnings
 
 
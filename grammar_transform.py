@@ -0,0 +1,229 @@
+"""
+Load-time grammar transformations that shrink the work of the parsers.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+Left-factoring merges the rules of a symbol that start with the same symbols, e.g. NP -> DET N PP | DET N becomes
+NP -> DET N NP~1 with NP~1 -> PP | <empty>, so that one rule is tracked while the shared prefix is parsed instead of
+several. Unit rule elimination replaces a rule whose right hand side is a single nonterminal by the productions of
+that nonterminal, which saves a reduction and a state frame per unit rule.
+
+Both only change the grammar the parsers run on. Every rule of the transformed grammar carries a template of the
+original nodes it stands for, which TransformedGrammar.reduce_by() builds, so parse trees come out in the shape of
+the original rules.
+
+:date: 10/16/2026 20:45
+"""
+
+from typing import *
+
+from grammar import Grammar, Symbol, Node, fingerprint
+
+# A template describes the original nodes built from the nodes matched by a transformed rule. It is a (symbol, items)
+# pair standing for one node, where every item is the index of a matched node to use as a component, a
+# (SPLICE, index) pair for a matched synthetic node to be replaced by its own components, or a nested template.
+SPLICE = '*'
+Template = Tuple[Union[str, Symbol], list]
+Rules = Dict[str, List[Tuple[Tuple[str, ...], Optional[Template]]]]  # Name -> (right hand side, template or None)
+
+
+def _fresh_name(base: str, taken: Set[str]) -> str:
+    """
+    :param base: The nonterminal a new symbol is split from.
+    :param taken: Every symbol name in use. The new name is added to it.
+    :return: A name for a synthetic nonterminal, e.g. NP~1.
+    """
+    n = 1
+    while f'{base}~{n}' in taken:
+        n += 1
+    taken.add(f'{base}~{n}')
+    return f'{base}~{n}'
+
+
+def left_factor(rules: Rules, taken: Set[str]) -> Set[str]:
+    """
+    Left-factor every nonterminal in place, until no two rules of a nonterminal start with the same symbol.
+    Rules sharing a prefix are replaced by a single rule ending in a new synthetic nonterminal, at the position of the
+    first of them, and the synthetic nonterminal derives their remainders.
+    :param rules: The grammar. Templates must all be None yet.
+    :param taken: Every symbol name in use.
+    :return: The names of the synthetic nonterminals created.
+    """
+    synthetic = set()
+    work = list(rules)
+    while work:
+        lhs = work.pop(0)
+        groups = {}  # First symbol -> indices of the rules starting with it, in order
+        for i, (rhs, _) in enumerate(rules[lhs]):
+            if rhs:
+                groups.setdefault(rhs[0], []).append(i)
+
+        factored = {}  # Index of the first rule of a group -> the rule replacing the group
+        dropped = set()
+        for indices in groups.values():
+            if len(indices) < 2:
+                continue
+            members = [rules[lhs][i][0] for i in indices]
+            prefix = 1
+            while all(len(rhs) > prefix and rhs[prefix] == members[0][prefix] for rhs in members):
+                prefix += 1
+
+            name = _fresh_name(lhs, taken)
+            synthetic.add(name)
+            rules[name] = [(rhs[prefix:], None) for rhs in members]
+            work.append(name)
+
+            factored[indices[0]] = (members[0][:prefix] + (name,), (lhs, list(range(prefix)) + [(SPLICE, prefix)]))
+            dropped.update(indices[1:])
+
+        if factored:
+            rules[lhs] = [factored.get(i, rule) for i, rule in enumerate(rules[lhs]) if i not in dropped]
+    return synthetic
+
+
+def _substitute(template: Template, inner: Template) -> Template:
+    """
+    :param template: The template of a unit rule, whose only matched node is index 0.
+    :param inner: The template that builds that node.
+    :return: The template building both.
+    """
+    sym, items = template
+    return sym, [inner if isinstance(item, int) else _substitute(item, inner) for item in items]
+
+
+def _unit_closure(rules: Rules, sym: str) -> Set[str]:
+    """
+    :return: The nonterminals sym derives through unit rules alone.
+    """
+    seen = set()
+    stack = [sym]
+    while stack:
+        for rhs, _ in rules[stack.pop()]:
+            if len(rhs) == 1 and rhs[0] in rules and rhs[0] not in seen:
+                seen.add(rhs[0])
+                stack.append(rhs[0])
+    return seen
+
+
+def eliminate_unit_rules(rules: Rules):
+    """
+    Replace every rule A -> B, where B is a nonterminal, by a copy of each rule of B in place. Unit rules to a
+    nonterminal on a cycle (B derives B through unit rules) are kept, as eliminating them would never end. This
+    includes every unit rule on the cycle itself, and those leading into it from outside, like S -> B.
+    :param rules: The grammar, modified in place.
+    :return: None
+    """
+    changed = True
+    while changed:
+        changed = False
+        for lhs in rules:
+            result = []
+            for rhs, template in rules[lhs]:
+                if len(rhs) != 1 or rhs[0] not in rules or rhs[0] in _unit_closure(rules, rhs[0]):
+                    result.append((rhs, template))
+                    continue
+                outer = template or (lhs, [0])
+                for inner_rhs, inner in rules[rhs[0]]:
+                    result.append((inner_rhs, _substitute(outer, inner or (rhs[0], list(range(len(inner_rhs)))))))
+                changed = True
+            rules[lhs] = result
+
+
+def _reachable(rules: Rules, start: str) -> Set[str]:
+    """
+    :return: The nonterminals that can appear in a derivation from start.
+    """
+    seen = {start}
+    stack = [start]
+    while stack:
+        for rhs, _ in rules[stack.pop()]:
+            for sym in rhs:
+                if sym in rules and sym not in seen:
+                    seen.add(sym)
+                    stack.append(sym)
+    return seen
+
+
+def _compile(template: Template) -> Template:
+    """
+    :return: The template with symbol names replaced by Symbols.
+    """
+    sym, items = template
+    return Symbol(sym), [item if isinstance(item, int) or item[0] == SPLICE else _compile(item) for item in items]
+
+
+def _instantiate(template: Template, pattern: List[Node]) -> Node:
+    """
+    Build the nodes described by a template.
+    :param template: A compiled template.
+    :param pattern: The nodes matched by the rule.
+    :return: The top node.
+    """
+    sym, items = template
+    components = []
+    for item in items:
+        if isinstance(item, int):
+            components.append(pattern[item])
+        elif item[0] == SPLICE:
+            components.extend(pattern[item[1]].components)
+        else:
+            components.append(_instantiate(item, pattern))
+    return Node(sym, components=components)
+
+
+class TransformedGrammar(Grammar):
+    """
+    A grammar rewritten for faster parsing, which still produces the parse trees of the grammar it was made from.
+    """
+
+    def __init__(self, original: Grammar, factor: bool = True, unit_rules: bool = True):
+        """
+        Transform a grammar.
+        :param original: The grammar whose language and trees to preserve.
+        :param factor: Whether to left-factor rules with a common prefix.
+        :param unit_rules: Whether to eliminate unit rules.
+        """
+        self.original = original
+        start = original.start_symbol.name
+        rules = {lhs: [(tuple(rhs), None) for rhs in productions] for lhs, productions in original.to_data().items()}
+
+        taken = set(rules) | {sym.name for sym in original.terminals()}
+        synthetic = left_factor(rules, taken) if factor else set()
+        if unit_rules:
+            eliminate_unit_rules(rules)
+        reachable = _reachable(rules, start)
+        rules = {lhs: productions for lhs, productions in rules.items() if lhs in reachable}
+
+        self._load({lhs: [list(rhs) for rhs, _ in productions] for lhs, productions in rules.items()}, start)
+        # Transformed grammars with equal rules can still build different trees.
+        self.fingerprint = fingerprint([original.fingerprint, factor, unit_rules])
+        # The nonterminals that only exist in the transformed grammar. Their nodes never appear in a finished tree.
+        self.synthetic = frozenset(Symbol(name) for name in synthetic if name in reachable)
+
+        # Per rule, the template building its original nodes, or None if it is an original rule.
+        self._templates = {Grammar.ROOT_SYM: [None]}
+        for lhs, productions in rules.items():
+            self._templates[Symbol(lhs)] = [None if template is None else _compile(template)
+                                            for _, template in productions]
+
+    def reduce_by(self, from_sym: Symbol, rule: int, pattern: List[Node]) -> Node:
+        """
+        Reduce a symbol pattern using an already known rule, building the nodes of the original grammar.
+        :param from_sym: The symbol the rule is derived from.
+        :param rule: The index of the rule among the productions of from_sym.
+        :param pattern: The nodes being reduced.
+        :return: A new parse tree Node for from_sym, with the components the original rules give it.
+        """
+        node = super().reduce_by(from_sym, rule, pattern)
+        template = self._templates[from_sym][rule]
+        return node if template is None else _instantiate(template, pattern)
+
+
+def transform(grammar: Grammar, factor: bool = True, unit_rules: bool = True) -> TransformedGrammar:
+    """
+    Rewrite a grammar for faster parsing. See TransformedGrammar.
+    :param grammar: The grammar to transform.
+    :param factor: Whether to left-factor rules with a common prefix.
+    :param unit_rules: Whether to eliminate unit rules.
+    :return: The transformed grammar.
+    """
+    return TransformedGrammar(grammar, factor, unit_rules)
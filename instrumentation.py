@@ -0,0 +1,123 @@
+"""
+Low-overhead parser instrumentation.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+A parser with a metrics sink attached fills in a ParseMetrics record for every parse and hands it to the sink.
+Without a sink, no record is created and the only cost is a few 'is None' checks per token.
+
+:date: 10/16/2026 15:30
+"""
+
+from typing import *
+import threading
+
+
+class ParseMetrics:
+    """
+    Counters and timings describing a single parse. Times are in seconds.
+
+    frames_pruned counts frames removed because they could not accept a token, frames_discarded those removed
+    along with a reduced constituent. max_tree_size is the largest the state tree got; for an LRParser,
+    which has no state tree, it is the deepest the state stack got.
+    parse_time covers the whole parse including tagging, so it is more than the sum of the phase times.
+    """
+
+    COUNTERS = ('tokens', 'shifts', 'reduces', 'frames_created', 'frames_pruned', 'frames_discarded', 'prune_passes')
+    TIMERS = ('tokenize_time', 'tag_time', 'decide_time', 'shift_time', 'prune_time', 'predict_time', 'reduce_time',
+              'parse_time')
+
+    __slots__ = COUNTERS + TIMERS + ('max_tree_size', 'success')
+
+    def __init__(self):
+        for name in self.COUNTERS + self.TIMERS:
+            setattr(self, name, 0)
+        self.max_tree_size = 0
+        self.success = False
+
+    def as_dict(self) -> Dict[str, Union[int, float, bool]]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f'ParseMetrics({self.as_dict()})'
+
+
+class MetricsSink:
+    """
+    Receives a ParseMetrics record at the end of every parse. Subclasses override record().
+    Sinks may be called from several threads at once.
+    """
+
+    def record(self, metrics: ParseMetrics):
+        """
+        Consume the metrics of a finished parse.
+        :param metrics: The record. It is not reused by the parser.
+        :return: None
+        """
+        pass
+
+
+class CallbackSink(MetricsSink):
+    """
+    Forwards every record to a function.
+    """
+
+    def __init__(self, callback: Callable[[ParseMetrics], Any]):
+        self.callback = callback
+
+    def record(self, metrics: ParseMetrics):
+        self.callback(metrics)
+
+
+class AggregateSink(MetricsSink):
+    """
+    Sums up the records of many parses. Maximums are kept for max_tree_size.
+    """
+
+    def __init__(self):
+        self.parses = 0
+        self.successes = 0
+        self.totals = {name: 0 for name in ParseMetrics.COUNTERS + ParseMetrics.TIMERS}
+        self.max_tree_size = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # For spawned worker processes, which can not receive a lock.
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def record(self, metrics: ParseMetrics):
+        with self._lock:
+            self.parses += 1
+            self.successes += metrics.success
+            for name in self.totals:
+                self.totals[name] += getattr(metrics, name)
+            self.max_tree_size = max(self.max_tree_size, metrics.max_tree_size)
+
+    def summary(self) -> str:
+        """
+        Render the totals in a human-readable form.
+        :return: A multi-line string.
+        """
+        lines = [f'Parses: {self.parses} ({self.successes} successful)',
+                 f'Max tree size: {self.max_tree_size}']
+        for name in ParseMetrics.COUNTERS:
+            lines.append(f'{name}: {self.totals[name]}')
+        for name in ParseMetrics.TIMERS:
+            lines.append(f'{name}: {self.totals[name] * 1000:.3f} ms')
+        return '\n'.join(lines)
+
+
+def as_sink(metrics: Union[MetricsSink, Callable[[ParseMetrics], Any], None]) -> Optional[MetricsSink]:
+    """
+    Accept either a MetricsSink or a plain callback.
+    :param metrics: A sink, a function taking a ParseMetrics, or None.
+    :return: A MetricsSink or None.
+    """
+    if metrics is None or isinstance(metrics, MetricsSink):
+        return metrics
+    return CallbackSink(metrics)
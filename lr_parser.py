@@ -0,0 +1,444 @@
+"""
+A table-driven alternative to the StateFrame tree parser.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+The grammar is compiled once into an LR(0) automaton. Parsing then only needs an integer state stack
+and a dictionary lookup per action, so the cost of a sentence no longer depends on the size of the grammar.
+
+:date: 10/16/2026 10:12
+"""
+
+from typing import *
+import time
+from grammar import Grammar, Symbol, Node, Reduction
+from shift_reduce_parser import ParseSuccess, ParseFail, ParseLimits, parse_many
+from tagger import TaggingStage, NLTKTagger, TaggedSentence
+from instrumentation import ParseMetrics, MetricsSink, as_sink
+from parse_cache import ParseCache
+
+
+Item = Tuple[Symbol, int, int]  # (Symbol the rule is derived from, rule index, active constituent)
+
+
+class LRTable:
+    """
+    A compiled action/goto table for a grammar.
+
+    Conflicts are resolved the same way SRParser resolves them:
+    - If a shift and a reduction are possible, favor the shift.
+    - If several reductions are possible, favor the longest rule, and the later one among equally long rules.
+    """
+
+    def __init__(self, grammar: Grammar):
+        """
+        Compile the table.
+        :param grammar: A CFG grammar driving acceptable transitions.
+        """
+        self._grammar = grammar
+        self.states = []       # Item sets, one per state
+        self.transitions = []  # Per state, Symbol -> next state. Serves as both the shift and goto table.
+        self.reductions = []   # Per state, the preferred (Symbol, rule index, rule length) to reduce or None.
+        self._build()
+
+    def __len__(self):
+        return len(self.states)
+
+    def _rule(self, item: Item) -> List[Symbol]:
+        return self._grammar[item[0]][item[1]]
+
+    def _closure(self, kernel: List[Item]) -> List[Item]:
+        """
+        Expand a kernel into all items reachable by predicting the active constituents.
+        :param kernel: Items which have just been advanced.
+        :return: The full item set, kernel first, in discovery order.
+        """
+        items = list(kernel)
+        seen = set(items)
+        i = 0
+        while i < len(items):
+            lhs, rule, dot = items[i]
+            i += 1
+            production = self._grammar[lhs][rule]
+            if dot >= len(production):
+                continue
+
+            sym = production[dot]
+            for r in range(len(self._grammar[sym])):
+                item = (sym, r, 0)
+                if item not in seen:
+                    seen.add(item)
+                    items.append(item)
+
+        return items
+
+    def _build(self):
+        """
+        Construct the canonical LR(0) collection and derive the tables from it.
+        :return: None
+        """
+        start = self._closure([(Grammar.ROOT_SYM, 0, 0)])
+        index = {frozenset(start[:1]): 0}
+        self.states.append(start)
+
+        i = 0
+        while i < len(self.states):
+            items = self.states[i]
+            i += 1
+
+            # Group the advanceable items by the symbol they are waiting for, preserving order.
+            kernels = {}
+            for item in items:
+                production = self._rule(item)
+                if item[2] < len(production):
+                    kernels.setdefault(production[item[2]], []).append((item[0], item[1], item[2] + 1))
+
+            transitions = {}
+            for sym, kernel in kernels.items():
+                key = frozenset(kernel)
+                if key not in index:
+                    index[key] = len(self.states)
+                    self.states.append(self._closure(kernel))
+                transitions[sym] = index[key]
+            self.transitions.append(transitions)
+
+            # Pick a single reduction for the state.
+            best = None
+            for lhs, rule, dot in items:
+                if dot == len(self._grammar[lhs][rule]) and (best is None or dot >= best[2]):
+                    best = (lhs, rule, dot)
+            self.reductions.append(best)
+
+    def dump(self) -> str:
+        """
+        Render the table in a human-readable form.
+        :return: A multi-line string.
+        """
+        result = ''
+        for i, items in enumerate(self.states):
+            result += f'State {i}:\n'
+            for lhs, rule, dot in items:
+                production = self._grammar[lhs][rule]
+                to_str = ' '.join(str(s) for s in production[:dot]) + ' * ' + \
+                    ' '.join(str(s) for s in production[dot:])
+                result += f'\t({lhs} -> {to_str.strip()})\n'
+            for sym, target in self.transitions[i].items():
+                result += f'\t{sym} => {target}\n'
+            if self.reductions[i] is not None:
+                result += f'\treduce {self.reductions[i][0]} #{self.reductions[i][1]}\n'
+        return result
+
+
+class LRParser:
+    """
+    A shift-reduce parser driven by a precompiled LRTable.
+    """
+
+    def __init__(self, grammar: Grammar, reduction: Reduction = None, verbose: bool = False,
+                 tagging: TaggingStage = None, table: LRTable = None,
+                 metrics: Union[MetricsSink, Callable[[ParseMetrics], Any]] = None, result_cache: ParseCache = None,
+                 limits: ParseLimits = None):
+        """
+        Initialize a parser with some global parameters.
+        :param grammar: A CFG grammar driving acceptable transitions.
+        :param reduction: A mapping of a complex grammar to a simpler one.
+        :param verbose: Enables additional output.
+        :param tagging: The stage turning sentences into terminals. Uses NLTK and the reduction if omitted.
+        :param table: A table previously compiled from the same grammar. Compiled from scratch if omitted.
+        :param metrics: A MetricsSink, or a function, receiving a ParseMetrics record after every parse.
+        :param result_cache: An optional cache of parse trees for repeated terminal sequences.
+        :param limits: Bounds on the parse stack depth, tokens and time of every parse. There are no state frames, so
+            max_frames does not apply. Unbounded if omitted.
+        """
+        self._grammar = grammar
+        self._reduction = reduction
+        self.verbose = verbose
+        self.tagging = TaggingStage(reduction, NLTKTagger(), verbose=verbose) if tagging is None else tagging
+        self._table = LRTable(grammar) if table is None else table
+        self.metrics = as_sink(metrics)
+        self.result_cache = result_cache
+        self.limits = ParseLimits() if limits is None else limits
+
+    @property
+    def table(self) -> LRTable:
+        return self._table
+
+    def parse(self, text: Union[str, TaggedSentence]) -> Union[ParseSuccess, ParseFail]:
+        """
+        Obtain a grammatical parse tree for a given sentence.
+        :param text: The sentence to parse, either as raw text or as already tagged (word, tag) pairs.
+        :return: A nested structure representing the parse tree.
+        """
+        sink = self.metrics
+        if sink is None and self.result_cache is None:
+            return self.parse_tokens(self.tagging(text))
+
+        metrics = None
+        if sink is not None:
+            start = time.perf_counter()
+            metrics = ParseMetrics()
+        tokens = self.tagging(text) if metrics is None else self.tagging(text, metrics)
+
+        cache = self.result_cache
+        root = None if cache is None else cache.get(self.fingerprint(), tokens)
+        if root is not None:
+            result = ParseSuccess(name="Root", node=root)
+            if metrics is not None:
+                metrics.tokens = len(tokens)
+        else:
+            result = self.parse_tokens(tokens, metrics)
+            if cache is not None and isinstance(result, ParseSuccess):
+                cache.put(self.fingerprint(), tokens, result.root)
+
+        if sink is not None:
+            metrics.success = isinstance(result, ParseSuccess)
+            metrics.parse_time = time.perf_counter() - start
+            sink.record(metrics)
+        return result
+
+    def fingerprint(self) -> Tuple[str, str, Optional[str]]:
+        """
+        Identify how this parser turns terminals into trees, for result caching.
+        :return: The engine, grammar and reduction fingerprints.
+        """
+        reduction = self.tagging.reduction
+        return type(self).__name__, self._grammar.fingerprint, None if reduction is None else reduction.fingerprint
+
+    def parse_many(self, sentences: Iterable[Union[str, TaggedSentence]], jobs: int = 1, chunksize: int = 16) \
+            -> Iterator[Union[ParseSuccess, ParseFail]]:
+        """
+        Parse a stream of sentences. See shift_reduce_parser.parse_many().
+        :param sentences: The sentences to parse, as text or (word, tag) pairs. Consumed lazily.
+        :param jobs: The number of worker processes.
+        :param chunksize: How many sentences are sent to a worker at a time.
+        :return: A generator of parse results, in input order.
+        """
+        return parse_many(self, sentences, jobs, chunksize)
+
+    def stream(self) -> 'LRStream':
+        """
+        Start parsing a sentence whose tokens will arrive one at a time.
+        :return: An LRStream to push tokens into.
+        """
+        return LRStream(self)
+
+    def parse_tokens(self, tokens: List[Node], metrics: ParseMetrics = None) -> Union[ParseSuccess, ParseFail]:
+        """
+        Obtain a grammatical parse tree for an already tagged and reduced sentence.
+        :param tokens: Terminal Nodes in sentence order, with the source words as their values.
+        :param metrics: An optional record to count shifts and reductions in.
+            Individual table lookups are too cheap to time, so only counters are filled in.
+        :return: A nested structure representing the parse tree.
+        """
+        if metrics is not None:
+            metrics.tokens = len(tokens)
+        limits = self.limits
+        if limits.max_tokens is not None and len(tokens) > limits.max_tokens:
+            return ParseFail.too_long(tokens, limits.max_tokens)
+        max_depth = limits.max_depth
+        deadline = None if limits.time_budget is None else time.perf_counter() + limits.time_budget
+
+        transitions = self._table.transitions
+        reductions = self._table.reductions
+        states = [0]  # The integer state stack
+        nodes = []    # Parse stack of Nodes, parallel to states[1:]
+        pos = 0
+
+        while True:
+            if self.verbose:
+                print(f'States: {states}')
+
+            token = tokens[pos] if pos < len(tokens) else None
+            target = transitions[states[-1]].get(token.symbol) if token is not None else None
+
+            if target is not None:
+                if self.verbose:
+                    print(f'\nShift {token.value} ==> {token}')
+                states.append(target)
+                nodes.append(token)
+                pos += 1
+                if metrics is not None:
+                    metrics.shifts += 1
+                    if len(states) > metrics.max_tree_size:
+                        metrics.max_tree_size = len(states)
+                if max_depth is not None and len(nodes) > max_depth:
+                    return ParseFail.at(nodes, tokens[pos] if pos < len(tokens) else None, (), 'max_depth')
+                if deadline is not None and time.perf_counter() > deadline:
+                    return ParseFail.at(nodes, tokens[pos] if pos < len(tokens) else None, (), 'time_budget')
+                continue
+
+            reduction = reductions[states[-1]]
+            if reduction is None:
+                return self._parse_fail(nodes, states, token)
+
+            lhs, rule, length = reduction
+            if lhs == Grammar.ROOT_SYM:
+                # The start symbol is complete. This is only a success if the entire input was consumed.
+                if token is not None:
+                    return self._parse_fail(nodes, states, token)
+                return ParseSuccess(name="Root", node=nodes[-1])
+
+            pattern = nodes[len(nodes) - length:]
+            del nodes[len(nodes) - length:]
+            del states[len(states) - length:]
+
+            node = self._grammar.reduce_by(lhs, rule, pattern)
+            if self.verbose:
+                print(f'\nReduce {node} <== {pattern}')
+
+            states.append(transitions[states[-1]][lhs])
+            nodes.append(node)
+            if metrics is not None:
+                metrics.reduces += 1
+
+    def _parse_fail(self, nodes: List[Node], states: List[int], token: Optional[Node]) -> ParseFail:
+        """
+        Something did not succeed. Record where, and what the state stack was still looking for.
+        :param nodes: The parse stack.
+        :param states: The state stack.
+        :param token: The token that could not be shifted, or None at the end of the input.
+        :return: A new ParseFail.
+        """
+        return ParseFail.at(nodes, token, self._expected(states))
+
+    def _expected(self, states: List[int]) -> Set[Symbol]:
+        """
+        Find the terminals that could be shifted next.
+        :param states: A state stack. It is not modified.
+        :return: The accepted terminals, plus Grammar.RULE_END if the input may end here.
+        """
+        grammar = self._grammar
+        transitions = self._table.transitions
+        reductions = self._table.reductions
+        states = list(states)
+        expected = set()
+        while True:
+            # A token is shifted in the first state of the reduction chain that has a transition for it.
+            expected.update(sym for sym in transitions[states[-1]] if not grammar[sym])
+            reduction = reductions[states[-1]]
+            if reduction is None:
+                break
+            lhs, _, length = reduction
+            if lhs == Grammar.ROOT_SYM:
+                expected.add(Grammar.RULE_END)
+                break
+            del states[len(states) - length:]
+            states.append(transitions[states[-1]][lhs])
+        return expected
+
+
+class LRStream:
+    """
+    An LRParser parse fed one token at a time. Offers the same interface as shift_reduce_parser.ParseStream,
+    and pushing every token of a sentence and finalizing gives the same result as LRParser.parse().
+    """
+
+    def __init__(self, parser: LRParser):
+        """
+        Create an empty stream. Use LRParser.stream() rather than calling this directly.
+        :param parser: The parser driving this stream.
+        """
+        self._parser = parser
+        self._states = [0]  # The integer state stack
+        self._nodes = []    # Parse stack of Nodes, parallel to states[1:]
+        self.tokens = 0      # How many tokens were pushed
+        self.failure = None  # The ParseFail of a prefix that can not be continued
+        self.result = None   # The outcome of finalize()
+
+    @property
+    def viable(self) -> bool:
+        """
+        :return: Whether the tokens pushed so far may still be the start of a grammatical sentence.
+        """
+        return self.failure is None
+
+    def push(self, token: Union[Node, Tuple[str, str]]) -> bool:
+        """
+        Consume the next token of the sentence, performing any reductions it triggers.
+        :param token: A (word, tag) pair, which is reduced like parse() input, or an already reduced terminal Node.
+        :return: Whether the sentence is still viable.
+        """
+        if self.result is not None:
+            raise ValueError('Can not push to a finalized stream')
+        if self.failure is not None:
+            return False
+
+        if not isinstance(token, Node):
+            token = self._parser.tagging([token])[0]
+
+        limits = self._parser.limits
+        self.tokens += 1
+        if limits.max_tokens is not None and self.tokens > limits.max_tokens:
+            self.failure = ParseFail.at(self._nodes, token, (), 'max_tokens')
+            return False
+
+        transitions = self._parser.table.transitions
+        states = self._states
+        while True:
+            target = transitions[states[-1]].get(token.symbol)
+            if target is not None:
+                if self._parser.verbose:
+                    print(f'\nShift {token.value} ==> {token}')
+                states.append(target)
+                self._nodes.append(token)
+                if limits.max_depth is not None and len(self._nodes) > limits.max_depth:
+                    self.failure = ParseFail.at(self._nodes, None, (), 'max_depth')
+                    return False
+                return True
+
+            # The start symbol can only be completed at the end of the input.
+            if not self._reduce():
+                self.failure = self._parser._parse_fail(self._nodes, states, token)
+                return False
+
+    def expected(self) -> FrozenSet[Symbol]:
+        """
+        Find the terminals the parser would accept next. Only the state stack is simulated, so this is cheap.
+        :return: The accepted terminals, plus Grammar.RULE_END if the sentence may end here.
+        """
+        if self.failure is not None or self.result is not None:
+            return frozenset()
+        return frozenset(self._parser._expected(self._states))
+
+    def finalize(self) -> Union[ParseSuccess, ParseFail]:
+        """
+        Signal the end of the input and complete the parse. Further calls return the same result.
+        :return: A nested structure representing the parse tree.
+        """
+        if self.result is not None:
+            return self.result
+        if self.failure is not None:
+            self.result = self.failure
+            return self.result
+
+        reductions = self._parser.table.reductions
+        while True:
+            reduction = reductions[self._states[-1]]
+            if reduction is not None and reduction[0] == Grammar.ROOT_SYM:
+                self.result = ParseSuccess(name="Root", node=self._nodes[-1])
+                return self.result
+            if not self._reduce():
+                self.result = self._parser._parse_fail(self._nodes, self._states, None)
+                return self.result
+
+    def _reduce(self) -> bool:
+        """
+        Perform the reduction called for by the current state, unless it is the final one.
+        :return: Whether a reduction was performed.
+        """
+        reduction = self._parser.table.reductions[self._states[-1]]
+        if reduction is None or reduction[0] == Grammar.ROOT_SYM:
+            return False
+
+        lhs, rule, length = reduction
+        states, nodes = self._states, self._nodes
+        pattern = nodes[len(nodes) - length:]
+        del nodes[len(nodes) - length:]
+        del states[len(states) - length:]
+
+        node = self._parser._grammar.reduce_by(lhs, rule, pattern)
+        if self._parser.verbose:
+            print(f'\nReduce {node} <== {pattern}')
+
+        states.append(self._parser.table.transitions[states[-1]][lhs])
+        nodes.append(node)
+        return True
@@ -0,0 +1,183 @@
+"""
+Caching parse results of repeated sentences.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+A parse only depends on the terminals of a sentence, not on its words, so a cached tree can be reused for any
+sentence that reduces to the same terminal sequence. Only the shape of the tree is stored; the leaves are rebound
+to the tokens of each new sentence.
+
+:date: 10/16/2026 18:20
+"""
+
+from typing import *
+from array import array
+from collections import OrderedDict
+import sys
+import threading
+
+from grammar import Symbol, Node
+
+
+def tree_shape(root: Node, tokens: List[Node]) -> Optional[array]:
+    """
+    Encode the shape of a parse tree as a flat array of (symbol id, child count) pairs in pre-order.
+    Leaves, which must be the tokens themselves in sentence order, have a child count of -1.
+    :param root: The root of the tree.
+    :param tokens: The terminals of the sentence.
+    :return: The encoded shape, or None if the leaves of the tree are not exactly the tokens.
+    """
+    shape = array('i')
+    leaves = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if leaves < len(tokens) and node is tokens[leaves]:
+            shape.append(node.symbol.id)
+            shape.append(-1)
+            leaves += 1
+            continue
+        shape.append(node.symbol.id)
+        shape.append(len(node.components))
+        stack.extend(reversed(node.components))
+    return shape if leaves == len(tokens) else None
+
+
+def rebuild_tree(shape: array, tokens: List[Node]) -> Node:
+    """
+    Build a parse tree from its encoded shape.
+    :param shape: A shape produced by tree_shape().
+    :param tokens: The terminals of a sentence with the same symbols as the one the shape was taken from.
+    :return: The root of a new tree whose leaves are the given tokens.
+    """
+    root = None
+    stack = []  # (node, number of components it should get)
+    leaves = 0
+    for i in range(0, len(shape), 2):
+        count = shape[i + 1]
+        if count < 0:
+            node = tokens[leaves]
+            leaves += 1
+        else:
+            node = Node(Symbol.from_id(shape[i]), components=[])
+
+        if stack:
+            stack[-1][0].components.append(node)
+        else:
+            root = node
+
+        if count > 0:
+            stack.append((node, count))
+        while stack and len(stack[-1][0].components) == stack[-1][1]:
+            stack.pop()
+    return root
+
+
+class ParseCache:
+    """
+    A thread-safe, bounded LRU cache of successful parse trees keyed by terminal sequence.
+
+    The cache belongs to one grammar, reduction and parsing engine at a time. Parsers identify themselves with every
+    lookup, and the cache empties itself when it is used by a parser that would parse differently.
+    Failed parses are not cached.
+    """
+
+    def __init__(self, maxsize: int = 4096, max_bytes: int = None):
+        """
+        Create an empty cache.
+        :param maxsize: The maximum number of trees to remember.
+        :param max_bytes: An optional bound on the approximate memory used by the stored trees.
+        """
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._owner = None
+        self._data = OrderedDict()  # Terminal sequence -> (tree shape, size in bytes)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # The lock only guards this process's copy of the cache, so a new one is made when it is unpickled.
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, owner: Hashable, tokens: List[Node]) -> Optional[Node]:
+        """
+        Look up the parse of a sentence.
+        :param owner: The fingerprint of the parser asking.
+        :param tokens: The terminals of the sentence.
+        :return: A new parse tree built over the tokens, or None if the sentence is not cached.
+        """
+        key = tuple(t.symbol for t in tokens)
+        with self._lock:
+            self._claim(owner)
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return rebuild_tree(entry[0], tokens)
+
+    def put(self, owner: Hashable, tokens: List[Node], root: Node):
+        """
+        Remember the parse of a sentence, evicting the least recently used ones if the cache is full.
+        :param owner: The fingerprint of the parser that produced the tree.
+        :param tokens: The terminals of the sentence.
+        :param root: The root of the parse tree.
+        :return: None
+        """
+        shape = tree_shape(root, tokens)
+        if shape is None:
+            return
+
+        key = tuple(t.symbol for t in tokens)
+        size = sys.getsizeof(shape) + sys.getsizeof(key)
+        with self._lock:
+            self._claim(owner)
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._data[key] = (shape, size)
+            self.nbytes += size
+            while self._data and (len(self._data) > self.maxsize or
+                                  (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+                self.nbytes -= self._data.popitem(last=False)[1][1]
+
+    def clear(self):
+        """
+        Forget every cached tree. Statistics are kept.
+        :return: None
+        """
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: Hit, miss and invalidation counts, and the current size of the cache.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations,
+                'entries': len(self._data), 'bytes': self.nbytes}
+
+    def _claim(self, owner: Hashable):
+        """
+        Make the cache belong to a parser, dropping the trees of the previous one. Must hold the lock.
+        :param owner: The fingerprint of the parser.
+        :return: None
+        """
+        if owner != self._owner:
+            if self._data:
+                self.invalidations += 1
+                self._data.clear()
+                self.nbytes = 0
+            self._owner = owner
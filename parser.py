@@ -5,43 +5,339 @@ CS 799.06 Graduate Independent Study in NLP/NLU.
 :author: Sergey Goldobin
 :date: 06/02/2020 15:51
 """
+import time
+START = time.perf_counter()  # Everything after this counts towards the start-up time.
+
 import argparse
+import itertools
+import sys
+import json
 
 from grammar import Grammar, Reduction
-from shift_reduce_parser import SRParser, ParseSuccess
+from grammar_transform import transform
+from shift_reduce_parser import SRParser, ParseSuccess, ParseLimits
+from lr_parser import LRParser
+from chart_parser import ChartParser
+from tagger import TaggingStage, TagCache, NLTKTagger
+from artifact import compile_artifact, load_artifact
+from instrumentation import AggregateSink
+from parse_cache import ParseCache
+from compact_tree import CompactTree
+from batch import parse_corpus
 
 
 DEFAULT_GRAMMAR = '.\\grammars\\advanced_grammar.json'
 DEFAULT_REDUCTION = '.\\reductions\\advanced_grammar_reduction.json'
+ENGINES = {'tree': SRParser, 'lr': LRParser, 'chart': ChartParser}
+FORMATS = ('tree', 'brackets', 'json', 'binary')
+EMPTY_TREE = CompactTree.empty()  # Stands for a failed parse in machine-readable output
 
 
 def main():
-    arg_parser = argparse.ArgumentParser()
-    arg_parser.add_argument("text", help="Text to be parsed.")
+    if len(sys.argv) > 1 and sys.argv[1] == 'compile':
+        compile_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        batch_main(sys.argv[2:])
+        return
+
+    arg_parser = argparse.ArgumentParser(epilog="Run 'parser.py compile -h' to see how to precompile a grammar, "
+                                                "'parser.py serve -h' to run a parse server, or 'parser.py batch -h' "
+                                                "to parse a large corpus into a file.")
+    arg_parser.add_argument("text", nargs='?', help="Text to be parsed.")
+    arg_parser.add_argument("-i", "--input", help="File with one sentence per line to be parsed instead of text.")
+    arg_parser.add_argument("-j", "--jobs", help="Number of worker processes for --input.", type=int, default=1)
+    arg_parser.add_argument("--tag-cache", help="Remember the POS tags of up to this many repeated sentences.",
+                            type=int, default=0)
+    arg_parser.add_argument("--parse-cache", help="Reuse the parse trees of up to this many repeated tag sequences. "
+                                                  "Not available with the chart engine.", type=int, default=0)
     arg_parser.add_argument("-g", "--grammar", help="JSON file specifying the language grammar.")
     arg_parser.add_argument("-r", "--reduction", help="POS Tag-to-grammar reduction map.")
+    arg_parser.add_argument("-a", "--artifact", help="Precompiled grammar artifact to load instead of the JSON files. "
+                                                     "Rebuilt from the grammar and reduction if stale.")
     arg_parser.add_argument("-v", "--verbose", help="Display detailed parser operation output.", action="store_true")
+    arg_parser.add_argument("-e", "--engine", help="Parsing engine to use.", choices=ENGINES.keys(), default='tree')
+    arg_parser.add_argument("--transform", help="Left-factor the grammar and eliminate its unit rules before "
+                                                "parsing. Trees keep the shape of the original rules.",
+                            action="store_true")
+    arg_parser.add_argument("-k", "--trees", help="Print up to this many parse trees of ambiguous sentences, best "
+                                                  "first, or all of them if 0. Requires the chart engine.",
+                            type=int, default=1)
+    arg_parser.add_argument("-f", "--format", help="Output format. Except for tree, one record is written per "
+                                                   "sentence, and failed parses are written as empty trees.",
+                            choices=FORMATS, default='tree')
+    arg_parser.add_argument("--offline", help="Fail instead of downloading missing NLTK resources.",
+                            action="store_true")
+    add_limit_arguments(arg_parser)
+    arg_parser.add_argument("--startup-budget", help="Report the start-up time and exit with status 2 if it exceeds "
+                                                     "this many milliseconds.", type=float)
+    arg_parser.add_argument("--metrics", help="Print parser counters and per-phase timings to stderr when done. "
+                                              "Only covers parses done in this process.", action="store_true")
     args = arg_parser.parse_args()
+    if (args.text is None) == (args.input is None):
+        arg_parser.error('exactly one of text or --input is required')
+    if args.trees != 1 and args.engine != 'chart':
+        arg_parser.error('--trees requires --engine chart')
+    if args.trees != 1 and args.format != 'tree':
+        arg_parser.error('--trees requires --format tree')
+    if args.parse_cache > 0 and args.engine == 'chart':
+        arg_parser.error('--parse-cache can not be used with --engine chart')
+
+    grammar, reduction, table = load_grammar(args)
+    sink = AggregateSink() if args.metrics else None
+    result_cache = ParseCache(args.parse_cache) if args.parse_cache > 0 else None
+    parser = build_parser(args, grammar, reduction, table, sink, result_cache)
+
+    # NLTK is only loaded by the first parse, so it is not part of the start-up time.
+    startup = (time.perf_counter() - START) * 1000
+    over_budget = args.startup_budget is not None and startup > args.startup_budget
+    if args.startup_budget is not None or args.verbose:
+        print(f'Start-up took {startup:.1f} ms', file=sys.stderr)
+
+    try:
+        if args.input is None:
+            print_result(args.text, parser.parse(args.text), args.trees, args.format)
+        else:
+            with open(args.input, 'r') as fp:
+                sentences, texts = itertools.tee(line.strip() for line in fp if line.strip())
+                for text, pt in zip(texts, parser.parse_many(sentences, jobs=args.jobs)):
+                    print_result(text, pt, args.trees, args.format)
+    except (ImportError, LookupError) as e:
+        print(e)
+        exit(1)
+
+    if sink is not None:
+        print(sink.summary(), file=sys.stderr)
+    if result_cache is not None and args.jobs <= 1:
+        print(f'Parse cache: {result_cache.stats()}', file=sys.stderr)
+
+    if over_budget:
+        print(f'Start-up exceeded the budget of {args.startup_budget:g} ms', file=sys.stderr)
+        exit(2)
+
+
+def load_grammar(args):
+    """
+    Load the grammar and reduction named on the command line, exiting if they are invalid.
+    :param args: Parsed arguments with grammar, reduction, artifact and transform options.
+    :return: The Grammar, the Reduction, and the precompiled LR table if loaded from an artifact, else None.
+    """
+    table = None
+    try:
+        if args.artifact is not None:
+            artifact = load_artifact(args.artifact, args.grammar, args.reduction)
+            grammar, reduction, table = artifact.grammar, artifact.reduction, artifact.lr_table
+        else:
+            grammar = Grammar(DEFAULT_GRAMMAR if args.grammar is None else args.grammar)
+            reduction = Reduction(DEFAULT_REDUCTION if args.reduction is None else args.reduction)
+        if args.transform:
+            grammar = transform(grammar)
+            table = None  # The precompiled table is for the untransformed rules.
+    except Exception as e:
+        print('There was an error with the grammar or reduction:')
+        print(e)
+        exit(1)
+    return grammar, reduction, table
+
+
+def build_parser(args, grammar, reduction, table=None, sink=None, result_cache=None):
+    """
+    Create the parser selected on the command line.
+    :param args: Parsed arguments with engine, tagging, verbosity and limit options.
+    :param grammar: The Grammar to parse with.
+    :param reduction: The Reduction to tag with.
+    :param table: A precompiled LR table, if any.
+    :param sink: A metrics sink, if any.
+    :param result_cache: A ParseCache, if any.
+    :return: The parser.
+    """
+    cache = TagCache(args.tag_cache) if args.tag_cache > 0 else None
+    tagging = TaggingStage(reduction, NLTKTagger(offline=args.offline or None), cache, verbose=args.verbose)
+    limits = ParseLimits(args.max_frames, args.max_depth, args.max_tokens, args.time_budget)
+    if args.engine == 'lr':
+        return LRParser(grammar=grammar, reduction=reduction, verbose=args.verbose, tagging=tagging, table=table,
+                        metrics=sink, result_cache=result_cache, limits=limits)
+    if args.engine == 'chart':
+        return ChartParser(grammar=grammar, reduction=reduction, verbose=args.verbose, tagging=tagging,
+                           metrics=sink, limits=limits)
+    return ENGINES[args.engine](grammar=grammar, reduction=reduction, verbose=args.verbose, tagging=tagging,
+                                metrics=sink, result_cache=result_cache, limits=limits)
+
+
+def add_limit_arguments(arg_parser):
+    """
+    Add the options bounding the resources of a single parse.
+    :param arg_parser: The argparse parser to extend.
+    :return: None
+    """
+    arg_parser.add_argument("--max-frames", help="Give up on sentences needing more than this many live state "
+                                                 "frames, or chart items with the chart engine.", type=int)
+    arg_parser.add_argument("--max-depth", help="Give up on sentences needing a parse stack deeper than this.",
+                            type=int)
+    arg_parser.add_argument("--max-tokens", help="Give up on sentences longer than this many tokens.", type=int)
+    arg_parser.add_argument("--time-budget", help="Give up on sentences taking longer than this many seconds to "
+                                                  "parse, not counting tagging.", type=float)
+
+
+def compile_main(argv):
+    """
+    Entry point of the compile subcommand.
+    :param argv: Command line arguments following 'compile'.
+    :return: None
+    """
+    arg_parser = argparse.ArgumentParser(prog='parser.py compile',
+                                         description='Precompile a grammar and reduction into a binary artifact.')
+    arg_parser.add_argument("output", help="Artifact file to write.")
+    arg_parser.add_argument("-g", "--grammar", help="JSON file specifying the language grammar.",
+                            default=DEFAULT_GRAMMAR)
+    arg_parser.add_argument("-r", "--reduction", help="POS Tag-to-grammar reduction map.", default=DEFAULT_REDUCTION)
+    arg_parser.add_argument("-s", "--start", help="Start symbol of the grammar.", default='S')
+    arg_parser.add_argument("--strict", help="Treat validation warnings as errors.", action="store_true")
+    args = arg_parser.parse_args(argv)
 
-    grammar = DEFAULT_GRAMMAR if args.grammar is None else args.grammar
-    reduction = DEFAULT_REDUCTION if args.reduction is None else args.reduction
     try:
-        grammar = Grammar(grammar)
-        reduction = Reduction(reduction)
+        artifact = compile_artifact(args.grammar, args.reduction, args.output, args.start)
     except Exception as e:
         print('There was an error with the grammar or reduction:')
         print(e)
         exit(1)
 
-    # Perform the parse of the sentence structure according to the grammar,
-    parser = SRParser(grammar=grammar, reduction=reduction, verbose=args.verbose)
-    pt = parser.parse(args.text)
+    for warning in artifact.warnings:
+        print(f'Warning: {warning}')
+    print(f'Wrote {args.output} ({len(artifact.lr_table)} LR states)')
+
+    if args.strict and artifact.warnings:
+        exit(1)
+
 
-    print(args.text + ':')
-    if isinstance(pt, ParseSuccess):
+def serve_main(argv):
+    """
+    Entry point of the serve subcommand.
+    :param argv: Command line arguments following 'serve'.
+    :return: None
+    """
+    arg_parser = argparse.ArgumentParser(prog='parser.py serve',
+                                         description='Answer parse requests, one per line, as JSON lines. A request '
+                                                     'is either raw text or a JSON object with an "id" and "text" or '
+                                                     '"tokens" as [word, tag] pairs.')
+    arg_parser.add_argument("-s", "--socket", help="Listen on this Unix socket instead of reading stdin.")
+    arg_parser.add_argument("-w", "--workers", help="Number of worker processes. 0 parses on a thread instead.",
+                            type=int, default=1)
+    arg_parser.add_argument("--max-pending", help="Stop reading requests while this many are in progress.",
+                            type=int, default=64)
+    arg_parser.add_argument("--timeout", help="Answer requests taking longer than this many seconds with an error.",
+                            type=float, default=10.0)
+    arg_parser.add_argument("-g", "--grammar", help="JSON file specifying the language grammar.")
+    arg_parser.add_argument("-r", "--reduction", help="POS Tag-to-grammar reduction map.")
+    arg_parser.add_argument("-a", "--artifact", help="Precompiled grammar artifact to load instead of the JSON files.")
+    arg_parser.add_argument("-e", "--engine", help="Parsing engine to use.", choices=ENGINES.keys(), default='tree')
+    arg_parser.add_argument("--transform", help="Left-factor the grammar and eliminate its unit rules before "
+                                                "parsing. Trees keep the shape of the original rules.",
+                            action="store_true")
+    arg_parser.add_argument("--tag-cache", help="Remember the POS tags of up to this many repeated sentences.",
+                            type=int, default=0)
+    arg_parser.add_argument("--parse-cache", help="Reuse the parse trees of up to this many repeated tag sequences, "
+                                                  "per worker. Not available with the chart engine.",
+                            type=int, default=0)
+    arg_parser.add_argument("--offline", help="Fail instead of downloading missing NLTK resources.",
+                            action="store_true")
+    add_limit_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+    args.verbose = False  # Diagnostics would corrupt the stdout protocol.
+    if args.workers < 0 or args.max_pending < 1 or args.timeout <= 0:
+        arg_parser.error('--workers must not be negative, and --max-pending and --timeout must be positive')
+    if args.parse_cache > 0 and args.engine == 'chart':
+        arg_parser.error('--parse-cache can not be used with --engine chart')
+
+    grammar, reduction, table = load_grammar(args)
+    result_cache = ParseCache(args.parse_cache) if args.parse_cache > 0 else None
+    parser = build_parser(args, grammar, reduction, table, result_cache=result_cache)
+    from server import serve  # Pulls in asyncio, which would slow down the start-up of every other command.
+    stats = serve(parser, args.socket, args.workers, args.max_pending, args.timeout)
+    print(f'Served: {stats}', file=sys.stderr)
+
+
+def batch_main(argv):
+    """
+    Entry point of the batch subcommand.
+    :param argv: Command line arguments following 'batch'.
+    :return: None
+    """
+    arg_parser = argparse.ArgumentParser(prog='parser.py batch',
+                                         description='Parse a corpus with one sentence per line, as raw text or as '
+                                                     'JSON objects with "text" or "tokens" as [word, tag] pairs, '
+                                                     'into a binary results file and an index of it (OUTPUT.idx).')
+    arg_parser.add_argument("corpus", help="The corpus file.")
+    arg_parser.add_argument("output", help="The results file to write.")
+    arg_parser.add_argument("--resume", help="Continue an interrupted run into the same output instead of starting "
+                                             "over.", action="store_true")
+    arg_parser.add_argument("--skip-invalid", help="Skip malformed JSON lines instead of stopping.",
+                            action="store_true")
+    arg_parser.add_argument("-j", "--jobs", help="Number of worker processes.", type=int, default=1)
+    arg_parser.add_argument("-g", "--grammar", help="JSON file specifying the language grammar.")
+    arg_parser.add_argument("-r", "--reduction", help="POS Tag-to-grammar reduction map.")
+    arg_parser.add_argument("-a", "--artifact", help="Precompiled grammar artifact to load instead of the JSON files.")
+    arg_parser.add_argument("-e", "--engine", help="Parsing engine to use.", choices=ENGINES.keys(), default='tree')
+    arg_parser.add_argument("--transform", help="Left-factor the grammar and eliminate its unit rules before "
+                                                "parsing. Trees keep the shape of the original rules.",
+                            action="store_true")
+    arg_parser.add_argument("--tag-cache", help="Remember the POS tags of up to this many repeated sentences.",
+                            type=int, default=0)
+    arg_parser.add_argument("--parse-cache", help="Reuse the parse trees of up to this many repeated tag sequences, "
+                                                  "per worker. Not available with the chart engine.",
+                            type=int, default=0)
+    arg_parser.add_argument("--offline", help="Fail instead of downloading missing NLTK resources.",
+                            action="store_true")
+    add_limit_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+    args.verbose = False
+    if args.parse_cache > 0 and args.engine == 'chart':
+        arg_parser.error('--parse-cache can not be used with --engine chart')
+
+    grammar, reduction, table = load_grammar(args)
+    result_cache = ParseCache(args.parse_cache) if args.parse_cache > 0 else None
+    parser = build_parser(args, grammar, reduction, table, result_cache=result_cache)
+    try:
+        stats = parse_corpus(parser, args.corpus, args.output, args.jobs, args.resume, args.skip_invalid)
+    except (ImportError, LookupError, ValueError, OSError) as e:
+        print(e)
+        exit(1)
+    print(f'Done: {stats}', file=sys.stderr)
+
+
+def print_result(text, pt, trees=1, fmt='tree'):
+    """
+    Display the outcome of a parse.
+    :param text: The parsed sentence.
+    :param pt: The ParseSuccess or ParseFail obtained for it.
+    :param trees: How many trees to display if the result holds a forest of alternative parses.
+    :param fmt: One of FORMATS.
+    :return: None
+    """
+    if fmt != 'tree':
+        tree = pt.compact() if isinstance(pt, ParseSuccess) else EMPTY_TREE
+        if fmt == 'brackets':
+            print(tree.to_brackets() if len(tree) else '()')
+        elif fmt == 'json':
+            print(json.dumps({'text': text, 'tree': tree.to_dict() if len(tree) else None}))
+        else:
+            sys.stdout.flush()
+            sys.stdout.buffer.write(tree.to_bytes())
+        return
+
+    print(text + ':')
+    if not isinstance(pt, ParseSuccess):
+        pt.dump()
+    elif pt.forest is None or trees == 1:
         pt.pretty_print()
     else:
-        pt.dump()
+        total = pt.forest.count()
+        for i, root in enumerate(pt.forest.trees(trees if trees > 0 else None)):
+            print(f'Parse {i + 1} of {total}:')
+            ParseSuccess(name="Root", node=root).pretty_print()
 
 
 if __name__ == '__main__':
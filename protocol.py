@@ -0,0 +1,40 @@
+"""
+The request line format shared by the parse server and batch parsing.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+A request line is raw text, or a JSON object with "text" as a string or "tokens" as [word, tag] pairs for already
+tagged input. Other keys of the object, such as "id" and "format", are passed on as they are.
+
+:date: 10/16/2026 19:45
+"""
+
+from typing import *
+import json
+
+
+def decode_request(line: str, line_number: int) -> Dict:
+    """
+    Interpret a request line.
+    :param line: The line, without its line break.
+    :param line_number: The position of the line in its stream, used as the id if the request has none.
+    :return: A request with an id and either text or tokens.
+    """
+    if not line.startswith('{'):
+        return {'id': line_number, 'text': line}
+
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f'Invalid JSON: {e}') from None
+    if not isinstance(request, dict):
+        raise ValueError('A request must be a JSON object')
+    request.setdefault('id', line_number)
+
+    if isinstance(request.get('text'), str):
+        return request
+    tokens = request.get('tokens')
+    if isinstance(tokens, list) and all(isinstance(t, list) and len(t) == 2 and all(isinstance(x, str) for x in t)
+                                        for t in tokens):
+        request.pop('text', None)
+        return request
+    raise ValueError('A request needs either "text" as a string or "tokens" as a list of [word, tag] pairs')
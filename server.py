@@ -0,0 +1,320 @@
+"""
+A long-running parse service.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+The server loads the grammar once, keeps the parser and tagger warm in a pool of worker processes, and answers
+requests over a line protocol on stdin/stdout or a Unix socket. Each request is a line of raw text, or a JSON object:
+    {"id": 7, "text": "We were not allowed to dive"}
+    {"id": 8, "tokens": [["We", "PRP"], ["dive", "VB"]], "format": "brackets"}
+Each reply is a JSON object on a line of its own. Replies can arrive out of order and carry the id of their request,
+or the line number of the request if it had no id. A reply has "ok": true and a "tree" on success. Otherwise it has
+an "error" of "parse_failed" or "limit_exceeded" (with a "failure" description), "timeout", "bad_request" or
+"internal".
+
+At most max_pending requests are in progress at a time; beyond that, the server stops reading its input until a
+request finishes, which pushes back on clients.
+
+:date: 10/16/2026 19:50
+"""
+
+from typing import *
+import asyncio
+import concurrent.futures
+import json
+import os
+import stat
+import sys
+import threading
+import time
+
+from shift_reduce_parser import ParseSuccess
+from protocol import decode_request
+
+
+READ_LIMIT = 1 << 20  # The longest request line accepted, in bytes
+
+_worker_parser = None  # The parser owned by a worker process.
+
+
+def _init_worker(parser):
+    """
+    Process pool initializer. Receives the parser once, so the grammar and NLTK models are loaded once per worker.
+    :param parser: The parser to use in this worker.
+    :return: None
+    """
+    global _worker_parser
+    _worker_parser = parser
+
+
+def _respond_in_worker(request: Dict) -> Dict:
+    return respond(_worker_parser, request)
+
+
+def respond(parser, request: Dict) -> Dict:
+    """
+    Parse the sentence of a request and describe the outcome.
+    :param parser: Any parser exposing a parse(text) method.
+    :param request: A decoded request with an id and either text or tokens.
+    :return: The reply.
+    """
+    reply = {'id': request['id']}
+    sentence = request['text'] if 'text' in request else [(word, tag) for word, tag in request['tokens']]
+    start = time.perf_counter()
+    try:
+        result = parser.parse(sentence)
+    except Exception as e:
+        reply.update(ok=False, error='internal', message=f'{type(e).__name__}: {e}')
+        return reply
+    reply['parse_ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+    if isinstance(result, ParseSuccess):
+        tree = result.compact()
+        reply.update(ok=True, tree=tree.to_brackets() if request.get('format') == 'brackets' else tree.to_dict())
+    else:
+        reply.update(ok=False, error='limit_exceeded' if result.limit_exceeded else 'parse_failed',
+                     failure=result.to_dict())
+    return reply
+
+
+class _StdinReader:
+    """
+    Reads lines of stdin without blocking the event loop, whether it is a pipe, a terminal or a file.
+    """
+
+    async def readline(self) -> bytes:
+        return await asyncio.get_running_loop().run_in_executor(None, self._readline)
+
+    @staticmethod
+    def _readline() -> bytes:
+        line = sys.stdin.buffer.readline(READ_LIMIT)
+        if len(line) == READ_LIMIT and not line.endswith(b'\n'):
+            # Like asyncio.StreamReader.readline() on a socket. The rest of the line must not be read as a request.
+            raise ValueError('Request line too long')
+        return line
+
+
+class ParseServer:
+    """
+    Serves parse requests with a bounded pool of workers.
+    """
+
+    def __init__(self, parser, workers: int = 1, max_pending: int = 64, timeout: float = 10.0):
+        """
+        Create a server. Nothing is started until one of the serve methods is awaited.
+        :param parser: Any parser exposing a parse(text) method. Must be picklable if workers > 0.
+        :param workers: The number of worker processes. 0 parses on a single thread of this process instead.
+        :param max_pending: The most requests that may be in progress, across all connections.
+        :param timeout: Seconds after which a request is answered with a timeout error. The worker is not
+            interrupted, and its slot only becomes free once it finishes.
+        """
+        self.parser = parser
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.stats = {'requests': 0, 'parsed': 0, 'failed': 0, 'limited': 0, 'timeouts': 0, 'errors': 0}
+        self._executor = None
+        self._slots = None
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the worker pool. Called by the serve methods; safe to call more than once.
+        :return: None
+        """
+        if self._executor is not None:
+            return
+        if self.workers > 0:
+            self._executor = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                                    initargs=(self.parser,))
+        else:
+            self._executor = concurrent.futures.ThreadPoolExecutor(1)
+
+    def close(self):
+        """
+        Stop the worker pool, waiting for requests in progress.
+        :return: None
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def handle(self, request: Dict) -> Tuple[Dict, Optional[asyncio.Future]]:
+        """
+        Parse a decoded request on the worker pool.
+        :param request: A request with an id and either text or tokens.
+        :return: The reply, and the parse that is still running if the reply is a timeout, or None.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        if self.workers > 0:
+            future = loop.run_in_executor(self._executor, _respond_in_worker, request)
+        else:
+            future = loop.run_in_executor(self._executor, respond, self.parser, request)
+
+        try:
+            reply = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._count('timeouts')
+            # Hold on to the slot until the worker is actually free again.
+            future.add_done_callback(lambda f: f.exception())
+            return {'id': request['id'], 'ok': False, 'error': 'timeout',
+                    'message': f'No result within {self.timeout:g} s'}, future
+        except Exception as e:
+            self._count('errors')
+            return {'id': request['id'], 'ok': False, 'error': 'internal',
+                    'message': f'{type(e).__name__}: {e}'}, None
+
+        error = reply.get('error')
+        self._count('parsed' if reply['ok'] else 'failed' if error == 'parse_failed' else
+                    'limited' if error == 'limit_exceeded' else 'errors')
+        return reply, None
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    async def serve_stream(self, reader, write: Callable[[Dict], Awaitable[None]]):
+        """
+        Answer every request line of a stream until it ends.
+        :param reader: An object with an async readline() method returning bytes, such as an asyncio.StreamReader.
+        :param write: A coroutine function sending one reply.
+        :return: None, once every request has been answered.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        tasks = set()
+        line_number = 0
+        while True:
+            # Only read another request once there is room for it.
+            await self._slots.acquire()
+            try:
+                line = await reader.readline()
+            except ValueError:  # The line exceeded READ_LIMIT; the stream can not be resynchronized.
+                self._slots.release()
+                await write({'id': None, 'ok': False, 'error': 'bad_request', 'message': 'Request line too long'})
+                break
+            if not line:
+                self._slots.release()
+                break
+
+            line_number += 1
+            text = line.decode(errors='replace').strip()
+            if not text:
+                self._slots.release()
+                continue
+
+            task = asyncio.ensure_future(self._serve_line(text, line_number, write))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _serve_line(self, line: str, line_number: int, write: Callable[[Dict], Awaitable[None]]):
+        """
+        Answer one request line, then free its slot.
+        """
+        try:
+            self._count('requests')
+            try:
+                request = decode_request(line, line_number)
+            except ValueError as e:
+                self._count('errors')
+                await write({'id': line_number, 'ok': False, 'error': 'bad_request', 'message': str(e)})
+                return
+            reply, future = await self.handle(request)
+            await write(reply)
+            if future is not None:
+                await asyncio.wait([future])
+        finally:
+            self._slots.release()
+
+    async def serve_stdio(self):
+        """
+        Serve requests from stdin, writing replies to stdout, until stdin is closed.
+        :return: None
+        """
+        def write_line(reply):
+            sys.stdout.write(json.dumps(reply) + '\n')
+            sys.stdout.flush()
+
+        async def write(reply):
+            write_line(reply)
+
+        self.start()
+        await self.serve_stream(_StdinReader(), write)
+
+    async def serve_unix(self, path: str, ready: Callable[[], None] = None):
+        """
+        Serve requests from every client connecting to a Unix socket, until cancelled.
+        :param path: The socket file to create. An existing socket file is replaced, but any other file is left alone
+            and FileExistsError is raised.
+        :param ready: Called once the socket accepts connections.
+        :return: None
+        """
+        async def on_connect(reader, writer):
+            lock = asyncio.Lock()
+
+            async def write(reply):
+                async with lock:
+                    writer.write(json.dumps(reply).encode() + b'\n')
+                    await writer.drain()
+
+            try:
+                await self.serve_stream(reader, write)
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        _remove_socket(path)
+        self.start()
+        server = await asyncio.start_unix_server(on_connect, path, limit=READ_LIMIT)
+        try:
+            async with server:
+                if ready is not None:
+                    ready()
+                await server.serve_forever()
+        finally:
+            _remove_socket(path)
+
+
+def _remove_socket(path: str):
+    """
+    Delete a socket file left behind by a server, refusing to delete anything else.
+    :param path: The socket file. It does not have to exist.
+    :return: None
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f'{path} exists and is not a socket')
+    os.unlink(path)
+
+
+def serve(parser, socket_path: str = None, workers: int = 1, max_pending: int = 64, timeout: float = 10.0) \
+        -> Dict[str, int]:
+    """
+    Run a ParseServer until its input ends or it is interrupted.
+    :param parser: Any parser exposing a parse(text) method.
+    :param socket_path: A Unix socket to listen on. Serves stdin/stdout if omitted.
+    :param workers: The number of worker processes. 0 parses on a single thread of this process instead.
+    :param max_pending: The most requests that may be in progress at a time.
+    :param timeout: Seconds after which a request is answered with a timeout error.
+    :return: The request statistics of the server.
+    """
+    server = ParseServer(parser, workers, max_pending, timeout)
+    try:
+        if socket_path is None:
+            asyncio.run(server.serve_stdio())
+        else:
+            print(f'Listening on {socket_path}', file=sys.stderr)
+            asyncio.run(server.serve_unix(socket_path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return server.stats
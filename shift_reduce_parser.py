@@ -7,9 +7,69 @@ CS 799.06 Graduate Independent Study in NLP/NLU.
 """
 
 from typing import *
-from grammar import Grammar, Symbol, Reduction
-import nltk
-from string import punctuation
+import time
+from grammar import Grammar, Symbol, Node, Reduction
+from tagger import TaggingStage, NLTKTagger, TaggedSentence
+from instrumentation import ParseMetrics, MetricsSink, as_sink
+from parse_cache import ParseCache
+from compact_tree import CompactTree
+
+
+_worker_parser = None  # The parser owned by a parse_many worker process.
+
+
+def _init_worker(parser):
+    """
+    Process pool initializer. Receives the parser once, so the grammar and NLTK models are loaded once per worker.
+    :param parser: The parser to use in this worker.
+    :return: None
+    """
+    global _worker_parser
+    _worker_parser = parser
+
+
+def _parse_in_worker(text: Union[str, TaggedSentence]):
+    return _worker_parser.parse(text)
+
+
+def parse_many(parser, sentences: Iterable[Union[str, TaggedSentence]], jobs: int = 1, chunksize: int = 16) -> Iterator:
+    """
+    Parse a stream of sentences, optionally fanning them out across several processes.
+    :param parser: Any parser exposing a parse(text) method. Must be picklable if jobs > 1.
+    :param sentences: The sentences to parse, as text or (word, tag) pairs. Consumed lazily: at most a few chunks
+        per worker are read ahead of the results taken.
+    :param jobs: The number of worker processes. 1 parses in the calling process.
+    :param chunksize: How many sentences are sent to a worker at a time.
+    :return: A generator of parse results, in input order.
+    """
+    if jobs <= 1:
+        for text in sentences:
+            yield parser.parse(text)
+        return
+
+    import multiprocessing  # Only needed here, and comparatively slow to import.
+    import threading
+
+    # Pool.imap reads its input as fast as it can, which would pull a whole corpus into memory. The window blocks
+    # the thread feeding the pool once enough sentences are in flight. It must hold at least one full chunk.
+    window = threading.Semaphore(4 * jobs * chunksize)
+    closed = False
+
+    def feed():
+        for text in sentences:
+            window.acquire()
+            if closed:
+                return
+            yield text
+
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(parser,)) as pool:
+        try:
+            for result in pool.imap(_parse_in_worker, feed(), chunksize):
+                window.release()
+                yield result
+        finally:
+            closed = True
+            window.release()  # Wake up the feeding thread if it is waiting, so the pool can shut down.
 
 
 class ParseSuccess:
@@ -17,53 +77,167 @@ class ParseSuccess:
     Outcome of a successful parse containing a full parse tree.
     """
 
-    def __init__(self, name: str, node: Symbol = None):
+    def __init__(self, name: str, node: Node = None, forest=None):
         self.name = name
         self.root = node
+        self.forest = forest  # Every parse of the sentence, for engines that find them all
+        self._compact = None
+
+    def compact(self) -> CompactTree:
+        """
+        Get the parse tree as parallel arrays, for fast serialization.
+        :return: The CompactTree of the parse, built on first use.
+        """
+        if self._compact is None:
+            self._compact = CompactTree.from_node(self.root)
+        return self._compact
 
     def pretty_print(self):
         """
         Graphically display the parse tree structure.
         :return:
         """
-        self._pretty_print_help(self.root, 0)
+        for line in self._pretty_print_help(self.root):
+            print(line)
+
+    @staticmethod
+    def _pretty_print_help(root: Node) -> Iterator[str]:
+        """
+        Generate the lines of the tree display in pre-order, without recursion.
+        """
+        stack = [(root, 0)]
+        while stack:
+            sym, depth = stack.pop()
+            pad = '|\t' * depth
+            val = f' ({sym.value})' if sym.value is not None else ''
+            yield pad + str(sym) + val
+            stack.extend((s, depth + 1) for s in reversed(sym.components))
+
 
-    def _pretty_print_help(self, sym: Symbol, depth):
-        pad = '|\t' * depth
-        val = f' ({sym.value})' if sym.value is not None else ''
-        print(pad + str(sym) + val)
-        for s in sym.components:
-            self._pretty_print_help(s, depth + 1)
+class ParseLimits(NamedTuple):
+    """
+    Bounds on the resources a single parse may use, e.g. to protect a service from adversarial input. A parse that
+    exceeds one is abandoned with a ParseFail whose reason is the name of the limit. None leaves a resource unbounded.
+    """
+
+    max_frames: Optional[int] = None     # Live state frames of SRParser, or Earley items of ChartParser
+    max_depth: Optional[int] = None      # Constituents on the parse stack of SRParser or LRParser
+    max_tokens: Optional[int] = None     # Tokens in the sentence
+    time_budget: Optional[float] = None  # Seconds spent parsing, after tagging. Per push() or finalize() for streams
+
+
+UNGRAMMATICAL = 'ungrammatical'  # The ParseFail reason of a sentence the grammar does not cover
 
 
-class ParseFail:
+class ParseFail(NamedTuple):
     """
-    A class capturing parse failure with some debug information.
+    Outcome of a failed parse: an immutable record of where the parse got stuck and what it had built so far.
+    It holds no reference to the parser state, so it stays valid, and small, however the parser is reused.
     """
 
-    def __init__(self, parse_stack, input_stack, state, token=None):
+    index: int                  # Index of the first token the parse could not get past; the sentence length at its end
+    symbol: Optional[Symbol]    # The offending terminal, or the constituent SRParser reduced from it; None at the end
+    word: Optional[str]         # The word of the offending token, if it is a token
+    expected: FrozenSet[Symbol]  # The terminals, possibly Grammar.RULE_END, that the grammar would have accepted
+    constituents: Tuple[Tuple[Symbol, int, int], ...]  # (Symbol, start, end) of every completed partial constituent
+    reason: str = UNGRAMMATICAL  # UNGRAMMATICAL, or the ParseLimits field that was exceeded. Nothing is expected then
+
+    @property
+    def limit_exceeded(self) -> bool:
+        """
+        :return: Whether the parse was abandoned because of a ParseLimits bound rather than the grammar.
+        """
+        return self.reason != UNGRAMMATICAL
+
+    @classmethod
+    def at(cls, parsed: Sequence[Node], token: Optional[Node], expected: Iterable[Symbol],
+           reason: str = UNGRAMMATICAL) -> 'ParseFail':
+        """
+        Record a failure from the state of a stack-based parser.
+        :param parsed: The constituents on the parse stack, in sentence order. Their leaves are the tokens before
+            the offending one.
+        :param token: The offending token or constituent, or None if the input ran out.
+        :param expected: The terminals the parser would have accepted instead.
+        :param reason: Why the parse failed.
+        :return: A new ParseFail.
+        """
+        constituents = []
+        index = 0
+        for node in parsed:
+            # Count the tokens under the node to find its span.
+            width = 0
+            stack = [node]
+            while stack:
+                n = stack.pop()
+                if n.components:
+                    stack.extend(n.components)
+                elif n.value is not None:
+                    width += 1
+            constituents.append((node.symbol, index, index + width))
+            index += width
+
+        if token is None:
+            return cls(index, None, None, frozenset(expected), tuple(constituents), reason)
+        word = token.value if not token.components else None
+        return cls(index, token.symbol, word, frozenset(expected), tuple(constituents), reason)
+
+    @classmethod
+    def too_long(cls, tokens: Sequence[Node], limit: int) -> 'ParseFail':
+        """
+        Record the rejection of a sentence with more tokens than allowed, before parsing it.
+        :param tokens: The sentence.
+        :param limit: The most tokens allowed.
+        :return: A new ParseFail.
+        """
+        return cls(limit, tokens[limit].symbol, tokens[limit].value, frozenset(), (), 'max_tokens')
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: A JSON-compatible description of the failure.
         """
-        Create an instance.
-        :param parse_stack: The contents of the parse stack at the time of failure.
-        :param input_stack: The contents of the input stack at the time of failure.
-        :param state: The root of the state tree.
+        return {'index': self.index,
+                'symbol': None if self.symbol is None else self.symbol.name,
+                'word': self.word,
+                'expected': sorted(sym.name for sym in self.expected),
+                'constituents': [[sym.name, start, end] for sym, start, end in self.constituents],
+                'reason': self.reason}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ParseFail':
         """
-        self.parse_stack = parse_stack
-        self.input_stack = input_stack
-        self.state = state
-        self.token = token
+        Rebuild a failure from the output of to_dict().
+        :param data: The dictionary.
+        :return: A new ParseFail.
+        """
+        return cls(data['index'], None if data['symbol'] is None else Symbol(data['symbol']), data['word'],
+                   frozenset(Symbol(name) for name in data['expected']),
+                   tuple((Symbol(name), start, end) for name, start, end in data['constituents']),
+                   data.get('reason', UNGRAMMATICAL))
 
     def dump(self):
+        found = 'the end of the sentence' if self.symbol is None else \
+            f'{self.symbol}' + ('' if self.word is None else f' ({self.word})')
+        parsed = ' '.join(f'{sym}[{start}:{end}]' for sym, start, end in self.constituents) or 'nothing'
+        if self.limit_exceeded:
+            print(f"""
+Parse Abandoned!
+    At token {self.index}, found:
+        {found}
+    Exceeded the limit:
+        {self.reason}
+    Parsed so far:
+        {parsed}
+        """)
+            return
+        expected = ', '.join(sorted(sym.name for sym in self.expected)) or 'nothing'
         print(f"""
 Parse Failed!
-    Parse stack:
-        {self.parse_stack}
-    Input stack:
-        {self.input_stack}
-    Token:
-        {self.token}
-    State:
-        {self.state}
+    At token {self.index}, found:
+        {found}
+    Expected one of:
+        {expected}
+    Parsed so far:
+        {parsed}
         """)
 
 
@@ -72,11 +246,14 @@ class StateFrame:
     A representation of a state frame, i.e. a candidate transition CFG rule with a set of derived children.
     """
 
-    def __init__(self, data: Tuple[Symbol, int, int]):
+    __slots__ = ('from_sym', 'to_sym', 'rule', 'constituent', 'children', 'parent', 'to_delete')
+
+    def __init__(self, data: Tuple[Symbol, int, int], to_sym: Tuple[Symbol, ...] = ()):
         """
         Create a new StateFrame.
         :param data: A tuple containing which symbol is the rule derived from, the index into the rule set,
             and the active constituent pointer.
+        :param to_sym: The right hand side of the rule, as stored by the grammar.
 
         See documentation below for specifics for the following toy example:
         S -> NP VP
@@ -94,13 +271,55 @@ class StateFrame:
         ]
         """
         self.from_sym = data[0]     # Symbol from which the frame is derived, VP
-        self.to_sym = []            # Symbols generated by the rule, V NP
+        self.to_sym = to_sym        # Symbols generated by the rule, V NP. The grammar's tuple, shared and never modified.
         self.rule = data[1]         # Rule set index. There is 1 VP -> ... rule, so 0
         self.constituent = data[2]  # Active constituent index. V has been consumed, NP is active, so 1
         self.children = []          # Derived rule stat frames, [(NP -> ART N | 0)]
         self.parent = None          # Pointer to state frame that owns this one, (S -> NP VP | 1)
         self.to_delete = False      # Whether this frame has been flagged for deletion (used for tree pruning.)
 
+    def clone(self, parent=None, pool: 'FramePool' = None):
+        """
+        Copy this frame and its entire subtree.
+        :param parent: The frame that will own the copy.
+        :param pool: A pool to take the new frames from, if any.
+        :return: A new StateFrame that shares no mutable state with this one.
+        """
+        root = None
+        stack = [(self, parent)]
+        while stack:
+            frame, owner = stack.pop()
+            if pool is None:
+                cpy = StateFrame((frame.from_sym, frame.rule, frame.constituent), frame.to_sym)
+                cpy.parent = owner
+            else:
+                cpy = pool.take((frame.from_sym, frame.rule, frame.constituent), frame.to_sym, owner)
+            cpy.to_delete = frame.to_delete
+            if frame is self:
+                root = cpy
+            else:
+                owner.children.append(cpy)
+            # Reversed, so that children are popped, and therefore appended, in their original order.
+            stack.extend((c, cpy) for c in reversed(frame.children))
+        return root
+
+    def size(self) -> int:
+        """
+        :return: The number of frames in the subtree rooted at this frame, including itself.
+        """
+        return sum(1 for _ in self.walk())
+
+    def walk(self) -> Iterator['StateFrame']:
+        """
+        Visit this frame and all its descendants in pre-order, without recursion.
+        :return: A generator of frames.
+        """
+        stack = [self]
+        while stack:
+            frame = stack.pop()
+            yield frame
+            stack.extend(reversed(frame.children))
+
     def __hash__(self):
         """
         Hash function override. Frames are only compared on the basis of origin symbol, rule index, and productions.
@@ -151,87 +370,245 @@ class StateFrame:
         return self.from_sym == other.from_sym and self.rule == other.rule and self.constituent == other.constituent
 
 
+class FramePool:
+    """
+    A free list of StateFrames discarded by earlier steps or parses, so that new frames can reuse them instead of
+    being allocated. One pool serves all the parses of a parser; appending to and popping from a list are atomic,
+    so concurrent parses need no lock. The counters are only approximate under concurrent use.
+    """
+
+    __slots__ = ('maxsize', 'allocated', 'reused', '_free')
+
+    def __init__(self, maxsize: int = 4096):
+        """
+        Create an empty pool.
+        :param maxsize: The most frames to keep for reuse. 0 disables reuse.
+        """
+        self.maxsize = maxsize
+        self.allocated = 0  # Frames created because the pool was empty
+        self.reused = 0     # Frames taken from the pool
+        self._free = []
+
+    def __len__(self):
+        return len(self._free)
+
+    def __reduce__(self):
+        # A copy of a parser starts with an empty pool of its own.
+        return FramePool, (self.maxsize,)
+
+    def take(self, data: Tuple[Symbol, int, int], to_sym: Tuple[Symbol, ...], parent: StateFrame) -> StateFrame:
+        """
+        Get a fresh frame, recycled if possible.
+        :param data: The symbol the rule is derived from, the rule index, and the active constituent pointer.
+        :param to_sym: The right hand side of the rule, as stored by the grammar.
+        :param parent: The frame that will own the new one. The caller still has to add it to the parent's children.
+        :return: A StateFrame with no children.
+        """
+        try:
+            frame = self._free.pop()
+        except IndexError:
+            self.allocated += 1
+            frame = StateFrame(data, to_sym)
+            frame.parent = parent
+            return frame
+
+        self.reused += 1
+        frame.from_sym, frame.rule, frame.constituent = data
+        frame.to_sym = to_sym
+        frame.parent = parent
+        frame.to_delete = False
+        return frame
+
+    def recycle(self, frames: List[StateFrame]):
+        """
+        Return frames that are no longer part of any state tree to the pool.
+        :param frames: The frames. They must not be used by the caller afterwards.
+        :return: None
+        """
+        # Detach every frame, kept or not: the reducer takes a frame without a parent for one that is already gone.
+        for frame in frames:
+            frame.children.clear()
+            frame.parent = None
+        free = self._free
+        free.extend(frames[:max(self.maxsize - len(free), 0)])
+
+
+class ParseContext:
+    """
+    All mutable state of a single SRParser.parse call.
+    Keeping it separate from the parser lets one parser instance serve several parses at once.
+    """
+
+    def __init__(self, state: StateFrame):
+        """
+        Create a new context.
+        :param state: The root of a state tree owned exclusively by this context.
+        """
+        self.state = state        # Root of the state tree
+        self.parse_stack = []     # A stack of parsed Nodes
+        self.input_stack = []     # A stack of input tokens and reduced Nodes.
+        self.needs_prune = False  # Whether some frames have been flagged for deletion since the last pruning
+        self.frames_created = 0   # How many frames were predicted during this parse
+        self.frames_released = 0  # How many of them were pruned or discarded since
+        self.prune_passes = 0     # How many times the state tree had to be pruned during this parse
+        self.metrics = None       # The ParseMetrics being filled in, if a sink is attached
+        self.predict_pending = False  # Whether prediction for the next token is owed, see SRParser._run
+
+    def copy(self) -> 'ParseContext':
+        """
+        Copy the context so that the copy can be advanced independently. Nodes are shared, as parsing never
+        modifies them. Metrics are not carried over.
+        :return: A new ParseContext.
+        """
+        cpy = ParseContext(self.state.clone())
+        cpy.parse_stack = list(self.parse_stack)
+        cpy.input_stack = list(self.input_stack)
+        cpy.needs_prune = self.needs_prune
+        cpy.frames_created = self.frames_created
+        cpy.frames_released = self.frames_released
+        cpy.prune_passes = self.prune_passes
+        cpy.predict_pending = self.predict_pending
+        return cpy
+
+
 class SRParser:
     """
     An implementation of a shift-reduce parser.
     """
 
-    def __init__(self, grammar: Grammar, reduction: Reduction = None, verbose: bool = False):
+    def __init__(self, grammar: Grammar, reduction: Reduction = None, verbose: bool = False,
+                 tagging: TaggingStage = None, predict: bool = True,
+                 metrics: Union[MetricsSink, Callable[[ParseMetrics], Any]] = None, result_cache: ParseCache = None,
+                 frame_pool: int = 4096, limits: ParseLimits = None):
         """
         Initialize a parser with some global parameters.
         :param grammar: A CFG grammar driving acceptable transitions.
         :param reduction: A mapping of a complex grammar to a simpler one.
         :param verbose: Enables additional output.
+        :param tagging: The stage turning sentences into terminals. Uses NLTK and the reduction if omitted.
+        :param predict: Only create frames for rules that can accept the upcoming token, based on FIRST sets.
+            If false, every rule reachable from the active constituents is expanded.
+        :param metrics: A MetricsSink, or a function, receiving a ParseMetrics record after every parse.
+            Sinks attached to a parser used with parse_many(jobs > 1) only see the parses of the calling process.
+        :param result_cache: An optional cache of parse trees for repeated terminal sequences.
+        :param frame_pool: How many discarded state frames to keep for reuse by later frames. 0 disables reuse.
+        :param limits: Bounds on the live frames, parse stack depth, tokens and time of every parse. Unbounded if
+            omitted.
         """
         self._grammar = grammar
-        self.__parse_stack = []  # A stack of parsed Symbols
-        self.__input_stack = []  # A stack of raw input strings and reduced Symbols.
         self._reduction = reduction
-        self._needs_prune = False
         self.verbose = verbose
-
-        # Check if necessary NLTK resources are available.
-        try:
-            nltk.find('tokenizers/punkt')
-        except LookupError:
-            print('Missing NLTK "punkt" package, downloading...')
-            nltk.download('punkt')
-
-        try:
-            nltk.find('taggers/averaged_perceptron_tagger')
-        except LookupError:
-            print('Missing NLTK "Perceptron Tagger" package, downloading...')
-            nltk.download('averaged_perceptron_tagger')
+        self.predict = predict
+        self.metrics = as_sink(metrics)
+        self.result_cache = result_cache
+        self.tagging = TaggingStage(reduction, NLTKTagger(), verbose=verbose) if tagging is None else tagging
+        self.frame_pool = FramePool(frame_pool)
+        self.limits = ParseLimits() if limits is None else limits
 
         # Create an artificial state frame to server as parse tree root.
-        root_frame = StateFrame((Grammar.ROOT_SYM, 0, 0))
-        root_frame.to_sym = [grammar.start_symbol]
-        self.__state = root_frame
+        root_frame = StateFrame((Grammar.ROOT_SYM, 0, 0), grammar[Grammar.ROOT_SYM][0])
 
         # Generate the initial rule set as all rules accessible from the start point.
+        # This tree is never modified after construction; every parse works on its own copy of it.
         self._set_looking_for(root_frame, create_all=True)
+        self.__initial_state = (root_frame, root_frame.size())
+        self.__initial_states = {}  # First token -> initial state tree expanded with only that token in mind.
 
-    def dump_state(self):
+    def parse_many(self, sentences: Iterable[Union[str, TaggedSentence]], jobs: int = 1, chunksize: int = 16) \
+            -> Iterator[Union[ParseSuccess, ParseFail]]:
+        """
+        Parse a stream of sentences. See parse_many() at module level.
+        :param sentences: The sentences to parse, as text or (word, tag) pairs. Consumed lazily.
+        :param jobs: The number of worker processes.
+        :param chunksize: How many sentences are sent to a worker at a time.
+        :return: A generator of parse results, in input order.
+        """
+        return parse_many(self, sentences, jobs, chunksize)
+
+    def stream(self) -> 'ParseStream':
+        """
+        Start parsing a sentence whose tokens will arrive one at a time.
+        :return: A ParseStream to push tokens into.
+        """
+        return ParseStream(self)
+
+    def new_context(self, lookahead: Symbol = None) -> ParseContext:
+        """
+        Create a fresh parse context with a copy of the initial state tree.
+        :param lookahead: The first token of the sentence, if known. Used to pick a smaller initial tree.
+        :return: A ParseContext ready for parsing.
+        """
+        if not self.predict or lookahead is None:
+            initial = self.__initial_state
+        else:
+            initial = self.__initial_states.get(lookahead)
+            if initial is None:
+                root_frame = StateFrame((Grammar.ROOT_SYM, 0, 0), self._grammar[Grammar.ROOT_SYM][0])
+                self._set_looking_for(root_frame, create_all=True, lookahead=lookahead)
+                initial = (root_frame, root_frame.size())
+                self.__initial_states[lookahead] = initial  # Racing threads build identical trees, no lock needed.
+
+        ctx = ParseContext(initial[0].clone(pool=self.frame_pool))
+        ctx.frames_created = initial[1]
+        return ctx
+
+    def dump_state(self, context: ParseContext = None):
         """
         Display the parser's state tree on the console.
+        :param context: The parse whose state to display. If omitted, the initial state is displayed.
         :return: None
         """
-        return self._dump_state_help(0, self.__state)
+        return self._dump_state_help(0, self.__initial_state[0] if context is None else context.state)
 
-    def _dump_state_help(self, depth: int, frame: StateFrame):
+    @staticmethod
+    def _dump_state_help(depth: int, frame: StateFrame):
         """
-        A recursive helper for state tree parser.
+        A non-recursive helper for state tree parser.
         """
-        pad = '|\t' * depth
-        result = pad + ' ' + str(frame) + '\n'
-        for f in frame.children:
-            result += self._dump_state_help(depth + 1, f)
-        return result
-
-    def _set_looking_for(self, start: StateFrame, create_all=False):
+        lines = []
+        stack = [(frame, depth)]
+        while stack:
+            f, d = stack.pop()
+            lines.append('|\t' * d + ' ' + str(f) + '\n')
+            stack.extend((c, d + 1) for c in reversed(f.children))
+        return ''.join(lines)
+
+    def _set_looking_for(self, start: StateFrame, create_all=False, lookahead: Symbol = None,
+                         ctx: ParseContext = None):
         """
         Navigate all rules reachable from a given state of the grammar.
         :param start: The symbol to start from.
         :param create_all: If true, will only do work on leaf nodes.
+        :param lookahead: If given, only rules that can begin with this token are expanded.
+            Grammar.RULE_END stands for the end of the input.
+        :param ctx: The current parse context, if any, for bookkeeping.
         :return: None
         """
-        # Only perform this if constituent is not out of range
-        if start.constituent < len(start.to_sym):
+        take = self.frame_pool.take
+        stack = [(start, create_all)]
+        while stack:
+            start, create_all = stack.pop()
+
+            # Only perform this if constituent is not out of range
+            if start.constituent >= len(start.to_sym):
+                continue
+
             if create_all or not start.children:
-                rules = self._grammar[start.to_sym[start.constituent]]  # Get all the rules visible from the start.
-                for rule in range(len(rules)):
+                sym = start.to_sym[start.constituent]
+                rules = self._grammar[sym]  # Get all the rules visible from the start.
+                candidates = range(len(rules)) if lookahead is None else self._grammar.predict(sym, lookahead)
+                for rule in candidates:
 
                     # Do not duplicate rules already in progress.
                     if not any(f.rule == rule for f in start.children):
                         # Create a "fresh" frame for this rule
-                        frame = StateFrame((start.to_sym[start.constituent], rule, 0))
-                        frame.to_sym = [x for x in rules[rule]]
-                        frame.parent = start
+                        frame = take((sym, rule, 0), rules[rule], start)
                         start.children.append(frame)  # Indicate that this frame is a descendant of start
+                        if ctx is not None:
+                            ctx.frames_created += 1
 
             # Now, go through existing children and expand their rules based on their cursors
-            for c in start.children:
-                self._set_looking_for(c)
+            stack.extend((c, False) for c in start.children)
 
     def _look_for(self, state_frame: StateFrame) -> Symbol:
         """
@@ -243,27 +620,23 @@ class SRParser:
             return Grammar.RULE_END
         return self._grammar[state_frame.from_sym][state_frame.rule][state_frame.constituent]
 
-    def _traverse_state(self, root: StateFrame) -> List[StateFrame]:
+    @staticmethod
+    def _traverse_state(root: StateFrame) -> Iterator[StateFrame]:
         """
-        Perform a BFS of the state tree.
-        :return: An arrya of state frame pointers.
+        Enumerate every frame below the root. All children of a frame are produced together,
+        followed by the descendants of each child in turn, so frames closer to the root come first.
+        :return: A generator of state frame pointers.
         """
-        result = []
-
-        if not root.children:
-            return []
-
-        result.extend(root.children)  # Gather all nodes on the current level.
-
-        for f in root.children:
-            sublist = self._traverse_state(f)
-            result.extend(sublist)
+        stack = [root]
+        while stack:
+            frame = stack.pop()
+            yield from frame.children  # Gather all nodes on the current level.
+            stack.extend(reversed(frame.children))
 
-        return result
-
-    def _reduce(self, frames: List[StateFrame]):
+    def _reduce(self, ctx: ParseContext, frames: Iterable[StateFrame]):
         """
         Consolidate the parse stack of the state tree using a priority system.
+        :param ctx: The current parse context.
         :param frames:
         :return:
         """
@@ -284,26 +657,30 @@ class SRParser:
                 elif frame.constituent >= to_reduce[0].constituent:
                     to_reduce = [frame]
 
-        # Compute which symbol the frame reduces to.
+        # The frame knows which rule it completed, so the reduction does not need to search the grammar.
         to_take = len(self._grammar[to_reduce[0].from_sym][to_reduce[0].rule])
 
-        pattern = [self.__parse_stack.pop() for _ in range(to_take)]
-        pattern.reverse()
+        pattern = ctx.parse_stack[len(ctx.parse_stack) - to_take:]
+        del ctx.parse_stack[len(ctx.parse_stack) - to_take:]
 
-        reduction = self._grammar.match_pattern(pattern)
-        if reduction is None:
-            raise ValueError(f'Could not reduce pattern {pattern}')
+        reduction = self._grammar.reduce_by(to_reduce[0].from_sym, to_reduce[0].rule, pattern)
 
         if self.verbose:
             print(f'\nReduce {reduction} <== {pattern}')
 
         # Push the reduction back onto the input stack
-        reduction.components = pattern
-        self.__input_stack.append(reduction)
+        ctx.input_stack.append(reduction)
 
         # Finally, blow away the reduced state and ALL ITS SIBLINGS
         for f in to_reduce:
+            if f.parent is None:
+                continue  # It was inside the subtree of another reduced frame, and is already gone.
+            discarded = self._subtrees(f.parent.children)
+            ctx.frames_released += len(discarded)
+            if ctx.metrics is not None:
+                ctx.metrics.frames_discarded += len(discarded)
             f.parent.children.clear()
+            self.frame_pool.recycle(discarded)
 
     def _can_reduce(self, frame: StateFrame):
         """
@@ -311,19 +688,27 @@ class SRParser:
         :param frame:
         :return:
         """
-        if not frame.children:
-            return frame.constituent == len(self._grammar[frame.from_sym][frame.rule])
-
-        return any([self._can_reduce(f) for f in frame.children])
-
-    def _shift(self, token: Symbol, frames: List[StateFrame]):
+        # Any complete leaf will do.
+        stack = [frame]
+        while stack:
+            f = stack.pop()
+            if f.children:
+                stack.extend(f.children)
+            elif f.constituent == len(f.to_sym):
+                return True
+        return False
+
+    def _shift(self, ctx: ParseContext, token: Symbol, frames: List[StateFrame]):
         """
         Perform a shift action on the state tree.
+        :param ctx: The current parse context.
         :param token: The input token to shift with.
         :param frames:
         :return:
         """
-        for f in frames:
+        stack = list(frames)
+        while stack:
+            f = stack.pop()
             # If the frame has no children, it is a leaf.
             if not f.children:
                 # If it is a leaf that matches the token, advance it.
@@ -333,10 +718,9 @@ class SRParser:
                     # A leaf that did not get advanced can never happen.
                     # Mark for deletion
                     f.to_delete = True
-                    self._needs_prune = True
-
-            # If not a leaf, recurse.
-            self._shift(token, f.children)
+                    ctx.needs_prune = True
+            else:
+                stack.extend(f.children)
 
     def _can_shift(self, token: Symbol, frame: StateFrame):
         """
@@ -345,106 +729,472 @@ class SRParser:
         :param frame: Frame to start checking at.
         :return:
         """
-        # Once down to a leaf, check if it expects this token.
-        if not frame.children:
-            return self._look_for(frame) == token
-
-        # For frames with children, collect the result on every child.
-        return self._look_for(frame) == token or any([self._can_shift(token, f) for f in frame.children])
-
-    def _prune_state(self, frame: StateFrame):
+        # Any frame in the tree that expects this token will do.
+        stack = [frame]
+        while stack:
+            f = stack.pop()
+            if f.constituent < len(f.to_sym) and f.to_sym[f.constituent] == token:
+                return True
+            stack.extend(f.children)
+        return False
+
+    def _prune_state(self, ctx: ParseContext, frame: StateFrame):
         """
         Eliminate all frames marked for deletion. If this causes a parent to lose all of its children,
         mark the parent for deletion as well.
+        :param ctx: The current parse context.
         :return:
         """
-        if not frame.children:
-            return False
-        # We are at a second-from-the-bottom node if all its children are leaves
-        frame.children = list(filter(lambda c: c.children or not c.to_delete, frame.children))
-
-        # If the frame got rid of all its children, then it needs to go as well.
-        if not frame.children:
-            frame.to_delete = True
-            self._needs_prune = True
-
-        for c in frame.children:
-            self._prune_state(c)
-
-    def _parse_fail(self) -> ParseFail:
+        # Parents are always filtered before their children, so a frame emptied here is only removed on the next pass.
+        stack = [frame]
+        while stack:
+            frame = stack.pop()
+            if not frame.children:
+                continue
+            # We are at a second-from-the-bottom node if all its children are leaves
+            before = frame.children
+            frame.children = [c for c in before if c.children or not c.to_delete]
+            if len(frame.children) < len(before):
+                pruned = [c for c in before if not c.children and c.to_delete]
+                ctx.frames_released += len(pruned)
+                if ctx.metrics is not None:
+                    ctx.metrics.frames_pruned += len(pruned)
+                self.frame_pool.recycle(pruned)
+
+            # If the frame got rid of all its children, then it needs to go as well.
+            if not frame.children:
+                frame.to_delete = True
+                ctx.needs_prune = True
+
+            stack.extend(frame.children)
+
+    @staticmethod
+    def _lap(metrics: ParseMetrics, timer: str, since: float) -> float:
         """
-        Something did not succeed. Return the current state of the parser.
-        :return:
+        Charge the time elapsed since a mark to one of the phase timers.
+        :param metrics: The record to update.
+        :param timer: The name of the timer attribute.
+        :param since: The previous mark.
+        :return: The new mark.
         """
-        return ParseFail(self.__parse_stack, self.__input_stack, self.__state)
+        now = time.perf_counter()
+        setattr(metrics, timer, getattr(metrics, timer) + now - since)
+        return now
 
-    def parse(self, text: str) -> Union[ParseSuccess, ParseFail]:
+    def _parse_fail(self, ctx: ParseContext, token: Optional[Node] = None) -> ParseFail:
+        """
+        Something did not succeed. Record where, and what the state tree was still looking for.
+        :param ctx: The current parse context.
+        :param token: The token or constituent that could be neither shifted nor reduced, if any.
+        :return: A new ParseFail.
+        """
+        if len(ctx.parse_stack) == 1 and not ctx.state.children:
+            # A complete constituent was shifted at the top level, which the root frame does not track.
+            return ParseFail.at(ctx.parse_stack, token, self._expected_after(ctx.parse_stack[0].symbol) or ())
+
+        # No frame is complete when the parse fails, so only the remainders of the rules of the leaves could follow.
+        expected = set()
+        first_of = self._grammar.first_of
+        for frame in ctx.state.walk():
+            if not frame.children and frame.constituent < len(frame.to_sym):
+                expected |= first_of(frame.to_sym[frame.constituent:])
+        return ParseFail.at(ctx.parse_stack, token, expected)
+
+    def _expected_after(self, sym: Symbol) -> Optional[Set[Symbol]]:
+        """
+        Find the terminals that can follow a complete constituent at the start of a sentence.
+        :param sym: The symbol of the constituent.
+        :return: The terminals, plus Grammar.RULE_END if the constituent may be the whole sentence,
+            or None if no sentence can begin with the symbol.
+        """
+        grammar = self._grammar
+        # The left corners of the root: the symbols a sentence can begin with, with the root itself.
+        corners = {Grammar.ROOT_SYM}
+        frontier = [Grammar.ROOT_SYM]
+        while frontier:
+            for rule in grammar[frontier.pop()]:
+                for target in rule:
+                    if target not in corners:
+                        corners.add(target)
+                        frontier.append(target)
+                    if target not in grammar.nullable:
+                        break
+        if sym not in corners:
+            return None
+
+        # Climb from the symbol through the rules it can begin. A rule whose remainder is nullable may be complete,
+        # so whatever can follow its left hand side can follow the symbol as well.
+        expected = set()
+        done = {sym}
+        frontier = [sym]
+        while frontier:
+            corner = frontier.pop()
+            for lhs in corners:
+                for rule in grammar[lhs]:
+                    for i, target in enumerate(rule):
+                        if target == corner:
+                            rest = rule[i + 1:]
+                            expected |= grammar.first_of(rest)
+                            if grammar.is_nullable(rest):
+                                if lhs == Grammar.ROOT_SYM:
+                                    expected.add(Grammar.RULE_END)
+                                elif lhs not in done:
+                                    done.add(lhs)
+                                    frontier.append(lhs)
+                        if target not in grammar.nullable:
+                            break
+        return expected
+
+    def parse(self, text: Union[str, TaggedSentence], stats: Dict[str, int] = None) \
+            -> Union[ParseSuccess, ParseFail]:
         """
         Obtain a grammatical parse tree for a given sentence.
-        :param text: The sentence to parse.
+        :param text: The sentence to parse, either as raw text or as already tagged (word, tag) pairs.
+        :param stats: If given, the number of frames created and prune passes performed are added to it
+            under the 'frames_created' and 'prune_passes' keys. For more detail, attach a metrics sink instead.
         :return: A nested structure representing the parse tree.
         """
-        # Clean the input text.
-        text = ''.join(filter(lambda c: c not in punctuation, text))
+        sink = self.metrics
+        metrics = None
+        if sink is not None:
+            start = time.perf_counter()
+            metrics = ParseMetrics()
+        tokens = self.tagging(text) if metrics is None else self.tagging(text, metrics)
+
+        cache = self.result_cache
+        result = None
+        max_tokens = self.limits.max_tokens
+        if max_tokens is not None and len(tokens) > max_tokens:
+            result = ParseFail.too_long(tokens, max_tokens)
+            if metrics is not None:
+                metrics.tokens = len(tokens)
+        elif cache is not None:
+            root = cache.get(self.fingerprint(), tokens)
+            if root is not None:
+                result = ParseSuccess(name="Root", node=root)
+                if metrics is not None:
+                    metrics.tokens = len(tokens)
+
+        if result is None:
+            ctx = self.new_context(tokens[0].symbol if tokens else Grammar.RULE_END)
+            if metrics is not None:
+                ctx.metrics = metrics
+                metrics.tokens = len(tokens)
+                metrics.max_tree_size = ctx.frames_created
+            ctx.input_stack = list(reversed(tokens))  # Sentence should appear in order
+
+            result = self._run(ctx)
+            self._discard(ctx)
+            if cache is not None and isinstance(result, ParseSuccess):
+                cache.put(self.fingerprint(), tokens, result.root)
+            if stats is not None:
+                stats['frames_created'] = stats.get('frames_created', 0) + ctx.frames_created
+                stats['prune_passes'] = stats.get('prune_passes', 0) + ctx.prune_passes
+            if metrics is not None:
+                metrics.frames_created = ctx.frames_created
+                metrics.prune_passes = ctx.prune_passes
+
+        if sink is not None:
+            metrics.success = isinstance(result, ParseSuccess)
+            metrics.parse_time = time.perf_counter() - start
+            sink.record(metrics)
+        return result
 
-        # Tokenize and tag the text.
-        word_mapping = dict(nltk.pos_tag(nltk.word_tokenize(text)))
-        if self.verbose:
-            print(f'POS Tags:\n {word_mapping}')
+    def _discard(self, ctx: ParseContext):
+        """
+        Recycle the state tree of a finished parse.
+        :param ctx: The context of the parse. Its state tree must not be used afterwards.
+        :return: None
+        """
+        if self.frame_pool.maxsize:
+            self.frame_pool.recycle(self._subtrees([ctx.state]))
 
-        self.__input_stack = nltk.word_tokenize(text)
-        self.__input_stack.reverse()  # Sentence should appear in order
+    @staticmethod
+    def _subtrees(frames: List[StateFrame]) -> List[StateFrame]:
+        """
+        :param frames: Some frames, none of which is a descendant of another.
+        :return: The frames and all their descendants, breadth first.
+        """
+        result = list(frames)
+        i = 0
+        while i < len(result):
+            result.extend(result[i].children)
+            i += 1
+        return result
 
-        while len(self.__input_stack) > 1 or self.__parse_stack:  # While there is sentence left.
+    def fingerprint(self) -> Tuple[str, str, Optional[str]]:
+        """
+        Identify how this parser turns terminals into trees, for result caching.
+        :return: The engine, grammar and reduction fingerprints.
+        """
+        reduction = self.tagging.reduction
+        return type(self).__name__, self._grammar.fingerprint, None if reduction is None else reduction.fingerprint
+
+    def _predict(self, ctx: ParseContext, lookahead: Symbol):
+        """
+        Create the frames that the token following a shift might need.
+        :param ctx: The current parse context.
+        :param lookahead: The next token, or Grammar.RULE_END at the end of the input.
+        :return: None
+        """
+        # Only paths that can accept the next token are worth creating.
+        ctx.predict_pending = False
+        if not ctx.state.children:
+            return  # Pruning left no path that accepts the shifted token. The parse fails at the next step.
+        self._set_looking_for(ctx.state.children[0], lookahead=lookahead if self.predict else None, ctx=ctx)
+
+    def _exceeded(self, ctx: ParseContext, deadline: Optional[float]) -> Optional[str]:
+        """
+        Check a parse against the limits of the parser.
+        :param ctx: The current parse context.
+        :param deadline: The time.perf_counter() value by which the parse must be done, if any.
+        :return: The name of the first limit exceeded, or None.
+        """
+        limits = self.limits
+        if limits.max_frames is not None and ctx.frames_created - ctx.frames_released > limits.max_frames:
+            return 'max_frames'
+        if limits.max_depth is not None and len(ctx.parse_stack) > limits.max_depth:
+            return 'max_depth'
+        if deadline is not None and time.perf_counter() > deadline:
+            return 'time_budget'
+        return None
+
+    def _run(self, ctx: ParseContext, partial: bool = False) -> Optional[Union[ParseSuccess, ParseFail]]:
+        """
+        The main shift-reduce loop.
+        :param ctx: A parse context with the input stack filled in.
+        :param partial: Return None as soon as the input stack runs out instead of finishing the parse.
+            If the last token was shifted, ctx.predict_pending is set and the caller must call _predict() with the
+            token that follows it before running again.
+        :return: A nested structure representing the parse tree, or None if a partial run did not fail.
+        """
+        # Timing is only done with a metrics record attached; otherwise each phase costs one extra 'is None' check.
+        metrics = ctx.metrics
+        clock = time.perf_counter
+        mark = 0.0
+        limits = self.limits
+        deadline = None if limits.time_budget is None else clock() + limits.time_budget
+        limited = deadline is not None or limits.max_frames is not None or limits.max_depth is not None
+
+        # While there is sentence left.
+        while ctx.input_stack if partial else len(ctx.input_stack) > 1 or ctx.parse_stack:
             # Parser state contains the set of symbols expected for a valid structure.
             # Read in a token and determine if it is expected.
             if self.verbose:
-                print(self.dump_state())
-            word = None
-            if self.__input_stack:
-                word = self.__input_stack.pop()
-            if isinstance(word, str):
-                token = Symbol(word_mapping[word])
-
-                if self._reduction is not None:
-                    token = self._reduction[token]
-                token.value = word
-            else:
-                token = word
+                print(self.dump_state(ctx))
+            token = None
+            if ctx.input_stack:
+                token = ctx.input_stack.pop()
 
             # First, we must check if a shift or a reduction are possible.
             # If a shift AND a reduction are possible, favor a shift
             # If only one operation is possible, perform it.
             # If none are possible, then the parser is in an error state.
-            can_reduce = self._can_reduce(self.__state)
-            can_shift = self._can_shift(token, self.__state)
+            if metrics is not None:
+                mark = clock()
+            can_reduce = self._can_reduce(ctx.state)
+            sym = token.symbol if token is not None else None
+            can_shift = self._can_shift(sym, ctx.state)
+            if metrics is not None:
+                mark = self._lap(metrics, 'decide_time', mark)
 
             if can_shift:
                 if self.verbose:
-                    print(f'\nShift {word} ==> {token}')
+                    print(f'\nShift {token.value} ==> {token}')
                 # A shift action consumes a token form the input stack and advances all matching rule pointers.
-                self.__parse_stack.append(token)
+                ctx.parse_stack.append(token)
 
                 # Examine the current state frames. If we find one that expects a token that we found,
                 # perform a shift action.
-                self._shift(token, self.__state.children)
+                self._shift(ctx, sym, ctx.state.children)
+                if metrics is not None:
+                    metrics.shifts += 1
+                    mark = self._lap(metrics, 'shift_time', mark)
 
-                while self._needs_prune:
+                while ctx.needs_prune:
                     # Shift marked some impossible rules for deletion. Execute.
-                    self._needs_prune = False
-                    self._prune_state(self.__state)
-
-                # Find new paths that could have been generated by the shift
-                self._set_looking_for(self.__state.children[0])  # The top-level Sentence
+                    ctx.needs_prune = False
+                    ctx.prune_passes += 1
+                    self._prune_state(ctx, ctx.state)
+                if metrics is not None:
+                    mark = self._lap(metrics, 'prune_time', mark)
+
+                # Find new paths that could have been generated by the shift.
+                if ctx.input_stack or not partial:
+                    self._predict(ctx, ctx.input_stack[-1].symbol if ctx.input_stack else Grammar.RULE_END)
+                else:
+                    ctx.predict_pending = True  # The next token has not arrived yet.
+                if metrics is not None:
+                    self._lap(metrics, 'predict_time', mark)
+                    # The tree is at its largest right after prediction.
+                    size = ctx.frames_created - metrics.frames_pruned - metrics.frames_discarded
+                    if size > metrics.max_tree_size:
+                        metrics.max_tree_size = size
+
+                # The state tree and the parse stack only grow here, so this is the only place to check them.
+                if limited:
+                    reason = self._exceeded(ctx, deadline)
+                    if reason is not None:
+                        return ParseFail.at(ctx.parse_stack, ctx.input_stack[-1] if ctx.input_stack else None, (),
+                                            reason)
             elif can_reduce:
                 # Since no shift was performed, the token is not consumed.
-                if word is not None:
-                    self.__input_stack.append(word)
+                if token is not None:
+                    ctx.input_stack.append(token)
 
-                self._reduce(self._traverse_state(self.__state))
+                self._reduce(ctx, self._traverse_state(ctx.state))
+                if metrics is not None:
+                    metrics.reduces += 1
+                    self._lap(metrics, 'reduce_time', mark)
             else:
-                return self._parse_fail()
+                return self._parse_fail(ctx, token)
+
+        if partial:
+            return None
+
+        if not ctx.input_stack:
+            return self._parse_fail(ctx)  # An empty sentence
 
         # The last thing remaining on the parse stack is the parse tree root.
-        return ParseSuccess(name="Root", node=self.__input_stack.pop())
+        root = ctx.input_stack.pop()
+        if root.symbol != self._grammar.start_symbol:
+            # A complete constituent that is not a sentence, e.g. an ADVP -> ADV VP that took the rest of the input,
+            # or a single token that was never run through the state tree.
+            expected = self._expected_after(root.symbol)
+            if expected is None:
+                return ParseFail.at([], root, self._grammar.first[Grammar.ROOT_SYM])
+            return ParseFail.at([root], None, expected)
+        return ParseSuccess(name="Root", node=root)
+
+
+class ParseStream:
+    """
+    An SRParser parse fed one token at a time, e.g. from a speech recognizer.
+    Each token is processed as soon as it is pushed, so an ungrammatical prefix is reported right away.
+    Pushing every token of a sentence and finalizing gives the same result as SRParser.parse(),
+    except that single-token sentences are checked against the grammar rather than accepted as they are.
+    """
 
+    def __init__(self, parser: SRParser):
+        """
+        Create an empty stream. Use SRParser.stream() rather than calling this directly.
+        :param parser: The parser driving this stream.
+        """
+        self._parser = parser
+        self._ctx = None          # Created with the first token, which selects the initial state tree
+        self.tokens = 0           # How many tokens were pushed
+        self._metrics = None if parser.metrics is None else ParseMetrics()
+        self.failure = None       # The ParseFail of a prefix that can not be continued
+        self.result = None        # The outcome of finalize()
+
+    @property
+    def viable(self) -> bool:
+        """
+        :return: Whether the tokens pushed so far may still be the start of a grammatical sentence.
+        """
+        return self.failure is None
+
+    def push(self, token: Union[Node, Tuple[str, str]]) -> bool:
+        """
+        Consume the next token of the sentence.
+        :param token: A (word, tag) pair, which is reduced like parse() input, or an already reduced terminal Node.
+        :return: Whether the sentence is still viable.
+        """
+        if self.result is not None:
+            raise ValueError('Can not push to a finalized stream')
+        if self.failure is not None:
+            return False
+
+        metrics = self._metrics
+        start = time.perf_counter() if metrics is not None else 0.0
+
+        parser = self._parser
+        if not isinstance(token, Node):
+            token = parser.tagging([token]) if metrics is None else parser.tagging([token], metrics)
+            token = token[0]
+
+        if self._ctx is None:
+            self._ctx = parser.new_context(token.symbol)
+            self._ctx.metrics = metrics
+            if metrics is not None:
+                metrics.max_tree_size = self._ctx.frames_created
+        elif self._ctx.predict_pending:
+            parser._predict(self._ctx, token.symbol)
+
+        self.tokens += 1
+        if parser.limits.max_tokens is not None and self.tokens > parser.limits.max_tokens:
+            self.failure = ParseFail.at(self._ctx.parse_stack, token, (), 'max_tokens')
+        else:
+            self._ctx.input_stack.append(token)
+            self.failure = parser._run(self._ctx, partial=True)
+
+        if metrics is not None:
+            metrics.tokens += 1
+            metrics.parse_time += time.perf_counter() - start
+        return self.failure is None
+
+    def expected(self) -> FrozenSet[Symbol]:
+        """
+        Find the terminals the parser would accept next. Each candidate is tried on a copy of the parse,
+        so this costs about as much as pushing every terminal of the grammar once.
+        :return: The accepted terminals, plus Grammar.RULE_END if the sentence may end here.
+        """
+        if self.failure is not None or self.result is not None:
+            return frozenset()
+
+        parser = self._parser
+        expected = set()
+        for sym in parser._grammar.terminals():
+            if self._ctx is None:
+                ctx = parser.new_context(sym)
+            else:
+                ctx = self._ctx.copy()
+                if ctx.predict_pending:
+                    parser._predict(ctx, sym)
+            ctx.input_stack.append(Node(sym))
+            if parser._run(ctx, partial=True) is None:
+                expected.add(sym)
+
+        if self._ctx is not None and isinstance(self._finish(self._ctx.copy()), ParseSuccess):
+            expected.add(Grammar.RULE_END)
+
+        return frozenset(expected)
+
+    def finalize(self) -> Union[ParseSuccess, ParseFail]:
+        """
+        Signal the end of the input and complete the parse. Further calls return the same result.
+        :return: A nested structure representing the parse tree.
+        """
+        if self.result is not None:
+            return self.result
+
+        metrics = self._metrics
+        start = time.perf_counter() if metrics is not None else 0.0
+
+        parser = self._parser
+        if self.failure is not None:
+            self.result = self.failure
+        elif self._ctx is None:
+            self.result = parser._parse_fail(parser.new_context(Grammar.RULE_END))
+        else:
+            self.result = self._finish(self._ctx)
+            parser._discard(self._ctx)
+
+        if metrics is not None:
+            metrics.parse_time += time.perf_counter() - start
+            if self._ctx is not None:
+                metrics.frames_created = self._ctx.frames_created
+                metrics.prune_passes = self._ctx.prune_passes
+            metrics.success = isinstance(self.result, ParseSuccess)
+            parser.metrics.record(metrics)
+        return self.result
+
+    def _finish(self, ctx: ParseContext) -> Union[ParseSuccess, ParseFail]:
+        """
+        Run the parse in a context to completion.
+        :param ctx: A context that has consumed all tokens.
+        :return: A nested structure representing the parse tree.
+        """
+        if ctx.predict_pending:
+            self._parser._predict(ctx, Grammar.RULE_END)
+        return self._parser._run(ctx)
@@ -0,0 +1,240 @@
+"""
+Turning raw sentences into grammar terminals.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+NLTK is slow to import and may try to reach the network, so it is only imported, and its resources only looked up,
+the first time a sentence actually needs to be tagged. Pre-tagged input never touches NLTK.
+
+:date: 10/16/2026 11:40
+"""
+
+from typing import *
+from collections import OrderedDict
+from string import punctuation
+import os
+import threading
+import time
+
+from grammar import Symbol, Node, Reduction
+
+
+TaggedSentence = Sequence[Tuple[str, str]]  # (word, POS tag) pairs in sentence order
+
+NLTK_RESOURCES = [
+    ('tokenizers/punkt', 'punkt', 'punkt'),
+    ('taggers/averaged_perceptron_tagger', 'averaged_perceptron_tagger', 'Perceptron Tagger'),
+]
+OFFLINE_ENV = 'SRP_OFFLINE'  # Setting this environment variable to 1 forbids downloads process-wide.
+
+_nltk = None             # The NLTK module, once imported and checked.
+_nltk_lock = threading.Lock()
+
+
+def offline_default() -> bool:
+    """
+    :return: Whether offline mode is requested through the environment.
+    """
+    return os.environ.get(OFFLINE_ENV, '') not in ('', '0')
+
+
+def ensure_nltk_resources(offline: bool = False):
+    """
+    Import NLTK and check if necessary resources are available, downloading them if not.
+    This only does work the first time it is called in a process.
+    :param offline: Raise a LookupError for missing resources instead of downloading them.
+    :return: The nltk module.
+    """
+    global _nltk
+    if _nltk is not None:
+        return _nltk
+
+    with _nltk_lock:
+        if _nltk is not None:
+            return _nltk
+
+        import nltk
+
+        for path, package, title in NLTK_RESOURCES:
+            try:
+                nltk.find(path)
+            except LookupError:
+                if offline:
+                    raise LookupError(f'Missing NLTK "{package}" package and downloads are disabled. '
+                                      f'Install it with: python -m nltk.downloader {package}') from None
+                print(f'Missing NLTK "{title}" package, downloading...')
+                nltk.download(package)
+
+        _nltk = nltk
+        return _nltk
+
+
+class NLTKTagger:
+    """
+    Word tokenization and POS tagging backed by NLTK.
+    Any object with the same tokenize() and tag() methods can be used in its place.
+    """
+
+    def __init__(self, offline: bool = None):
+        """
+        Create a tagger. NLTK is not loaded until the first sentence is tagged.
+        :param offline: Fail instead of downloading missing resources. Defaults to the SRP_OFFLINE variable.
+        """
+        self.offline = offline_default() if offline is None else offline
+
+    def load(self):
+        """
+        Load NLTK and its resources now rather than on first use.
+        :return: The nltk module.
+        """
+        return ensure_nltk_resources(self.offline)
+
+    def tokenize(self, text: str) -> List[str]:
+        """
+        Split a sentence into words.
+        :param text: The sentence.
+        :return: The words in sentence order.
+        """
+        return self.load().word_tokenize(text)
+
+    def tag(self, words: List[str]) -> List[str]:
+        """
+        Assign a Penn Treebank POS tag to every word.
+        :param words: The words in sentence order.
+        :return: One tag per word, in the same order.
+        """
+        return [tag for _, tag in self.load().pos_tag(words)]
+
+
+class TagCache:
+    """
+    A thread-safe, bounded LRU cache of (words, tags) keyed by the cleaned sentence text.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        """
+        Create an empty cache.
+        :param maxsize: The maximum number of sentences to remember.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks can not be pickled. A copy sent to a spawned worker process gets a lock of its own.
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, text: str) -> Optional[Tuple[Tuple[str, ...], Tuple[str, ...]]]:
+        """
+        Look up a sentence.
+        :param text: The cleaned sentence text.
+        :return: The cached (words, tags) or None.
+        """
+        with self._lock:
+            entry = self._data.get(text)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(text)
+            self.hits += 1
+            return entry
+
+    def put(self, text: str, words: Sequence[str], tags: Sequence[str]):
+        """
+        Remember the tagging of a sentence, evicting the least recently used one if the cache is full.
+        :param text: The cleaned sentence text.
+        :param words: The words of the sentence.
+        :param tags: The tags of the words.
+        :return: None
+        """
+        with self._lock:
+            self._data[text] = (tuple(words), tuple(tags))
+            self._data.move_to_end(text)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class TaggingStage:
+    """
+    Tokenizes, tags and reduces a sentence in a single pass, producing the terminal Nodes the parsers consume.
+    """
+
+    def __init__(self, reduction: Reduction = None, tagger=None, cache: TagCache = None, verbose: bool = False):
+        """
+        Create a tagging stage.
+        :param reduction: An optional mapping of POS tags to grammar terminals.
+        :param tagger: An object with tokenize() and tag() methods. An NLTKTagger is created on demand if omitted.
+        :param cache: An optional cache of tag sequences for repeated sentences.
+        :param verbose: Enables additional output.
+        """
+        self.reduction = reduction
+        self.cache = cache
+        self.verbose = verbose
+        self._tagger = tagger
+
+    @property
+    def tagger(self):
+        if self._tagger is None:
+            self._tagger = NLTKTagger()
+        return self._tagger
+
+    def __call__(self, sentence: Union[str, TaggedSentence], metrics=None) -> List[Node]:
+        """
+        Turn a sentence into terminals.
+        :param sentence: Either raw text, or a sequence of (word, tag) pairs which skips tokenization and tagging.
+        :param metrics: An optional ParseMetrics record to add tokenization and tagging times to.
+        :return: A list of terminal Nodes with the source word as their value, in sentence order.
+        """
+        if isinstance(sentence, str):
+            words, tags = self.tag_text(sentence, metrics)
+        else:
+            words = [word for word, _ in sentence]
+            tags = [tag for _, tag in sentence]
+
+        if self.verbose:
+            print(f'POS Tags:\n {list(zip(words, tags))}')
+
+        if self.reduction is None:
+            return [Node(Symbol(tag), word) for word, tag in zip(words, tags)]
+        return [Node(sym, word) for word, sym in zip(words, self.reduction.reduce_tags(tags))]
+
+    def tag_text(self, text: str, metrics=None) -> Tuple[Sequence[str], Sequence[str]]:
+        """
+        Clean, tokenize and tag raw text, consulting the cache if there is one.
+        :param text: The sentence.
+        :param metrics: An optional ParseMetrics record to add tokenization and tagging times to.
+        :return: The words and their tags, in sentence order.
+        """
+        # Clean the input text.
+        text = ''.join(filter(lambda c: c not in punctuation, text))
+
+        if self.cache is not None:
+            entry = self.cache.get(text)
+            if entry is not None:
+                return entry
+
+        if metrics is None:
+            words = self.tagger.tokenize(text)
+            tags = self.tagger.tag(words)
+        else:
+            start = time.perf_counter()
+            words = self.tagger.tokenize(text)
+            split = time.perf_counter()
+            tags = self.tagger.tag(words)
+            metrics.tokenize_time += split - start
+            metrics.tag_time += time.perf_counter() - split
+
+        if self.cache is not None:
+            self.cache.put(text, words, tags)
+
+        return words, tags
@@ -0,0 +1,46 @@
+"""
+Shared fixtures of the test suite.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+Sentences are given to the parsers already tagged with grammar terminals, so the tests never need NLTK.
+
+:date: 10/17/2026 09:10
+"""
+
+import os
+import sys
+from typing import *
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from grammar import Grammar, Reduction
+from tagger import TaggingStage, TaggedSentence
+
+GRAMMAR_FILE = os.path.join(ROOT, 'grammars', 'advanced_grammar.json')
+REDUCTION_FILE = os.path.join(ROOT, 'reductions', 'advanced_grammar_reduction.json')
+
+
+def tagged(tags: str) -> TaggedSentence:
+    """
+    :param tags: Grammar terminals separated by spaces, e.g. 'PRP V DET N'.
+    :return: The sentence as (word, tag) pairs, with a distinct word per token.
+    """
+    return [(f'w{i}', t) for i, t in enumerate(tags.split())]
+
+
+@pytest.fixture(scope='session')
+def grammar() -> Grammar:
+    return Grammar(GRAMMAR_FILE)
+
+
+@pytest.fixture(scope='session')
+def reduction() -> Reduction:
+    return Reduction(REDUCTION_FILE)
+
+
+@pytest.fixture
+def tagging() -> TaggingStage:
+    return TaggingStage()
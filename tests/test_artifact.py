@@ -0,0 +1,73 @@
+"""
+Tests of precompiled grammar artifacts.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 09:40
+"""
+
+import os
+import pickle
+import shutil
+
+import pytest
+
+from conftest import GRAMMAR_FILE, REDUCTION_FILE
+from artifact import ARTIFACT_VERSION, compile_artifact, load_artifact
+from grammar import Grammar, Symbol, validate
+
+
+def test_load_keeps_start_symbol(tmp_path):
+    path = str(tmp_path / 'grammar.bin')
+    compile_artifact(GRAMMAR_FILE, REDUCTION_FILE, path, start_symbol='VP')
+    mtime = os.stat(path).st_mtime_ns
+
+    artifact = load_artifact(path, GRAMMAR_FILE, REDUCTION_FILE)
+    assert artifact.grammar.start_symbol == Symbol('VP')
+    assert os.stat(path).st_mtime_ns == mtime  # Not rebuilt
+
+
+def test_rebuild_keeps_start_symbol(tmp_path):
+    grammar_file = str(tmp_path / 'grammar.json')
+    shutil.copy(GRAMMAR_FILE, grammar_file)
+    path = str(tmp_path / 'grammar.bin')
+    compile_artifact(grammar_file, REDUCTION_FILE, path, start_symbol='VP')
+
+    with open(grammar_file, 'a') as fp:
+        fp.write('\n')
+    artifact = load_artifact(path)
+    assert artifact.sources == (grammar_file, REDUCTION_FILE, 'VP')
+    assert artifact.grammar.start_symbol == Symbol('VP')
+
+
+def test_corrupt_or_missing_artifact(tmp_path):
+    path = str(tmp_path / 'grammar.bin')
+    with pytest.raises(ValueError):
+        load_artifact(path)
+
+    with open(path, 'wb') as fp:
+        fp.write(b'not a pickle')
+    artifact = load_artifact(path, GRAMMAR_FILE, REDUCTION_FILE)
+    assert artifact.version == ARTIFACT_VERSION and artifact.sources == (GRAMMAR_FILE, REDUCTION_FILE, 'S')
+    assert load_artifact(path).source_hash == artifact.source_hash
+
+
+class BadValue:
+    def __reduce__(self):
+        return int, ('not a number',)
+
+
+def test_artifact_failing_to_unpickle(tmp_path):
+    # Loading this pickle raises ValueError, from int() rather than from pickle itself.
+    path = str(tmp_path / 'grammar.bin')
+    with open(path, 'wb') as fp:
+        pickle.dump(BadValue(), fp)
+    artifact = load_artifact(path, GRAMMAR_FILE, REDUCTION_FILE)
+    assert artifact.version == ARTIFACT_VERSION and load_artifact(path).source_hash == artifact.source_hash
+
+
+def test_validate():
+    grammar = Grammar.from_data({'S': [['NP', 'VP']], 'NP': [['N']], 'VP': [['V'], []], 'X': [['N']]})
+    warnings = validate(grammar)
+    assert 'Nonterminal X is not reachable from S' in warnings
+    assert 'Rule VP #1 is empty' in warnings
+    assert validate(Grammar.from_data({'S': [['N']]}, start_symbol='T'))[0] == 'Start symbol T has no productions'
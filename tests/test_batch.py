@@ -0,0 +1,94 @@
+"""
+Tests of batch parsing.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 14:35
+"""
+
+import json
+import os
+
+import pytest
+
+from conftest import REDUCTION_FILE
+from batch import read_corpus, parse_corpus, ResultFile, PARSED, FAILED, ERROR
+from compact_tree import CompactTree
+from grammar import Reduction
+from lr_parser import LRParser
+from shift_reduce_parser import SRParser, ParseFail
+from tagger import TaggingStage
+
+SENTENCES = [
+    [['We', 'PRP'], ['saw', 'VBD'], ['the', 'DT'], ['dog', 'NN']],
+    [['saw', 'VBD'], ['We', 'PRP']],
+    [['Bob', 'NNP'], ['is', 'XYZ']],  # An unmapped tag, which the 'error' policy raises on
+    [['Bob', 'NNP'], ['saw', 'VBD'], ['Alice', 'NNP']],
+]
+
+
+@pytest.fixture
+def corpus(tmp_path) -> str:
+    path = str(tmp_path / 'corpus.jsonl')
+    with open(path, 'w') as fp:
+        for i, tokens in enumerate(SENTENCES * 5):
+            fp.write(json.dumps({'tokens': tokens}) + '\n')
+            if i == 2:
+                fp.write('\n')
+    return path
+
+
+@pytest.fixture
+def parser(grammar) -> SRParser:
+    return SRParser(grammar, tagging=TaggingStage(Reduction(REDUCTION_FILE, unmapped='error')))
+
+
+def test_read_corpus(tmp_path, corpus):
+    lines = list(read_corpus(corpus))
+    assert [line.sentence for line in lines] == [[tuple(t) for t in tokens] for tokens in SENTENCES * 5]
+    assert lines[3].start == lines[2].end + 1  # The blank line is skipped
+    assert [line.sentence for line in read_corpus(corpus, lines[18].start)] == [line.sentence for line in lines[18:]]
+
+    bad = str(tmp_path / 'bad.txt')
+    with open(bad, 'w') as fp:
+        fp.write('We swim\n{"tokens": 3}\nThey swim')
+    with pytest.raises(ValueError):
+        list(read_corpus(bad))
+    assert [line.sentence for line in read_corpus(bad, skip_invalid=True)] == ['We swim', 'They swim']
+
+
+def test_results(tmp_path, corpus, parser):
+    results_path = str(tmp_path / 'out.srb')
+    assert parse_corpus(parser, corpus, results_path) == {'parsed': 10, 'failed': 5, 'errors': 5, 'resumed': 0}
+
+    with ResultFile(results_path) as results:
+        assert len(results) == 20
+        assert list(results.statuses[:4]) == [PARSED, FAILED, ERROR, PARSED]
+        assert isinstance(results[0], CompactTree) and isinstance(results[1], ParseFail)
+        assert results[2].startswith('UnmappedTagError')
+        for i, line in enumerate(read_corpus(corpus)):
+            assert results.span(i) == (line.start, line.end)
+            if results.statuses[i] == PARSED:
+                assert results[i].to_brackets() == parser.parse(line.sentence).compact().to_brackets()
+
+
+def test_resume(tmp_path, corpus, parser):
+    complete = str(tmp_path / 'complete.srb')
+    parse_corpus(parser, corpus, complete, jobs=2)
+
+    # An interrupted run: the last index entry is half written, and the one before it reached the disk before its
+    # record did.
+    interrupted = str(tmp_path / 'interrupted.srb')
+    parse_corpus(parser, corpus, interrupted)
+    with ResultFile(interrupted) as results:
+        cut = results.offsets[18] + results.lengths[18] - 3
+    os.truncate(interrupted, cut)
+    os.truncate(interrupted + '.idx', os.path.getsize(interrupted + '.idx') - 10)
+
+    stats = parse_corpus(parser, corpus, interrupted, resume=True)
+    assert stats['resumed'] == 18 and stats['parsed'] + stats['failed'] + stats['errors'] == 2
+    for suffix in ('', '.idx'):
+        with open(complete + suffix, 'rb') as a, open(interrupted + suffix, 'rb') as b:
+            assert a.read() == b.read()
+
+    with pytest.raises(ValueError):
+        parse_corpus(LRParser(parser._grammar, tagging=parser.tagging), corpus, interrupted, resume=True)
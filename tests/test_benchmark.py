@@ -0,0 +1,42 @@
+"""
+Tests of the benchmark suite.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 12:10
+"""
+
+from conftest import GRAMMAR_FILE
+from benchmark import synthetic_corpus, scaled_grammar, percentile, run_scenario, compare
+from shift_reduce_parser import SRParser, ParseSuccess
+from chart_parser import ChartParser
+
+
+def test_synthetic_corpus_is_repeatable_and_grammatical(grammar, tagging):
+    corpus = synthetic_corpus(grammar, 30, seed=4)
+    assert corpus == synthetic_corpus(grammar, 30, seed=4)
+    # The tree engine is greedy and rejects some of them, so the chart engine is the judge.
+    parser = ChartParser(scaled_grammar(GRAMMAR_FILE, 3), tagging=tagging)
+    assert all(isinstance(parser.parse(s), ParseSuccess) for s in corpus)
+
+
+def test_percentile():
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0, 1.0, 2.0, 4.0], 50) == 2.0
+    assert percentile(list(range(1, 101)), 99) == 99
+
+
+def test_scenario_and_compare(grammar, tagging):
+    corpus = synthetic_corpus(grammar, 20)
+    parser = SRParser(grammar, tagging=tagging)
+    metrics = run_scenario(parser, corpus)
+    assert metrics['sentences'] == 20
+    assert metrics['accepted'] == sum(isinstance(parser.parse(s), ParseSuccess) for s in corpus)
+    assert metrics['frames_per_sentence'] > 0
+
+    results = {'scenarios': {'tree': metrics}}
+    assert compare(results, results, 0.1) == []
+    worse = dict(metrics, sentences_per_sec=metrics['sentences_per_sec'] / 2,
+                 peak_memory_kb=metrics['peak_memory_kb'] * 2)
+    regressions = compare({'scenarios': {'tree': worse}}, results, 0.1)
+    assert [r.split(':')[1].split()[0] for r in regressions] == ['throughput', 'peak_memory_kb']
+    assert compare(results, {'scenarios': {}}, 0.1) == []  # New scenarios have nothing to regress from
@@ -0,0 +1,53 @@
+"""
+Tests of the chart engine and its parse forests.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 13:05
+"""
+
+import pytest
+
+from conftest import tagged
+from compact_tree import CompactTree
+from grammar import Grammar
+from chart_parser import ChartParser
+from shift_reduce_parser import ParseSuccess, UNGRAMMATICAL
+
+# PP attachment makes a sentence with n PPs have Catalan(n + 1) parses.
+AMBIGUOUS = {'S': [['NP', 'VP']], 'NP': [['N'], ['NP', 'PP']], 'VP': [['V', 'NP'], ['VP', 'PP']], 'PP': [['P', 'NP']]}
+
+
+def brackets(node) -> str:
+    """
+    :return: A parse tree Node in bracket notation.
+    """
+    return CompactTree.from_node(node).to_brackets()
+
+
+@pytest.mark.parametrize('sentence, count', [('N V N', 1), ('N V N P N', 2), ('N V N P N P N', 5),
+                                             ('N V N P N P N P N', 14)])
+def test_forest_holds_every_parse(tagging, sentence, count):
+    result = ChartParser(Grammar.from_data(AMBIGUOUS), tagging=tagging).parse(tagged(sentence))
+    assert isinstance(result, ParseSuccess)
+    forest = result.forest
+    assert forest.count() == count
+
+    trees = [brackets(tree) for tree in forest.trees()]
+    assert len(set(trees)) == count
+    assert trees[0] == brackets(forest.best()) == result.compact().to_brackets()
+    sizes = [tree.count('(') for tree in trees]
+    assert sizes == sorted(sizes)  # Flatter trees first
+    assert [brackets(tree) for tree in forest.trees(2)] == trees[:2]
+
+
+def test_agrees_with_tree_engine(grammar, tagging):
+    parser = ChartParser(grammar, tagging=tagging)
+    assert parser.parse(tagged('PRP V DET N')).compact().to_brackets() == \
+        '(S (NP (PRP w0)) (VP (V w1) (NP (DET w2) (N w3))))'
+    assert parser.parse(tagged('V PRP')).reason == UNGRAMMATICAL
+
+
+def test_cyclic_grammar(tagging):
+    parser = ChartParser(Grammar.from_data({'S': [['A']], 'A': [['B'], ['N']], 'B': [['A']]}), tagging=tagging)
+    with pytest.raises(ValueError):
+        parser.parse(tagged('N'))
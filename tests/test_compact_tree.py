@@ -0,0 +1,61 @@
+"""
+Tests of the array-backed parse tree and its serializers.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 10:45
+"""
+
+import io
+
+import pytest
+
+from compact_tree import CompactTree
+from grammar import Symbol
+from shift_reduce_parser import SRParser
+
+
+def test_bytes_keep_words_with_separators(grammar, tagging):
+    sentence = [('We\nare', 'PRP'), ('', 'V'), ('the', 'DET'), ('wor\x00ld\n', 'N')]
+    tree = SRParser(grammar, tagging=tagging).parse(sentence).compact()
+    stream = io.BytesIO(tree.to_bytes() + tree.to_bytes())
+
+    for copy in (CompactTree.from_bytes(tree.to_bytes()), CompactTree.read(stream), CompactTree.read(stream)):
+        assert list(copy.words) == [word for word, _ in sentence]
+        assert copy.to_brackets() == tree.to_brackets()
+    assert CompactTree.read(stream) is None
+
+
+def test_truncated_bytes(grammar, tagging):
+    data = SRParser(grammar, tagging=tagging).parse([('We', 'PRP'), ('saw', 'V'), ('Jo', 'NAME')]).compact().to_bytes()
+    with pytest.raises(ValueError):
+        CompactTree.from_bytes(data[:-1])
+    with pytest.raises(EOFError):
+        CompactTree.read(io.BytesIO(data[:-1]))
+
+
+def test_unknown_labels_are_not_interned(grammar, tagging):
+    tree = SRParser(grammar, tagging=tagging).parse([('We', 'PRP'), ('saw', 'V'), ('Jo', 'NAME')]).compact()
+    data = tree.to_dict()
+    data['labels'] = ['NO_SUCH_LABEL' if label == 'NP' else label for label in data['labels']]
+    count = Symbol.count()
+    with pytest.raises(ValueError):
+        CompactTree.from_dict(data)
+    with pytest.raises(ValueError):
+        CompactTree.from_bytes(tree.to_bytes().replace(b'NP', b'N?', 1))
+    assert Symbol.count() == count and Symbol.lookup('NO_SUCH_LABEL') is None
+
+
+def test_round_trips(grammar, tagging):
+    result = SRParser(grammar, tagging=tagging).parse([('We', 'PRP'), ('saw', 'V'), ('(a', 'DET'), ('dog)', 'N')])
+    tree = result.compact()
+    assert tree.to_brackets() == '(S (NP (PRP We)) (VP (V saw) (NP (DET -LRB-a) (N dog-RRB-))))'
+    assert len(tree) == 8 and tree.symbol(0) == Symbol('S') and tree.span(0) == (0, 4)
+    assert [tree.symbol(i) for i in tree.children(3)] == [Symbol('V'), Symbol('NP')]
+    assert tree.is_leaf(4) and not tree.is_leaf(5) and tree.span(5) == (2, 4)
+
+    for copy in (CompactTree.from_json(tree.to_json()), CompactTree.from_bytes(tree.to_bytes()),
+                 CompactTree.from_node(tree.to_node())):
+        assert copy.to_dict() == tree.to_dict()
+    assert CompactTree.from_node(result.root).to_dict() == tree.to_dict()
+    assert CompactTree.from_node(tree.to_node(5)).to_brackets() == '(NP (DET -LRB-a) (N dog-RRB-))'
+    assert CompactTree.from_bytes(CompactTree.empty().to_bytes()).to_brackets() == ''
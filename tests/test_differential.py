@@ -0,0 +1,59 @@
+"""
+Tests of the differential harness.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 15:00
+"""
+
+from conftest import tagged
+from differential import run, compare, check_tree, Variant, Harness, RAISED, MISMATCH, REFERENCE, VARIANTS
+from grammar import Node, Symbol
+from shift_reduce_parser import SRParser
+
+
+class _RaisesOnName:
+    """
+    A broken engine, which raises on every sentence with a NAME.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+
+    def parse(self, sentence):
+        if any(tag == 'NAME' for _, tag in sentence):
+            raise RuntimeError('NAME')
+        return self.parser.parse(sentence)
+
+
+def test_engines_agree(grammar):
+    report = run(grammar, 60, seed=3)
+    assert report['violations'] == {} and report['counterexamples'] == []
+    assert report['sentences'] == 180 and 60 <= report['grammatical'] < 180
+    assert set(report['engines']) == {'chart', REFERENCE} | set(VARIANTS)
+    assert compare(report, report, 0.5) == []
+
+
+def test_violations_are_found_and_shrunk(grammar):
+    variants = {'broken': Variant(lambda g, t: _RaisesOnName(SRParser(g, tagging=t)), True)}
+    harness = Harness(grammar, variants)
+    sentence = 'PRP V DET N P NAME'.split()
+    kinds = {(engine, kind) for engine, kind, _ in harness.check(sentence, True)}
+    assert kinds == {('broken', RAISED), ('broken', MISMATCH)}
+    assert harness.shrink(sentence, 'broken', RAISED) == ['NAME']
+
+    report = run(grammar, 30, variants=variants)
+    assert report['violations']['broken ' + RAISED] > 0
+    assert report['counterexamples'][0]['shrunk'] == ['NAME']
+    assert compare(report, run(grammar, 30, variants={}), 1.0) == \
+        [f'broken {kind}: 0 -> {report["violations"]["broken " + kind]} sentences' for kind in (RAISED, MISMATCH)]
+
+
+def test_check_tree(grammar, tagging):
+    sentence = tagged('PRP V NAME')
+    root = SRParser(grammar, tagging=tagging).parse(sentence).root
+    assert check_tree(grammar, root, sentence) is None
+    assert check_tree(grammar, root, tagged('PRP V PRP')) == 'leaves differ from the sentence'
+    assert check_tree(grammar, root.components[0], sentence) == 'root is NP'
+    root.components.reverse()
+    assert check_tree(grammar, root, sentence) == 'S -> VP NP is not a rule'
+    assert check_tree(grammar, Node(Symbol('S')), []) == 'S has no components'
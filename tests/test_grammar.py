@@ -0,0 +1,117 @@
+"""
+Tests of grammars, symbols and reductions.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 10:20
+"""
+
+from array import array
+import copy
+import pickle
+
+import pytest
+
+from conftest import REDUCTION_FILE
+from grammar import Grammar, Node, Symbol, Reduction, UnmappedTagError
+
+
+def test_unknown_tags_are_not_interned():
+    reduction = Reduction(REDUCTION_FILE)
+    count = Symbol.count()
+    assert reduction.reduce_tags(['DT', 'not-a-tag-1', 'NN']) == [Symbol('DET'), Symbol('UNK'), Symbol('N')]
+    assert Symbol.count() == count
+    assert Symbol.lookup('not-a-tag-1') is None
+
+    with pytest.raises(UnmappedTagError) as error:
+        Reduction(REDUCTION_FILE, unmapped='error').reduce_tags(['not-a-tag-2'])
+    assert error.value.tag == 'not-a-tag-2'
+    assert Symbol.lookup('not-a-tag-2') is None
+
+
+def test_tags_interned_after_compiling():
+    reduction = Reduction(REDUCTION_FILE, unmapped='passthrough')
+    tag = Symbol('interned-later')
+    assert reduction[tag] is tag
+    assert reduction.reduce_tags(['NN', 'interned-later', 'another-tag']) == \
+        [Symbol('N'), tag, Symbol('another-tag')]
+    assert list(reduction.map_ids([Symbol('another-tag').id, Symbol('VB').id])) == \
+        [Symbol('another-tag').id, Symbol('V').id]
+
+
+def test_rule_index_matches_linear_scan():
+    grammar = Grammar.from_data({'S': [['NP', 'VP']], 'NP': [['N'], ['DET', 'N']], 'VP': [['V'], ['N']],
+                                 'X': [['DET', 'N']]})
+    for lhs in grammar.nonterminals():
+        for rule in grammar[lhs]:
+            first = next((s, i) for s in grammar.nonterminals() for i, r in enumerate(grammar[s]) if r == rule)
+            assert grammar.find_rule(rule) == first
+    # A right hand side shared by several rules reduces by the one declared first.
+    assert grammar.find_rule([Symbol('N')]) == (Symbol('NP'), 0)
+    assert grammar.find_rule([Node(Symbol('DET')), Symbol('N')]) == (Symbol('NP'), 1)
+    assert grammar.match_pattern([Node(Symbol('NP')), Node(Symbol('VP'))]).symbol == Symbol('S')
+    assert grammar.find_rule([Symbol('N'), Symbol('DET')]) is None
+    assert grammar.match_pattern([Symbol('VP'), Symbol('NP')]) is None
+
+
+def test_reduce_by_checks_the_rule():
+    grammar = Grammar.from_data({'S': [['NP', 'VP']], 'NP': [['N'], ['DET', 'N']], 'VP': [['V']]})
+    pattern = [Node(Symbol('DET'), 'the'), Node(Symbol('N'), 'dog')]
+    node = grammar.reduce_by(Symbol('NP'), 1, pattern)
+    assert node.symbol == Symbol('NP') and node.components == pattern
+    with pytest.raises(ValueError):
+        grammar.reduce_by(Symbol('NP'), 0, pattern)
+
+
+def test_symbols_are_interned():
+    symbol = Symbol('NP')
+    assert Symbol('NP') is symbol
+    assert Symbol.from_id(symbol.id) is symbol and symbol.id < Symbol.count()
+    assert copy.copy(symbol) is symbol and copy.deepcopy([symbol])[0] is symbol
+    assert pickle.loads(pickle.dumps(symbol)) is symbol
+    with pytest.raises(AttributeError):
+        symbol.other = 1  # Slotted
+
+    node = Node(symbol, components=[Node(Symbol('N'), 'dog')])
+    assert str(node) == 'NP' and node.components[0].value == 'dog'
+
+
+def test_first_follow_and_predict():
+    grammar = Grammar.from_data({'S': [['NP', 'VP']], 'NP': [['DET', 'N'], ['ADJ', 'NP'], []], 'VP': [['V', 'NP']]})
+    assert grammar.nullable == {Symbol('NP')}
+    assert grammar.first[Symbol('S')] == {Symbol('DET'), Symbol('ADJ'), Symbol('V')}
+    assert grammar.follow[Symbol('NP')] == {Symbol('V'), Grammar.RULE_END}
+    assert grammar.predict(Symbol('NP'), Symbol('ADJ')) == (1, 2)  # The empty rule is always predicted
+    assert grammar.predict(Symbol('VP'), Symbol('DET')) == ()
+
+
+def test_batch_mapping(reduction):
+    sentences = [['PRP', 'VBD', 'DT', 'NN'], [], ['NNP', 'VBZ', 'RB']]
+    assert reduction.map_batch(sentences) == [reduction.reduce_tags(tags) for tags in sentences]
+    assert reduction.map_batch(sentences)[2] == [Symbol('NAME'), Symbol('V'), Symbol('RB')]
+
+    ids = array('i', [Symbol(tag).id for tags in sentences for tag in tags])
+    assert list(reduction.map_ids(ids)) == [reduction[Symbol.from_id(i)].id for i in ids]
+    assert list(reduction.map_ids(iter(ids))) == list(reduction.map_ids(ids))
+    assert len(reduction.map_ids([])) == 0
+
+
+def test_unmapped_policies():
+    with pytest.raises(ValueError):
+        Reduction(REDUCTION_FILE, unmapped='ignore')
+
+    tag = Symbol('XYZ')
+    assert Reduction(REDUCTION_FILE)[tag] == Symbol('UNK')
+    assert Reduction(REDUCTION_FILE, wildcard='N').reduce_tags(['XYZ']) == [Symbol('N')]
+    assert Reduction(REDUCTION_FILE, unmapped='passthrough')[tag] is tag
+    strict = Reduction(REDUCTION_FILE, unmapped='error')
+    with pytest.raises(UnmappedTagError):
+        strict.map_ids([Symbol('NN').id, tag.id])
+
+    # A pickled reduction is rebuilt with the same mapping.
+    assert pickle.loads(pickle.dumps(strict)).reduce_tags(['NN', 'MD']) == [Symbol('N'), Symbol('MD')]
+
+
+@pytest.mark.parametrize('tag', [Symbol('XYZ'), 'not-a-tag-3'])
+def test_unmapped_tag_error_pickles(tag):
+    error = pickle.loads(pickle.dumps(UnmappedTagError(tag)))
+    assert error.tag == tag and str(error) == f'No reduction for POS tag {tag}'
@@ -0,0 +1,58 @@
+"""
+Tests of the grammar transformations.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 13:50
+"""
+
+import pytest
+
+from conftest import tagged
+from benchmark import synthetic_corpus
+from grammar import Grammar, Symbol
+from grammar_transform import transform
+from lr_parser import LRParser
+from shift_reduce_parser import SRParser, ParseSuccess
+
+SMALL = {'S': [['NP', 'VP']], 'NP': [['DET', 'N', 'PP'], ['DET', 'N'], ['PRO']], 'PRO': [['PRP']],
+         'VP': [['V', 'NP']], 'PP': [['P', 'NP']]}
+
+
+def test_rules():
+    grammar = transform(Grammar.from_data(SMALL))
+    assert grammar.synthetic == {Symbol('NP~1')}
+    assert grammar[Symbol('NP')] == [(Symbol('DET'), Symbol('N'), Symbol('NP~1')), (Symbol('PRP'),)]
+    assert grammar[Symbol('NP~1')] == [(Symbol('P'), Symbol('NP')), ()]
+    # Only reachable through eliminated unit rules
+    assert Symbol('PRO') not in grammar.nonterminals() and Symbol('PP') not in grammar.nonterminals()
+
+
+def test_unit_rule_cycle():
+    # S -> A used to be replaced by S -> B and S -> N, then S -> B by S -> A and S -> V, and so on without end.
+    cyclic = Grammar.from_data({'S': [['A']], 'A': [['B'], ['N']], 'B': [['A'], ['V']]})
+    assert transform(cyclic).to_data() == cyclic.to_data()
+
+    grammar = transform(Grammar.from_data({'S': [['X']], 'X': [['A'], ['P']], 'A': [['B'], ['N']], 'B': [['A']]}))
+    assert grammar[Symbol('S')] == [(Symbol('A'),), (Symbol('P'),)]
+
+
+@pytest.mark.parametrize('engine', [SRParser, LRParser])
+def test_trees_keep_original_shape(tagging, engine):
+    original = Grammar.from_data(SMALL)
+    parser = engine(transform(original), tagging=tagging)
+    assert parser.parse(tagged('DET N V PRP')).compact().to_brackets() == \
+        '(S (NP (DET w0) (N w1)) (VP (V w2) (NP (PRO (PRP w3)))))'
+    assert parser.parse(tagged('PRP V DET N P PRP')).compact().to_brackets() == \
+        '(S (NP (PRO (PRP w0))) (VP (V w1) (NP (DET w2) (N w3) (PP (P w4) (NP (PRO (PRP w5)))))))'
+
+
+@pytest.mark.parametrize('engine', [SRParser, LRParser])
+@pytest.mark.parametrize('factor, unit_rules', [(True, True), (True, False), (False, True)])
+def test_same_results(grammar, tagging, engine, factor, unit_rules):
+    plain = engine(grammar, tagging=tagging)
+    transformed = engine(transform(grammar, factor, unit_rules), tagging=tagging)
+    for sentence in synthetic_corpus(grammar, 100) + [tagged('V PRP'), tagged('PRP V DET')]:
+        expected, result = plain.parse(sentence), transformed.parse(sentence)
+        assert type(result) is type(expected)
+        if isinstance(expected, ParseSuccess):
+            assert result.compact().to_brackets() == expected.compact().to_brackets()
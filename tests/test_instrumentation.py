@@ -0,0 +1,57 @@
+"""
+Tests of parse metrics.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 12:25
+"""
+
+import copy
+import multiprocessing
+
+import pytest
+
+from conftest import tagged
+from instrumentation import AggregateSink
+from lr_parser import LRParser
+from shift_reduce_parser import SRParser
+
+
+@pytest.mark.parametrize('engine', [SRParser, LRParser])
+def test_one_record_per_parse(grammar, tagging, engine):
+    records = []
+    parser = engine(grammar, tagging=tagging, metrics=records.append)
+    parser.parse(tagged('PRP V DET N'))
+    parser.parse(tagged('V PRP'))
+
+    assert [m.success for m in records] == [True, False]
+    assert records[0].tokens == 4 and records[0].shifts >= 4  # The tree engine also shifts reduced constituents
+    assert records[0].reduces > 0 and records[0].max_tree_size > 0
+    assert records[0].parse_time >= records[0].decide_time + records[0].shift_time
+    assert records[0] is not records[1]
+
+
+def test_aggregate(grammar, tagging):
+    sink = AggregateSink()
+    parser = SRParser(grammar, tagging=tagging, metrics=sink)
+    stats = {}
+    for tags in ('PRP V DET N', 'NAME V P NAME', 'V PRP'):
+        parser.parse(tagged(tags), stats)
+    stream = parser.stream()
+    for token in tagged('PRP V NAME'):
+        stream.push(token)
+    stream.finalize()
+
+    assert (sink.parses, sink.successes) == (4, 3)
+    assert sink.totals['tokens'] == 13
+    assert sink.totals['frames_created'] >= stats['frames_created'] > 0
+    assert 'Parses: 4 (3 successful)' in sink.summary()
+
+
+def test_aggregate_in_spawned_process(grammar, tagging):
+    sink = AggregateSink()
+    SRParser(grammar, tagging=tagging, metrics=sink).parse(tagged('PRP V NAME'))
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        # The sink is pickled on the way to the worker and back.
+        sink = pool.apply(copy.copy, (sink,))
+    SRParser(grammar, tagging=tagging, metrics=sink).parse(tagged('V PRP'))
+    assert (sink.parses, sink.successes) == (2, 1)
@@ -0,0 +1,44 @@
+"""
+Tests of per-parse resource limits.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 14:15
+"""
+
+import pytest
+
+from benchmark import ENGINES, right_recursive_sentence
+from shift_reduce_parser import ParseLimits, ParseSuccess
+
+SENTENCE = right_recursive_sentence(41)
+GENEROUS = ParseLimits(max_frames=10 ** 6, max_depth=10 ** 6, max_tokens=41, time_budget=60.0)
+
+
+# None where the engine does not have the resource a limit bounds.
+@pytest.mark.parametrize('limits, tree, lr, chart', [
+    (ParseLimits(max_frames=20), 'max_frames', None, 'max_frames'),
+    (ParseLimits(max_depth=5), 'max_depth', 'max_depth', None),
+    (ParseLimits(max_tokens=10), 'max_tokens', 'max_tokens', 'max_tokens'),
+    (ParseLimits(time_budget=0.0), 'time_budget', 'time_budget', 'time_budget'),
+])
+def test_limit_reasons(grammar, tagging, limits, tree, lr, chart):
+    for engine, reason in (('tree', tree), ('lr', lr), ('chart', chart)):
+        result = ENGINES[engine](grammar, tagging=tagging, limits=limits).parse(SENTENCE)
+        if reason is None:
+            assert isinstance(result, ParseSuccess)
+        else:
+            assert result.reason == reason and result.limit_exceeded and not result.expected
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+def test_generous_limits(grammar, tagging, engine):
+    assert isinstance(ENGINES[engine](grammar, tagging=tagging, limits=GENEROUS).parse(SENTENCE), ParseSuccess)
+
+
+@pytest.mark.parametrize('engine', ['tree', 'lr'])
+def test_stream_max_tokens(grammar, tagging, engine):
+    stream = ENGINES[engine](grammar, tagging=tagging, limits=ParseLimits(max_tokens=10)).stream()
+    pushed = [stream.push(token) for token in SENTENCE]
+    assert pushed == [True] * 10 + [False] * 31
+    failure = stream.finalize()
+    assert failure.reason == 'max_tokens' and failure.index == 10
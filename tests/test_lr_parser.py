@@ -0,0 +1,48 @@
+"""
+Tests of the table-driven engine.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 11:00
+"""
+
+import itertools
+
+from conftest import tagged
+from benchmark import synthetic_corpus
+from lr_parser import LRParser
+from shift_reduce_parser import SRParser, ParseSuccess, ParseFail
+
+
+def test_agrees_with_tree_engine(grammar, tagging):
+    lr = LRParser(grammar, tagging=tagging)
+    tree = SRParser(grammar, tagging=tagging)
+    for sentence in synthetic_corpus(grammar, 200) + [tagged('PRP V DET'), tagged('V PRP'), tagged('DET N P')]:
+        expected, result = tree.parse(sentence), lr.parse(sentence)
+        assert type(result) is type(expected)
+        if isinstance(expected, ParseSuccess):
+            assert result.compact().to_brackets() == expected.compact().to_brackets()
+
+
+def test_failures_agree_with_tree_engine(grammar, tagging):
+    lr = LRParser(grammar, tagging=tagging)
+    tree = SRParser(grammar, tagging=tagging)
+    terminals = [sym.name for sym in grammar.terminals()]
+    failures = 0
+    for length in range(1, 5):
+        for tags in itertools.product(terminals, repeat=length):
+            sentence = tagged(' '.join(tags))
+            expected, result = tree.parse(sentence), lr.parse(sentence)
+            if isinstance(expected, ParseFail):
+                failures += 1
+                assert (result.index, result.expected) == (expected.index, expected.expected), tags
+    assert failures > 0
+
+
+def test_shared_table(grammar, tagging):
+    parser = LRParser(grammar, tagging=tagging)
+    other = LRParser(grammar, tagging=tagging, table=parser.table)
+    assert other.table is parser.table and len(parser.table) > 0
+
+    sentence = tagged('NAME V P NAME')
+    assert other.parse(sentence).compact().to_brackets() == parser.parse(sentence).compact().to_brackets()
+    assert isinstance(other.parse(tagged('P NAME V')), ParseFail)
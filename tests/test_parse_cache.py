@@ -0,0 +1,61 @@
+"""
+Tests of the parse result cache.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 13:20
+"""
+
+import copy
+import multiprocessing
+
+import pytest
+
+from conftest import tagged
+from lr_parser import LRParser
+from parse_cache import ParseCache
+from shift_reduce_parser import SRParser, ParseFail
+
+
+@pytest.mark.parametrize('engine', [SRParser, LRParser])
+def test_hits_rebind_words(grammar, tagging, engine):
+    cache = ParseCache()
+    parser = engine(grammar, tagging=tagging, result_cache=cache)
+    first = parser.parse([('We', 'PRP'), ('saw', 'V'), ('a', 'DET'), ('dog', 'N')])
+    second = parser.parse([('They', 'PRP'), ('had', 'V'), ('the', 'DET'), ('cat', 'N')])
+    assert cache.stats()['hits'] == 1 and len(cache) == 1
+    first, second = first.compact().to_dict(), second.compact().to_dict()
+    assert list(second.pop('words')) == ['They', 'had', 'the', 'cat']
+    first.pop('words')
+    assert second == first
+
+    assert isinstance(parser.parse(tagged('V PRP')), ParseFail)
+    assert len(cache) == 1  # Failures are not cached
+
+
+def test_eviction_and_owners(grammar, tagging):
+    cache = ParseCache(maxsize=2)
+    parser = SRParser(grammar, tagging=tagging, result_cache=cache)
+    for tags in ('PRP V NAME', 'NAME V NAME', 'PRP V NAME', 'PRP V DET N'):
+        parser.parse(tagged(tags))
+    assert cache.stats()['hits'] == 1 and len(cache) == 2
+    parser.parse(tagged('NAME V NAME'))  # Evicted as the least recently used
+    assert cache.stats()['hits'] == 1
+
+    # A parser that may build other trees from the same terminals takes over the cache.
+    LRParser(grammar, tagging=tagging, result_cache=cache).parse(tagged('PRP V NAME'))
+    assert cache.stats()['invalidations'] == 1 and len(cache) == 1
+
+    cache = ParseCache(max_bytes=1)
+    SRParser(grammar, tagging=tagging, result_cache=cache).parse(tagged('PRP V NAME'))
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_spawned_process(grammar, tagging):
+    cache = ParseCache()
+    SRParser(grammar, tagging=tagging, result_cache=cache).parse(tagged('PRP V NAME'))
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        # The cache is pickled on the way to the worker and back.
+        cache = pool.apply(copy.copy, (cache,))
+    assert len(cache) == 1
+    SRParser(grammar, tagging=tagging, result_cache=cache).parse(tagged('PRP V NAME'))
+    assert cache.stats()['hits'] == 1 and cache.stats()['invalidations'] == 0
@@ -0,0 +1,22 @@
+"""
+Tests of the request line format.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 14:10
+"""
+
+import pytest
+
+from protocol import decode_request
+
+
+def test_decode_request():
+    assert decode_request('We were not allowed to dive', 3) == {'id': 3, 'text': 'We were not allowed to dive'}
+    assert decode_request('{"id": "a", "text": "We dive"}', 3) == {'id': 'a', 'text': 'We dive'}
+    # Tokens take precedence over text that is not a string.
+    request = decode_request('{"tokens": [["We", "PRP"], ["dive", "VB"]], "text": 7, "format": "brackets"}', 4)
+    assert request == {'id': 4, 'tokens': [['We', 'PRP'], ['dive', 'VB']], 'format': 'brackets'}
+
+    for line in ('{not json', '{"tokens": [["We"]]}', '{"text": ["We", "dive"]}'):
+        with pytest.raises(ValueError):
+            decode_request(line, 1)
@@ -0,0 +1,32 @@
+"""
+Tests of parsing deeply nested sentences.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 10:45
+"""
+
+import pytest
+
+from benchmark import ENGINES, right_recursive_sentence
+from shift_reduce_parser import ParseSuccess
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+def test_right_recursive_1000_tokens(grammar, tagging, capsys, engine):
+    sentence = right_recursive_sentence(1000)
+    # A RecursionError from any tree walk fails the test.
+    result = ENGINES[engine](grammar, tagging=tagging).parse(sentence)
+    assert isinstance(result, ParseSuccess)
+
+    tree = result.compact()
+    assert list(tree.words) == [word for word, _ in sentence]
+    assert tree.to_brackets().count('(VP ') == 499
+    result.pretty_print()
+    assert capsys.readouterr().out
+
+
+def test_right_recursive_1000_tokens_streamed(grammar, tagging):
+    stream = ENGINES['tree'](grammar, tagging=tagging).stream()
+    for token in right_recursive_sentence(1000):
+        assert stream.push(token)
+    assert isinstance(stream.finalize(), ParseSuccess)
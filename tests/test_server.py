@@ -0,0 +1,143 @@
+"""
+Tests of the parse server.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 09:55
+"""
+
+import asyncio
+import io
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+import server
+from shift_reduce_parser import SRParser, ParseLimits, UNGRAMMATICAL
+
+
+def serve_stdin(monkeypatch, parser, data: bytes):
+    """
+    Serve requests from stdin on the thread of the test.
+    :return: The replies, in the order they were written.
+    """
+    replies = []
+
+    async def write(reply):
+        replies.append(reply)
+
+    monkeypatch.setattr('sys.stdin', io.TextIOWrapper(io.BytesIO(data)))
+    instance = server.ParseServer(parser, workers=0)
+    try:
+        asyncio.run(instance.serve_stream(server._StdinReader(), write))
+    finally:
+        instance.close()
+    return replies
+
+
+def test_stdin_line_too_long(monkeypatch, grammar, tagging):
+    monkeypatch.setattr(server, 'READ_LIMIT', 64)
+    request = json.dumps({'id': 1, 'tokens': [['We', 'PRP'], ['dive', 'V']]}).encode()
+    replies = serve_stdin(monkeypatch, SRParser(grammar, tagging=tagging),
+                          request + b'\n' + b'x' * 100 + b' ' + request + b'\n' + request + b'\n')
+
+    # The long line ends the stream, and none of it is taken for a request. Replies may arrive out of order.
+    assert {(r['id'], r.get('error')) for r in replies} == {(1, 'parse_failed'), (None, 'bad_request')}
+    assert len(replies) == 2
+
+
+def test_protocol(monkeypatch, grammar, tagging):
+    requests = [
+        {'id': 'a', 'tokens': [['We', 'PRP'], ['saw', 'V'], ['Jo', 'NAME']], 'format': 'brackets'},
+        {'tokens': [['We', 'PRP'], ['saw', 'V'], ['Jo', 'NAME']]},
+        {'id': 'b', 'tokens': [['saw', 'V'], ['We', 'PRP']]},
+        {'id': 'c', 'tokens': [['We']]},
+        {'id': 'd', 'text': ['not', 'a', 'string']},
+    ]
+    data = b'\n'.join(json.dumps(r).encode() for r in requests) + b'\n\n{not json\n'
+    parser = SRParser(grammar, tagging=tagging)
+    replies = {r['id']: r for r in serve_stdin(monkeypatch, parser, data)}
+
+    assert replies['a']['ok'] and replies['a']['tree'] == '(S (NP (PRP We)) (VP (V saw) (NP (NAME Jo))))'
+    assert replies[2]['tree']['words'] == ['We', 'saw', 'Jo']  # Numbered by line, as JSON by default
+    assert replies['b']['error'] == 'parse_failed' and replies['b']['failure']['reason'] == UNGRAMMATICAL
+    # Invalid requests are answered by line number. Line 6 is blank and gets no reply.
+    assert {replies[i]['error'] for i in (4, 5, 7)} == {'bad_request'}
+    assert len(replies) == 6
+
+
+def test_limits_and_internal_errors(grammar, tagging):
+    parser = SRParser(grammar, tagging=tagging, limits=ParseLimits(max_tokens=2))
+    reply = server.respond(parser, {'id': 1, 'tokens': [('We', 'PRP'), ('saw', 'V'), ('Jo', 'NAME')]})
+    assert reply['error'] == 'limit_exceeded' and reply['failure']['reason'] == 'max_tokens'
+
+    class Broken:
+        def parse(self, sentence):
+            raise RuntimeError('broken')
+
+    assert server.respond(Broken(), {'id': 2, 'text': 'x'})['message'] == 'RuntimeError: broken'
+
+
+def test_timeout(grammar, tagging):
+    release = threading.Event()
+    parser = SRParser(grammar, tagging=tagging)
+
+    class Stuck:
+        def parse(self, sentence):
+            release.wait()
+            return parser.parse(sentence)
+
+    instance = server.ParseServer(Stuck(), workers=0, timeout=0.01)
+
+    async def run():
+        reply, future = await instance.handle({'id': 1, 'tokens': [['We', 'PRP'], ['saw', 'V'], ['Jo', 'NAME']]})
+        # The reply only holds what is sent to the client; the parse still running is returned next to it.
+        assert set(reply) == {'id', 'ok', 'error', 'message'} and not future.done()
+        release.set()
+        await future
+        instance.timeout = 10.0
+        return reply, await instance.handle({'id': 2, 'tokens': [['We', 'PRP'], ['saw', 'V'], ['Jo', 'NAME']]})
+
+    try:
+        reply, (second, future) = asyncio.run(run())
+    finally:
+        instance.close()
+    assert reply['error'] == 'timeout' and instance.stats['timeouts'] == 1
+    assert second['ok'] and future is None
+
+
+def test_unix_socket_replaces_only_sockets(tmp_path, grammar, tagging):
+    path = str(tmp_path / 'parser.sock')
+    instance = server.ParseServer(SRParser(grammar, tagging=tagging), workers=0)
+    with open(path, 'w') as f:
+        f.write('not a socket')
+    with pytest.raises(FileExistsError):
+        asyncio.run(instance.serve_unix(path))
+    with open(path) as f:
+        assert f.read() == 'not a socket'
+
+    # A socket file left behind by an earlier server is taken over.
+    os.unlink(path)
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(path)
+    stale.close()
+
+    async def client():
+        ready = asyncio.Event()
+        task = asyncio.ensure_future(instance.serve_unix(path, ready.set))
+        await ready.wait()
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(json.dumps({'id': 1, 'tokens': [['We', 'PRP'], ['saw', 'V'], ['Jo', 'NAME']]}).encode() + b'\n')
+        reply = json.loads(await reader.readline())
+        writer.close()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return reply
+
+    try:
+        assert asyncio.run(client())['ok']
+    finally:
+        instance.close()
+    assert not os.path.exists(path)
@@ -0,0 +1,213 @@
+"""
+Tests of the tree engine.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 09:10
+"""
+
+import concurrent.futures
+import itertools
+import json
+import pickle
+
+import pytest
+
+from conftest import tagged
+from benchmark import synthetic_corpus
+from grammar import Grammar, Symbol
+from shift_reduce_parser import SRParser, ParseSuccess, ParseFail, UNGRAMMATICAL, FramePool, StateFrame
+from chart_parser import ChartParser
+from lr_parser import LRParser
+
+
+def streamed(parser, sentence):
+    """
+    :return: The result of pushing the sentence into a stream of the parser one token at a time.
+    """
+    stream = parser.stream()
+    for token in sentence:
+        if not stream.push(token):
+            break
+    return stream.finalize()
+
+
+def outcome(result) -> str:
+    """
+    :return: The tree of a successful parse as brackets, or the reason of a failure.
+    """
+    return result.compact().to_brackets() if isinstance(result, ParseSuccess) else result.reason
+
+
+@pytest.mark.parametrize('sentence, tree', [
+    ('PRP V DET N', '(S (NP (PRP w0)) (VP (V w1) (NP (DET w2) (N w3))))'),
+    ('NAME V P NAME', '(S (NP (NAME w0)) (VP (V w1) (PP (P w2) (NP (NAME w3)))))'),
+])
+def test_parse(grammar, tagging, sentence, tree):
+    result = SRParser(grammar, tagging=tagging).parse(tagged(sentence))
+    assert isinstance(result, ParseSuccess)
+    assert result.compact().to_brackets() == tree
+
+
+# Sentences the tree engine used to accept with a root other than S. The ADV sentences are grammatical, as an S of
+# ADVP -> ADV and a VP, but the engine prefers the longer ADVP -> ADV VP, which takes the whole sentence.
+@pytest.mark.parametrize('sentence', ['ADV V NAME', 'ADV V DET N', 'ADV AUX V PRP', 'PRP ADV V NAME',
+                                      'DET N P NAME', 'N'])
+def test_root_is_start_symbol(grammar, tagging, sentence):
+    parser = SRParser(grammar, tagging=tagging)
+    for result in (parser.parse(tagged(sentence)), streamed(parser, tagged(sentence))):
+        if isinstance(result, ParseSuccess):
+            assert result.root.symbol == grammar.start_symbol
+        else:
+            assert result.reason == UNGRAMMATICAL
+
+
+@pytest.mark.parametrize('sentence', ['ADV V NAME', 'ADV V DET N', 'ADV AUX V PRP', 'PRP ADV V NAME'])
+def test_grammatical_as_start_symbol(grammar, tagging, sentence):
+    result = ChartParser(grammar, tagging=tagging).parse(tagged(sentence))
+    assert isinstance(result, ParseSuccess)
+    assert result.root.symbol == Symbol('S')
+
+
+
+@pytest.mark.parametrize('maxsize', [0, 2])
+def test_recycle_detaches_frames_it_does_not_keep(maxsize):
+    pool = FramePool(maxsize)
+    root = StateFrame((Symbol('S'), 0, 0))
+    frames = [pool.take((Symbol('NP'), i, 0), (), root) for i in range(4)]
+    root.children.extend(frames)
+    for frame in frames:
+        frame.children.append(StateFrame((Symbol('N'), 0, 0)))
+
+    pool.recycle(frames)
+    assert len(pool) == maxsize
+    # The reducer skips frames without a parent as already discarded, so every frame must lose it.
+    assert all(frame.parent is None and not frame.children for frame in frames)
+
+
+def test_reusable_and_reentrant(grammar, tagging):
+    corpus = synthetic_corpus(grammar, 100) + [tagged('V PRP'), tagged('PRP V DET')]
+    expected = [outcome(SRParser(grammar, tagging=tagging).parse(s)) for s in corpus]
+    parser = SRParser(grammar, tagging=tagging)
+    assert [outcome(parser.parse(s)) for s in corpus] == expected
+    assert [outcome(parser.parse(s)) for s in corpus] == expected  # The first round must leave no state behind
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        assert list(map(outcome, pool.map(parser.parse, corpus))) == expected
+    assert [outcome(r) for r in pickle.loads(pickle.dumps(parser)).parse_many(corpus)] == expected
+
+
+@pytest.mark.parametrize('engine', [SRParser, LRParser])
+def test_parse_many_in_processes(grammar, tagging, engine):
+    corpus = synthetic_corpus(grammar, 60) + [tagged('V PRP')]
+    parser = engine(grammar, tagging=tagging)
+    expected = [outcome(parser.parse(s)) for s in corpus]
+    assert [outcome(r) for r in parser.parse_many(corpus, jobs=2, chunksize=4)] == expected
+
+
+def test_parse_many_reads_lazily(grammar, tagging):
+    read = 0
+
+    def sentences():
+        nonlocal read
+        for sentence in itertools.repeat(tagged('PRP V NAME'), 10000):
+            read += 1
+            yield sentence
+
+    results = SRParser(grammar, tagging=tagging).parse_many(sentences(), jobs=2, chunksize=2)
+    assert all(isinstance(r, ParseSuccess) for r in itertools.islice(results, 5))
+    results.close()
+    assert read < 100  # About the window of 4 * jobs * chunksize sentences, not the whole input
+
+
+def test_prediction_keeps_trees(grammar, tagging):
+    created = {}
+    trees = {}
+    for predict in (False, True):
+        metrics = []
+        parser = SRParser(grammar, tagging=tagging, predict=predict, metrics=metrics.append)
+        trees[predict] = [outcome(parser.parse(s)) for s in synthetic_corpus(grammar, 100)]
+        created[predict] = sum(m.frames_created for m in metrics)
+    assert trees[True] == trees[False]
+    assert created[True] < created[False]
+
+
+@pytest.mark.parametrize('engine', [SRParser, LRParser, ChartParser])
+def test_empty_sentence(grammar, tagging, engine):
+    parser = engine(grammar, tagging=tagging)
+    assert parser.parse([]).reason == UNGRAMMATICAL
+    if engine is not ChartParser:
+        assert streamed(parser, []).reason == UNGRAMMATICAL
+
+
+@pytest.mark.parametrize('engine', [SRParser, LRParser])
+def test_stream_matches_parse(grammar, tagging, engine):
+    parser = engine(grammar, tagging=tagging)
+    for sentence in synthetic_corpus(grammar, 60) + [tagged('V PRP'), tagged('PRP V DET'), []]:
+        assert outcome(streamed(parser, sentence)) == outcome(parser.parse(sentence))
+
+
+@pytest.mark.parametrize('engine', [SRParser, LRParser])
+def test_stream_expected(grammar, tagging, engine):
+    stream = engine(grammar, tagging=tagging).stream()
+    assert Symbol('PRP') in stream.expected() and Grammar.RULE_END not in stream.expected()
+    for token in tagged('PRP V DET N'):
+        assert token[1] in {str(s) for s in stream.expected()}
+        assert stream.push(token)
+    assert Grammar.RULE_END in stream.expected()
+
+    assert isinstance(stream.finalize(), ParseSuccess)
+    assert stream.finalize() is stream.finalize()
+    with pytest.raises(ValueError):
+        stream.push(('w', 'N'))
+
+    stream = engine(grammar, tagging=tagging).stream()
+    assert stream.push(('w0', 'PRP'))
+    assert not stream.push(('w1', 'PRP'))  # A prefix no sentence starts with
+    assert not stream.viable and stream.expected() == frozenset()
+    assert not stream.push(('w2', 'V'))
+    assert stream.finalize().reason == UNGRAMMATICAL
+
+
+@pytest.mark.parametrize('engine', [SRParser, LRParser, ChartParser])
+@pytest.mark.parametrize('sentence, failure', [
+    ('PRP PRP V', (1, 'PRP', 'w1', ['ADV', 'AUX', 'MD', 'V'], [['NP', 0, 1]])),
+    ('PRP V DET', (3, None, None, ['N'], [['NP', 0, 1], ['V', 1, 2], ['DET', 2, 3]])),
+    ('V PRP', (0, 'V', 'w0', ['ADV', 'DET', 'NAME', 'PRP', 'PRP$', 'TO'], [])),
+])
+def test_failure_diagnostics(grammar, tagging, capsys, engine, sentence, failure):
+    result = engine(grammar, tagging=tagging).parse(tagged(sentence))
+    data = result.to_dict()
+    assert (data['index'], data['symbol'], data['word'], data['expected'], data['constituents']) == failure
+    assert not result.limit_exceeded
+    assert ParseFail.from_dict(json.loads(json.dumps(data))) == result
+    assert pickle.loads(pickle.dumps(result)) == result
+
+    result.dump()
+    assert f'At token {failure[0]}, found' in capsys.readouterr().out
+
+
+def test_frame_pool_reuse(grammar, tagging):
+    corpus = synthetic_corpus(grammar, 50)
+    pooled = SRParser(grammar, tagging=tagging)
+    unpooled = SRParser(grammar, tagging=tagging, frame_pool=0)
+    expected = [outcome(unpooled.parse(s)) for s in corpus]
+    assert [outcome(pooled.parse(s)) for s in corpus] == expected
+    assert unpooled.frame_pool.reused == 0 and len(unpooled.frame_pool) == 0
+
+    # After a warm-up pass, every frame comes from the pool.
+    allocated = pooled.frame_pool.allocated
+    assert [outcome(pooled.parse(s)) for s in corpus] == expected
+    assert pooled.frame_pool.allocated == allocated and pooled.frame_pool.reused > 0
+    assert len(pickle.loads(pickle.dumps(pooled)).frame_pool) == 0
+
+
+def test_clone_shares_rules_only(grammar):
+    root = SRParser(grammar).new_context(Symbol('PRP')).state
+    pool = FramePool()
+    for copy in (root.clone(), root.clone(pool=pool)):
+        pairs = list(zip(root.walk(), copy.walk()))
+        assert len(pairs) == root.size() == copy.size()
+        for frame, cpy in pairs:
+            assert cpy is not frame and cpy.children is not frame.children
+            assert cpy.to_sym is frame.to_sym and (cpy.from_sym, cpy.rule, cpy.constituent) == \
+                (frame.from_sym, frame.rule, frame.constituent)
+            assert all(child.parent is cpy for child in cpy.children)
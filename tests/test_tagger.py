@@ -0,0 +1,92 @@
+"""
+Tests of the tagging stage.
+CS 799.06 Graduate Independent Study in NLP/NLU.
+
+:date: 10/17/2026 11:30
+"""
+
+import copy
+import multiprocessing
+import subprocess
+import sys
+
+from conftest import ROOT, GRAMMAR_FILE, REDUCTION_FILE
+from grammar import Symbol
+from tagger import TaggingStage, TagCache, NLTKTagger, OFFLINE_ENV
+
+
+class DictTagger:
+    """
+    Tags words from a fixed dictionary, and counts how often it is asked to.
+    """
+
+    TAGS = {'We': 'PRP', 'saw': 'VBD', 'the': 'DT', 'dog': 'NN', 'Bob': 'NNP'}
+
+    def __init__(self):
+        self.calls = 0
+
+    def tokenize(self, text: str):
+        return text.split()
+
+    def tag(self, words):
+        self.calls += 1
+        return [self.TAGS[w] for w in words]
+
+
+def test_tag_and_reduce_in_one_pass(reduction):
+    tagging = TaggingStage(reduction, DictTagger())
+    tokens = tagging('We saw, the dog!')
+    assert [(t.value, t.symbol) for t in tokens] == \
+        [('We', Symbol('PRP')), ('saw', Symbol('V')), ('the', Symbol('DET')), ('dog', Symbol('N'))]
+    # Tagged input is only reduced.
+    assert [t.symbol for t in tagging([('Bob', 'NNP'), ('saw', 'VBZ')])] == [Symbol('NAME'), Symbol('V')]
+    assert tagging.tagger.calls == 1
+
+
+def test_cache(reduction):
+    tagger = DictTagger()
+    tagging = TaggingStage(reduction, tagger, cache=TagCache(maxsize=2))
+    first = tagging('We saw the dog')
+    # Punctuation is removed before the lookup, so both sentences share an entry.
+    assert [t.symbol for t in tagging('We saw the dog.')] == [t.symbol for t in first]
+    assert tagger.calls == 1 and tagging.cache.hits == 1
+
+    tagging('We saw Bob')
+    tagging('We saw the dog')  # Now the most recently used
+    tagging('Bob saw the dog')  # Evicts 'We saw Bob'
+    assert len(tagging.cache) == 2 and tagger.calls == 3
+    assert tagging.cache.get('We saw Bob') is None
+    assert tagging.cache.get('We saw the dog') == (('We', 'saw', 'the', 'dog'), ('PRP', 'VBD', 'DT', 'NN'))
+
+
+def test_cache_in_spawned_process():
+    cache = TagCache(maxsize=2)
+    cache.put('We saw Bob', ['We', 'saw', 'Bob'], ['PRP', 'VBD', 'NNP'])
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        # The cache is pickled on the way to the worker and back.
+        cache = pool.apply(copy.copy, (cache,))
+    assert cache.get('We saw Bob') == (('We', 'saw', 'Bob'), ('PRP', 'VBD', 'NNP'))
+    cache.put('Bob saw the dog', ['Bob', 'saw', 'the', 'dog'], ['NNP', 'VBD', 'DT', 'NN'])
+    assert len(cache) == 2
+
+
+def test_tagged_input_never_loads_nltk():
+    # In a fresh interpreter, since another test may have imported NLTK already.
+    code = ('import sys\n'
+            'import parser\n'
+            'from grammar import Grammar, Reduction\n'
+            'from shift_reduce_parser import SRParser\n'
+            f'parser = SRParser(Grammar({GRAMMAR_FILE!r}), Reduction({REDUCTION_FILE!r}))\n'
+            'assert parser.parse([("We", "PRP"), ("saw", "VBD"), ("Bob", "NNP")]).root is not None\n'
+            'print("nltk" in sys.modules)\n')
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'False'
+
+
+def test_offline_from_environment(monkeypatch):
+    monkeypatch.setenv(OFFLINE_ENV, '1')
+    assert NLTKTagger().offline
+    assert not NLTKTagger(offline=False).offline
+    monkeypatch.setenv(OFFLINE_ENV, '0')
+    assert not NLTKTagger().offline